@@ -0,0 +1,118 @@
+"""
+Benchmark de análisis: una vacante por request vs varias por request (lotes).
+
+    python bench/bench_batching.py [n_jobs] [--batch-sizes 1,5] [--live]
+
+Arma `n_jobs` vacantes sintéticas (las mismas de bench/fakes.py, con
+descripciones de largo real) y las analiza contra cv.example.json con
+AIService para cada tamaño de lote, sin cache. Reporta requests, tokens de
+prompt y de respuesta, tokens por vacante, vacantes cada 1k tokens y las que
+no se pudieron analizar.
+
+Sin `--live` usa FakeGroq: sirve para ver cuántos requests y de qué tamaño
+arma el planificador de lotes, pero los tokens son una estimación
+(caracteres / 4). Con `--live` llama a la API real (necesita GROQ_API_KEY,
+respeta GROQ_RPM/GROQ_TPM) y los tokens son los que informa Groq en `usage`;
+además compara el `match_score` de cada vacante entre modos.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import FakeGroq, FakeJobSpy  # noqa: E402
+from models.JobModels import Job  # noqa: E402
+from services.GroqService import AIService, TransientAnalysisError, as_cv_prompt  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_jobs(n: int):
+    spy = FakeJobSpy(unique_jobs=n, rows_per_call=n)
+    jobs = []
+    for i in range(n):
+        row = spy._job(i, "linkedin")
+        jobs.append(Job(id=row["job_url"], title=row["title"], company=row["company"],
+                        location=row["location"] or "", url=row["job_url"], description=row["description"]))
+    return jobs
+
+
+async def run_mode(jobs, cv, batch_size: int, live: bool):
+    service = AIService(batch_size=batch_size, cache=None, **({} if live else {"rpm": 100_000, "tpm": 10 ** 9}))
+    if not live:
+        service.client = FakeGroq(latency=0.2, jitter=0.05)
+    groups = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    async def analyze(group):
+        try:
+            if len(group) == 1:
+                return {group[0].id: await service.analyze_job(group[0], cv)}
+            return await service.analyze_batch(group, cv)
+        except TransientAnalysisError:
+            return {}
+
+    started = time.monotonic()
+    results = {}
+    for outcome in await asyncio.gather(*[analyze(group) for group in groups]):
+        results.update(outcome)
+    elapsed = time.monotonic() - started
+    usage = {mode: stats for mode, stats in service.usage.items() if stats.requests}
+    requests = sum(s.requests for s in usage.values())
+    prompt = sum(s.prompt_tokens for s in usage.values())
+    completion = sum(s.completion_tokens for s in usage.values())
+    return {
+        "batch_size": batch_size,
+        "requests": requests,
+        "single_requests": usage["single"].requests if "single" in usage else 0,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "tokens_per_job": round((prompt + completion) / max(1, len(results)), 1),
+        "jobs_per_1k_tokens": round(1000 * len(results) / max(1, prompt + completion), 2),
+        "failed": len(jobs) - len(results),
+        "seconds": round(elapsed, 1),
+    }, results
+
+
+async def main_async(args):
+    with open(os.path.join(ROOT, "cv.example.json"), encoding="utf-8") as f:
+        cv = as_cv_prompt(json.load(f))
+    jobs = make_jobs(args.jobs)
+    source = "usage de la API" if args.live else "estimados caracteres/4 (FakeGroq)"
+    print(f"🤖 {len(jobs)} vacantes, tokens: {source}\n")
+    print(f"{'lote':>5} {'requests':>9} {'indiv.':>8} {'prompt':>9} {'respuesta':>10} "
+          f"{'tok/vac':>8} {'vac/1k tok':>11} {'fallidas':>9} {'s':>6}")
+    scores = {}
+    for size in [int(s) for s in args.batch_sizes.split(",")]:
+        row, results = await run_mode(jobs, cv, size, args.live)
+        scores[size] = {job_id: audit.match_score for job_id, audit in results.items()}
+        print(f"{row['batch_size']:>5} {row['requests']:>9} {row['single_requests']:>8} {row['prompt_tokens']:>9} "
+              f"{row['completion_tokens']:>10} {row['tokens_per_job']:>8} {row['jobs_per_1k_tokens']:>11} "
+              f"{row['failed']:>9} {row['seconds']:>6}")
+    if args.live and len(scores) > 1:
+        base_size, base = next(iter(scores.items()))
+        for size, other in list(scores.items())[1:]:
+            common = base.keys() & other.keys()
+            if common:
+                diffs = [abs(base[k] - other[k]) for k in common]
+                print(f"\n|match_score lote {size} - lote {base_size}|: media {statistics.mean(diffs):.1f}, "
+                      f"máx {max(diffs)} ({len(common)} vacantes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", type=int, nargs="?", default=40)
+    parser.add_argument("--batch-sizes", default="1,5")
+    parser.add_argument("--live", action="store_true", help="usa la API real de Groq (GROQ_API_KEY)")
+    args = parser.parse_args()
+    if args.live and not os.getenv("GROQ_API_KEY"):
+        raise SystemExit("--live necesita GROQ_API_KEY")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
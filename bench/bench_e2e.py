@@ -0,0 +1,233 @@
+"""
+Benchmark de punta a punta sin red: corre `main.main()` (scraper_scheduler +
+process_jobs + telegram_worker) con jobspy, Groq y Telegram reemplazados por
+los dobles de bench/fakes.py, hasta scrapear las ofertas y vaciar la outbox.
+
+    python bench/bench_e2e.py [--sizes 100,10000,100000] [--llm-latency 0.3] [--groq-rpm 600] ...
+
+Cada tamaño corre en un subproceso con su propia base SQLite temporal (la
+configuración se lee al importar, y así el pico de RSS es el de esa corrida).
+Informa ofertas/s del ciclo, tiempo hasta la notificación (p50/p99, desde que
+el falso jobspy entrega la oferta hasta que el falso Bot la envía), tamaño de
+la base y pico de RSS. `dangling` cuenta los casi-duplicados guardados cuya
+canónica no está en la base (tiene que dar 0).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_PREFIX = "BENCH_RESULT "
+
+BENCH_CV = {
+    "role": "Python Backend Developer",
+    "summary": "Backend developer con 3 años de experiencia en APIs y datos.",
+    "skills": ["Python", "Django", "FastAPI", "PostgreSQL", "Docker", "AWS", "Redis", "Celery"],
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,10000,100000", help="ofertas únicas por corrida")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--dup-rate", type=float, default=0.2)
+    parser.add_argument("--near-dup-rate", type=float, default=0.03)
+    parser.add_argument("--scrape-latency", type=float, default=0.5)
+    parser.add_argument("--scrape-failure-rate", type=float, default=0.0)
+    parser.add_argument("--scrape-block-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--groq-rpm", type=int, default=6000, help="límite del falso Groq (y del limiter)")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0, help="429 aleatorios además del RPM")
+    parser.add_argument("--match-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=8, help="ANALYSIS_CONCURRENCY")
+    parser.add_argument("--tg-rate", type=float, default=30, help="mensajes/s que acepta el falso Bot")
+    parser.add_argument("--digest", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="deja el log INFO de la aplicación")
+    return parser.parse_args(argv)
+
+
+def configure_env(args, workdir: str):
+    db_path = os.path.join(workdir, "bench.db")
+    profiles = os.path.join(workdir, "profiles.json")
+    with open(profiles, "w") as f:
+        json.dump([{"name": "default", "cv": BENCH_CV, "chat_id": "1"}], f)
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "GROQ_API_KEY": "bench",
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        "PROFILES_FILE": profiles,
+        "GROQ_RPM": str(args.groq_rpm),
+        "GROQ_TPM": str(args.groq_rpm * 4000),
+        "ANALYSIS_CONCURRENCY": str(args.concurrency),
+        # El falso Bot sólo limita el total: el límite por chat se iguala al global
+        "TELEGRAM_GLOBAL_RATE": str(args.tg_rate),
+        "TELEGRAM_PER_CHAT_RATE": str(args.tg_rate),
+        "TELEGRAM_DIGEST": "true" if args.digest else "false",
+        "SCRAPE_CYCLE_BUDGET": "86400",
+    })
+    return db_path
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+async def drive(args, size: int, db_path: str) -> dict:
+    import logging
+
+    import main
+    import services.JobServices as job_services
+    from bench.fakes import FakeBot, FakeGroq, FakeJobSpy
+    from services.GroqService import ai_service
+    from services.RedisServices import OutboxQueue
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    targets = len(main.SEARCH_TERMS) * len(main.SEARCH_LOCATIONS) * len(main.settings.SEARCH_SITES)
+    fresh_share = max(0.05, 1 - args.dup_rate - args.near_dup_rate)
+    spy = FakeJobSpy(
+        unique_jobs=size,
+        rows_per_call=math.ceil(size / targets / fresh_share * 1.1),
+        dup_rate=args.dup_rate,
+        near_dup_rate=args.near_dup_rate,
+        latency=args.scrape_latency,
+        jitter=args.scrape_latency / 2,
+        failure_rate=args.scrape_failure_rate,
+        block_rate=args.scrape_block_rate,
+    )
+    fake_groq = FakeGroq(latency=args.llm_latency, jitter=args.llm_latency / 3, rpm=args.groq_rpm,
+                         error_rate=args.groq_error_rate, match_rate=args.match_rate)
+    bot = FakeBot(global_rate=args.tg_rate)
+    job_services.scrape_jobs = spy
+    ai_service.client = fake_groq
+    main.Bot = lambda token: bot
+
+    # Se envuelve el ciclo real para saber cuándo terminó y con qué estadísticas
+    cycle = {}
+    cycle_done = asyncio.Event()
+    process_jobs = main.process_jobs
+
+    async def timed_process_jobs(queue, scheduler=None):
+        started = time.monotonic()
+        stats = await process_jobs(queue, scheduler)
+        cycle.setdefault("seconds", time.monotonic() - started)
+        cycle.setdefault("stats", stats)
+        cycle_done.set()
+        return stats
+
+    main.process_jobs = timed_process_jobs
+
+    started = time.monotonic()
+    app = asyncio.create_task(main.main())
+    outbox = OutboxQueue()
+    loop = asyncio.get_running_loop()
+    await cycle_done.wait()
+    while await loop.run_in_executor(None, outbox.pending):
+        if app.done():
+            break
+        await asyncio.sleep(0.2)
+    total = time.monotonic() - started
+    app.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await app
+
+    stats = cycle["stats"]
+    latencies = [bot.delivered_at[url] - spy.produced_at[url] for url in bot.delivered_at if url in spy.produced_at]
+    db_bytes = sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        dangling = conn.execute(
+            "SELECT COUNT(*) FROM job d WHERE d.canonical_id IS NOT NULL"
+            " AND NOT EXISTS (SELECT 1 FROM job c WHERE c.id = d.canonical_id)"
+        ).fetchone()[0]
+    return {
+        "size": size,
+        "unique_scraped": spy.produced,
+        "rows_scraped": stats.scraped,
+        "new": stats.new,
+        "analyzed": stats.analyzed,
+        "filtered": stats.filtered,
+        "near_duplicates": stats.near_duplicates,
+        "dangling": dangling,
+        "notified": stats.notified,
+        "delivered": len(bot.delivered_at),
+        "cycle_s": round(cycle["seconds"], 2),
+        "total_s": round(total, 2),
+        "jobs_per_s": round(stats.scraped / cycle["seconds"], 1) if cycle["seconds"] else None,
+        "ttn_p50_s": round(percentile(latencies, 50), 2) if latencies else None,
+        "ttn_p99_s": round(percentile(latencies, 99), 2) if latencies else None,
+        "llm_calls": fake_groq.calls,
+        "llm_429": fake_groq.rate_limited,
+        "tg_retry_after": bot.retry_after,
+        "db_mb": round(db_bytes / 2 ** 20, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_one(args):
+    workdir = tempfile.mkdtemp(prefix="jobfinder-bench-")
+    db_path = configure_env(args, workdir)
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+    result = asyncio.run(drive(args, args.run, db_path))
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+COLUMNS = [
+    ("size", "ofertas"), ("rows_scraped", "filas"), ("analyzed", "analizadas"), ("delivered", "alertas"),
+    ("cycle_s", "ciclo s"), ("total_s", "total s"), ("jobs_per_s", "filas/s"), ("ttn_p50_s", "ttn p50"),
+    ("ttn_p99_s", "ttn p99"), ("llm_calls", "LLM"), ("llm_429", "429"), ("db_mb", "DB MB"), ("peak_rss_mb", "RSS MB"),
+]
+
+
+def main_cli():
+    args = parse_args()
+    if args.run is not None:
+        run_one(args)
+        return
+    passthrough, skip = [], False
+    for arg in sys.argv[1:]:
+        if skip or arg.startswith("--sizes="):
+            skip = False
+            continue
+        if arg == "--sizes":
+            skip = True
+            continue
+        passthrough.append(arg)
+    results = []
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"▶️ {size} ofertas...", flush=True)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", str(size), *passthrough],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if proc.returncode != 0 or not lines:
+            print(proc.stdout[-2000:], proc.stderr[-4000:], sep="\n")
+            raise SystemExit(f"La corrida de {size} falló (código {proc.returncode})")
+        results.append(json.loads(lines[-1][len(RESULT_PREFIX):]))
+
+    print()
+    print(" | ".join(f"{title:>10}" for _, title in COLUMNS))
+    for r in results:
+        print(" | ".join(f"{str(r[key]):>10}" for key, _ in COLUMNS))
+    print()
+    for r in results:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,102 @@
+"""
+Benchmark de ingesta: iterrows + Job por fila (camino anterior) vs limpieza
+columnar con pandas y Job sólo para las filas nuevas.
+
+    python bench/bench_ingest.py [filas_por_pais] [paises]
+
+Los DataFrames imitan la salida de jobspy: URLs con query string, NaN en
+textos, filas sin URL y la misma oferta repetida entre portales. El 70% de
+los IDs se marca como ya visto en la base.
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from models.JobModels import Job  # noqa: E402
+from services.JobServices import clean_jobs_frame, frame_to_jobs  # noqa: E402
+
+
+def synthetic_frame(rows: int, country: int, rng: np.random.Generator) -> pd.DataFrame:
+    ids = rng.integers(0, rows * 2, size=rows)
+    urls = np.array([f"https://jobs.example/{country}/{i}?trk=abc&pos={n}" for n, i in enumerate(ids)], dtype=object)
+    urls[rng.random(rows) < 0.02] = None
+    desc = np.array(["Buscamos Python developer con Django y PostgreSQL. " * 20] * rows, dtype=object)
+    desc[rng.random(rows) < 0.1] = np.nan
+    company = np.array([f"Empresa {i % 300}" for i in ids], dtype=object)
+    company[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "job_url": urls,
+        "title": [f"Python Developer {i}" for i in ids],
+        "company": company,
+        "location": np.where(rng.random(rows) < 0.1, None, f"Ciudad {country}"),
+        "description": desc,
+        "is_remote": np.where(rng.random(rows) < 0.3, None, rng.random(rows) < 0.5),
+        "site": rng.choice(["linkedin", "indeed", "google"], size=rows),
+    })
+
+
+def legacy(frames, seen):
+    """Réplica del loop original (incluye el bug de NaN -> 'nan')."""
+    jobs = []
+    for jobs_df, location in frames:
+        for _, row in jobs_df.iterrows():
+            job_url = str(row.get("job_url", ""))
+            clean_url = job_url.split("?")[0] if job_url else None
+            if not clean_url:
+                continue
+            jobs.append(Job(
+                id=clean_url,
+                title=str(row.get("title", "Sin Título")),
+                company=str(row.get("company", "Empresa No Especificada")),
+                location=str(row.get("location", location)),
+                url=clean_url,
+                description=row.get("description") if row.get("description") else "Sin descripción disponible",
+                salary=str(row.get("salary")) if row.get("salary") else None,
+                is_remote=bool(row.get("is_remote", False)),
+            ))
+    unique = {}
+    for job in jobs:
+        unique.setdefault(job.id, job)
+    return [job for job in unique.values() if job.id not in seen], jobs
+
+
+def columnar(frames, seen):
+    frame = clean_jobs_frame([f.assign(location=f["location"].fillna(loc)) for f, loc in frames])
+    new = frame[~frame["id"].isin(seen)]
+    cleaned = time.perf_counter()
+    return frame_to_jobs(new), cleaned
+
+
+if __name__ == "__main__":
+    per_country = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    countries = int(sys.argv[2]) if len(sys.argv) > 2 else 19
+    rng = np.random.default_rng(0)
+    frames = [(synthetic_frame(per_country, c, rng), f"País {c}") for c in range(countries)]
+    all_ids = {u.split("?")[0] for f, _ in frames for u in f["job_url"].dropna()}
+    seen = set(sorted(all_ids)[: int(len(all_ids) * 0.7)])
+    total = per_country * countries
+
+    t = time.perf_counter()
+    old_new, old_all = legacy(frames, seen)
+    legacy_s = time.perf_counter() - t
+    t = time.perf_counter()
+    new_jobs, cleaned_at = columnar(frames, seen)
+    columnar_s = time.perf_counter() - t
+    clean_s = cleaned_at - t
+
+    nan_rows = sum(1 for j in old_all if "nan" in (j.company, j.location, j.description))
+    # El camino anterior además convertía una URL nula en el ID "None"
+    bogus_ids = {j.id for j in old_new} - {j.id for j in new_jobs}
+    assert bogus_ids <= {"None", "nan"}, bogus_ids
+    assert not any("nan" in (j.company, j.location, j.description) for j in new_jobs)
+    print(f"{total} filas ({countries} países), {len(new_jobs)} nuevas")
+    print(f"  iterrows + Job por fila : {legacy_s:6.2f}s  ({total / legacy_s:8.0f} filas/s, {len(old_all)} Job, {nan_rows} con 'nan', IDs falsos {sorted(bogus_ids)})")
+    print(f"  columnar + Job nuevas   : {columnar_s:6.2f}s  ({total / columnar_s:8.0f} filas/s, {len(new_jobs)} Job, 0 con 'nan')")
+    print(f"    (limpieza + dedupe vectorial: {clean_s:.2f}s; el resto es construir los Job)")
+    print(f"  speedup                 : {legacy_s / columnar_s:6.1f}x")
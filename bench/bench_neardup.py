@@ -0,0 +1,97 @@
+"""
+Benchmark del índice de casi-duplicados (MinHash/LSH).
+
+    python bench/bench_neardup.py [n_firmas]
+
+Carga `n_firmas` firmas sintéticas en una base SQLite temporal, reconstruye el
+índice con `load()` y mide la búsqueda de ofertas reales: variantes de una
+misma vacante (otro portal, markdown, frases agregadas) y vacantes distintas
+de la misma empresa que comparten texto institucional.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from database import create_db_and_tables, engine  # noqa: E402
+from models.JobModels import Job  # noqa: E402
+from services.DedupeService import NearDupIndex  # noqa: E402
+
+BOILERPLATE = (
+    "Sobre nosotros: somos una empresa de tecnología con presencia en toda Latinoamérica, "
+    "con más de 500 colaboradores y clientes en banca, retail y salud. "
+    "Ofrecemos trabajo remoto, horario flexible, capacitaciones, prepaga y bono anual."
+)
+ROLES = {
+    "Python Backend Developer": "Desarrollo de APIs con FastAPI y Django, PostgreSQL, Redis y colas con Celery. "
+    "Diseño de microservicios, testing con pytest y despliegues en AWS con Docker y Terraform.",
+    "Frontend React Developer": "Construcción de interfaces con React, TypeScript y Next.js. "
+    "Manejo de estado con Redux, testing con Jest y Cypress, accesibilidad y performance web.",
+    "Data Engineer": "Pipelines de datos con Airflow y Spark, modelado en Snowflake y dbt. "
+    "Integración de fuentes, calidad de datos y orquestación en GCP.",
+}
+
+
+def posting(title: str, site: str) -> Job:
+    body = f"{ROLES[title]} Requisitos: 3+ años de experiencia, inglés intermedio. {BOILERPLATE}"
+    if site == "linkedin":
+        body = f"**{title}**\n\n{body}\n\nPostulate en LinkedIn."
+    elif site == "indeed":
+        body = body.replace("Requisitos:", "## Requisitos\n-") + " Publicado hace 2 días."
+    return Job(id=f"https://{site}.example/{title}", title=title, company="ACME Tech", location="AR", url="u", description=body)
+
+
+def seed(n: int, num_perm: int):
+    rng = np.random.default_rng(0)
+    sigs = rng.integers(0, 2 ** 32, size=(n, num_perm), dtype=np.uint32)
+    rows = [{"id": f"https://seed/{i}", "title": "t", "company": "c", "location": "l", "url": "u",
+             "minhash": sigs[i].tobytes(), "notified": False, "is_remote": False} for i in range(n)]
+    with engine.begin() as conn:
+        conn.execute(Job.__table__.insert(), rows)
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    create_db_and_tables()
+    index = NearDupIndex()
+    seed(n, index.num_perm)
+
+    started = time.perf_counter()
+    index.load()
+    load_s = time.perf_counter() - started
+
+    canonical = [posting(title, "google") for title in ROLES]
+    unique, dups = index.partition(canonical)
+    assert not dups, "las canónicas no deberían ser duplicadas entre sí"
+
+    variants = [posting(title, site) for title in ROLES for site in ("linkedin", "indeed")]
+    timings = []
+    found = 0
+    for job in variants:
+        t = time.perf_counter()
+        canonical_id = index.find(job)
+        timings.append(time.perf_counter() - t)
+        found += canonical_id == f"https://google.example/{job.title}"
+
+    sig = index.signature(variants[0])
+    t = time.perf_counter()
+    for _ in range(1000):
+        with index._lock:
+            index._lookup("x", sig)
+    lookup_us = (time.perf_counter() - t) / 1000 * 1e6
+
+    print(f"{n} firmas: load {load_s:.1f}s, {index._sigs.nbytes / 1e6:.0f} MB de firmas")
+    print(f"  variantes enlazadas a su canónica: {found}/{len(variants)}")
+    print(f"  roles distintos de la misma empresa separados: {len(unique)}/{len(canonical)}")
+    print(f"  find() (firma + búsqueda): {np.median(timings) * 1e3:.2f} ms mediana")
+    print(f"  búsqueda LSH sola: {lookup_us:.0f} µs")
@@ -0,0 +1,92 @@
+"""
+Benchmark de escritura: commit+refresh por oferta (camino anterior) vs JobWriter.
+
+    python bench/bench_persistence.py [n_jobs]
+
+Usa una base SQLite temporal; no toca jobfinder.db.
+"""
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from database import create_db_and_tables, engine  # noqa: E402
+from models.JobModels import Job  # noqa: E402
+from services.DedupeService import SeenIndex  # noqa: E402
+from services.PersistenceService import JobWriter  # noqa: E402
+
+
+def make_jobs(n: int, prefix: str):
+    return [
+        Job(
+            id=f"https://example.com/{prefix}/{i}",
+            title="Python Developer",
+            company="ACME",
+            location="Argentina",
+            url=f"https://example.com/{prefix}/{i}",
+            description="Buscamos Python developer con FastAPI y PostgreSQL. " * 40,
+            ai_match_score=i % 100,
+            ai_summary="Veredicto de prueba",
+            is_suitable=i % 3 == 0,
+            missing_skills="[]",
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_path(n: int) -> float:
+    """Réplica del loop original: journal por defecto, echo, add/commit/refresh y segundo commit."""
+    legacy_engine = create_engine(f"sqlite:///{DB_PATH}.legacy", echo=True)
+    SQLModel.metadata.create_all(legacy_engine)
+    import logging
+    logging.getLogger("sqlalchemy.engine").handlers.clear()
+    logging.getLogger("sqlalchemy.engine").addHandler(logging.NullHandler())
+    logging.getLogger("sqlalchemy.engine").propagate = False
+    jobs = make_jobs(n, "legacy")
+    started = time.perf_counter()
+    with Session(legacy_engine) as session:
+        for job in jobs:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            if job.ai_match_score >= 70 or job.is_suitable:
+                job.notified = True
+                session.add(job)
+                session.commit()
+    return time.perf_counter() - started
+
+
+def writer_path(n: int) -> float:
+    create_db_and_tables()
+    writer = JobWriter(index=SeenIndex())
+    jobs = make_jobs(n, "writer")
+    started = time.perf_counter()
+    for job in jobs:
+        job.notified = job.ai_match_score >= 70 or job.is_suitable
+        writer.add(job)
+        if writer.seconds_until_due() == 0:
+            writer.flush()
+    writer.flush()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    legacy = legacy_path(n)
+    batched = writer_path(n)
+    with engine.connect() as conn:
+        mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+    print(f"{n} ofertas")
+    print(f"  commit por oferta : {legacy:7.2f}s  ({n / legacy:8.0f} ofertas/s)")
+    print(f"  JobWriter ({mode}) : {batched:7.2f}s  ({n / batched:8.0f} ofertas/s)")
+    print(f"  speedup           : {legacy / batched:7.1f}x")
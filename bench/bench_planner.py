@@ -0,0 +1,151 @@
+"""
+Benchmark del planificador de búsquedas: cuántas llamadas ahorra y cuánta
+cobertura pierde al espaciar las búsquedas redundantes.
+
+    python bench/bench_planner.py [--terms "Python Developer,Backend Python,Django,FastAPI"] [--rounds 200]
+
+Simula ofertas que llegan a cada (país, portal) y qué términos las
+encuentran (la mayoría las trae "Python Developer"; algunas sólo "FastAPI"),
+con `limit` resultados por llamada, como jobspy. Primero todas las búsquedas
+corren cada ronda y el QueryPlanner aprende el solapamiento (en una base
+SQLite temporal); después, con ofertas nuevas, se compara correr todo contra
+correr las redundantes una vez cada `redundant_interval / min_interval`
+rondas. No toca jobfinder.db.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="jobfinder-planner-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'planner.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings  # noqa: E402
+from database import create_db_and_tables  # noqa: E402
+from services.QueryPlannerService import QueryPlanner, coverage, group_sets, key_part  # noqa: E402
+from services.SchedulerService import target_key  # noqa: E402
+
+# Qué términos encuentran cada tipo de oferta, y con qué frecuencia aparece
+KINDS = [
+    (0.50, {"python developer", "backend python"}),
+    (0.15, {"python developer", "django"}),
+    (0.10, {"python developer"}),
+    (0.05, {"python developer", "backend python", "django"}),
+    (0.08, {"backend python", "fastapi"}),
+    (0.05, {"fastapi"}),
+    (0.07, {"data engineer python"}),
+]
+LOCATIONS = {"Spain": 12, "Mexico": 10, "Argentina": 8, "Colombia": 6, "Chile": 4, "Peru": 3, "Uruguay": 2,
+             "Ecuador": 1.5, "Costa Rica": 1, "Bolivia": 0.5}
+SITES = ["linkedin", "google", "indeed"]
+
+
+class Market:
+    """Ofertas que aparecen por ronda en cada (país, portal); cada búsqueda ve las últimas `limit`."""
+
+    def __init__(self, terms, seed: int, limit: int):
+        self.terms = [t.lower() for t in terms]
+        self.rng = random.Random(seed)
+        self.limit = limit
+        self.seed = seed
+        self.postings = {(loc, site): [] for loc in LOCATIONS for site in SITES}  # (ronda, id, términos)
+
+    def tick(self, round_no: int):
+        weights = [w for w, _ in KINDS]
+        for (loc, site), postings in self.postings.items():
+            arrivals = self.rng.randint(0, int(LOCATIONS[loc] * 2))
+            for kind in self.rng.choices(KINDS, weights, k=arrivals):
+                postings.append((round_no, f"{self.seed}-{loc}-{site}-{len(postings)}", kind[1]))
+
+    def search(self, term: str, loc: str, site: str, since: int):
+        found = [job_id for r, job_id, kinds in self.postings[(loc, site)] if r >= since and term in kinds]
+        return found[-self.limit:]
+
+    def all_ids(self):
+        return {job_id for postings in self.postings.values() for _, job_id, kinds in postings
+                if kinds & set(self.terms)}
+
+
+def run_phase(market: Market, rounds: int, every: dict, planner=None):
+    """Corre `rounds` rondas; la búsqueda `key` corre cada `every[key]` rondas. Devuelve (llamadas, IDs)."""
+    calls, found, last = 0, set(), {}
+    for round_no in range(rounds):
+        market.tick(round_no)
+        for term in market.terms:
+            for loc in LOCATIONS:
+                for site in SITES:
+                    key = target_key(term, loc, site)
+                    if round_no % every.get(key, 1):
+                        continue
+                    ids = market.search(term, loc, site, last.get(key, 0))
+                    last[key] = round_no + 1
+                    calls += 1
+                    found.update(ids)
+                    if planner is not None:
+                        planner.observe(key, ids)
+    return calls, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", default="Python Developer,Backend Python,Django,FastAPI,Data Engineer Python")
+    parser.add_argument("--rounds", type=int, default=200, help="rondas de aprendizaje y de evaluación")
+    parser.add_argument("--limit", type=int, default=15, help="resultados por llamada")
+    parser.add_argument("--min-share", type=float, default=settings.QUERY_MIN_MARGINAL_SHARE)
+    parser.add_argument("--throttle", type=int, default=round(settings.QUERY_REDUNDANT_INTERVAL / settings.SCRAPE_MIN_INTERVAL),
+                        help="una de cada N rondas para las redundantes")
+    args = parser.parse_args()
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+def run(args):
+    create_db_and_tables()
+    terms = [t.strip() for t in args.terms.split(",") if t.strip()]
+    planner = QueryPlanner(min_share=args.min_share)
+
+    started = time.perf_counter()
+    calls, _ = run_phase(Market(terms, seed=1, limit=args.limit), args.rounds, {}, planner)
+    planner.flush()
+    learn_seconds = time.perf_counter() - started
+    keys = [target_key(t, loc, site) for t in terms for loc in LOCATIONS for site in SITES]
+    started = time.perf_counter()
+    planner.refresh(keys, force=True)
+    refresh_ms = (time.perf_counter() - started) * 1000
+    redundant = {key for key, s in planner.stats.items() if s.redundant}
+    sets = planner.load_sets(keys)
+    pairs = sum(len(ids) for ids in sets.values())
+    print(f"📚 Aprendizaje: {args.rounds} rondas, {calls} llamadas, {pairs} pares búsqueda-oferta ({learn_seconds:.1f}s)")
+    print(f"🧭 refresh(): {refresh_ms:.0f}ms para {len(keys)} búsquedas; {len(redundant)} redundantes\n")
+
+    by_term = planner.analyze(group_sets(sets, key_part("term")))
+    print(f"{'término':24} {'IDs':>7} {'exclus.':>8} {'marginal':>9} {'redundantes':>12}")
+    for term, s in sorted(by_term.items(), key=lambda item: -item[1].marginal):
+        flagged = sum(1 for key in redundant if key_part("term")(key) == term)
+        print(f"{term:24} {s.ids:>7} {s.exclusive:>8} {s.marginal:>9} {flagged:>9}/{len(LOCATIONS) * len(SITES)}")
+    kept, total = coverage(sets, (key for key in sets if key not in redundant))
+    print(f"\nEn lo aprendido, sin las redundantes se cubren {kept} de {total} ofertas ({kept / max(1, total):.1%})")
+
+    # Evaluación con ofertas nuevas: todo cada ronda vs plan
+    all_calls, all_found = run_phase(Market(terms, seed=2, limit=args.limit), args.rounds, {})
+    every = {key: args.throttle for key in redundant}
+    plan_calls, plan_found = run_phase(Market(terms, seed=2, limit=args.limit), args.rounds, every)
+    market = Market(terms, seed=2, limit=args.limit)
+    for round_no in range(args.rounds):
+        market.tick(round_no)
+    available = len(market.all_ids()) or 1
+    print(f"\n{'':28} {'llamadas':>10} {'ofertas':>9} {'cobertura':>10}")
+    print(f"{'todas las búsquedas':28} {all_calls:>10} {len(all_found):>9} {len(all_found) / available:>10.1%}")
+    print(f"{'con el planificador':28} {plan_calls:>10} {len(plan_found):>9} {len(plan_found) / available:>10.1%}")
+    print(f"\nAhorro: {1 - plan_calls / all_calls:.0%} de las llamadas; "
+          f"se conserva el {len(plan_found) / max(1, len(all_found)):.1%} de lo que trae correr todo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Benchmark de almacenamiento: Job con descripción inline y sin índices
+(esquema anterior) vs descripción comprimida en JobDescription + índices.
+
+    python bench/bench_storage.py [n_filas] [--desc-chars 2000] [--retention-days 30]
+
+Arma dos bases SQLite temporales con las mismas `n_filas` ofertas (por
+defecto un millón, repartidas en 90 días) y su auditoría de un perfil, mide
+tamaño de archivo y latencia de las consultas de estado (las de
+debug_status: JobProfileAudit unida a Job y ordenada por date_found), la
+carga del índice de vistos y la retención (en la base nueva, seguida de
+VACUUM). No toca jobfinder.db.
+
+`Job.ai_match_score` es del esquema anterior a los perfiles: ya no se
+escribe, y sus consultas se miden aparte como "(legado)".
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORKDIR = tempfile.mkdtemp(prefix="jobfinder-storage-")
+LEGACY_PATH = os.path.join(WORKDIR, "legacy.db")
+LEAN_PATH = os.path.join(WORKDIR, "lean.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{LEAN_PATH}"
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from database import create_db_and_tables  # noqa: E402
+import models.JobModels  # noqa: E402,F401  (registra las tablas)
+from services.DedupeService import SeenIndex  # noqa: E402
+from services.StorageService import RetentionService, compress_description, load_descriptions  # noqa: E402
+
+NEW_INDEXES = ["ix_job_date_found", "ix_job_notified"]
+
+# Texto con la redundancia de una oferta real: bloques de plantilla + vocabulario variable
+BOILERPLATE = [
+    "## Sobre nosotros\nSomos una empresa de tecnología en crecimiento con equipos distribuidos en Latinoamérica.",
+    "## Responsabilidades\n- Diseñar, desarrollar y mantener servicios backend\n- Participar en code reviews",
+    "## Requisitos\n- Experiencia con {a} y {b}\n- Conocimientos de bases de datos relacionales\n- Inglés intermedio",
+    "## Deseable\n- Experiencia con {c}\n- Conocimientos de metodologías ágiles (Scrum/Kanban)",
+    "## Beneficios\n- Trabajo remoto\n- Horario flexible\n- Capacitaciones\n- Prepaga para vos y tu familia",
+    "## Proceso\nEntrevista con RRHH, entrevista técnica con el equipo y propuesta.",
+]
+SKILLS = ["Python", "Django", "FastAPI", "PostgreSQL", "Docker", "AWS", "React", "Kubernetes", "Redis", "Kafka", "Go"]
+WORDS = ("equipo producto cliente datos plataforma calidad proyecto sistema servicio solución desarrollo "
+         "arquitectura integración análisis pagos logística salud educación finanzas comercio").split()
+
+
+def make_description(rng: random.Random, chars: int) -> str:
+    a, b, c = rng.sample(SKILLS, 3)
+    parts = [block.format(a=a, b=b, c=c) for block in rng.sample(BOILERPLATE, 4)]
+    text = "\n\n".join(parts)
+    while len(text) < chars:
+        text += "\n" + " ".join(rng.choices(WORDS, k=12)) + f" {rng.randint(0, 10 ** 6)}."
+    return text[:chars]
+
+
+def generate(n: int, chars: int, seed: int = 0):
+    """(fila de job, fila de jobprofileaudit) por oferta."""
+    rng = random.Random(seed)
+    # Como en producción, las filas se insertan en el orden en que se encuentran
+    start, step = datetime.now() - timedelta(days=90), timedelta(days=90) / max(1, n)
+    for i in range(n):
+        job_id = f"https://www.linkedin.com/jobs/view/{10 ** 9 + i}"
+        found = (start + step * i).isoformat(sep=" ")
+        analyzed = rng.random() < 0.4
+        score = rng.randint(0, 100) if analyzed else None
+        notified = analyzed and rng.random() < 0.05
+        job = (job_id, "Python Developer", f"Empresa {i % 20000}", "Argentina", job_id, found,
+               make_description(rng, chars), False, score, notified)
+        audit = (job_id, "default", round(rng.random(), 3), analyzed, score, notified, found)
+        yield job, audit
+
+
+def build(n: int, chars: int):
+    """Crea las dos bases con el esquema real; en la vieja, sin los índices nuevos y con descripción inline."""
+    for path in (LEGACY_PATH, LEAN_PATH):
+        SQLModel.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    create_db_and_tables()
+    legacy, lean = sqlite3.connect(LEGACY_PATH), sqlite3.connect(LEAN_PATH)
+    for index in NEW_INDEXES:
+        legacy.execute(f"DROP INDEX IF EXISTS {index}")
+    for conn in (legacy, lean):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+    insert_job = (
+        "INSERT INTO job (id, title, company, location, url, date_found, description, is_remote, "
+        "ai_match_score, notified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    insert_desc = "INSERT INTO jobdescription (job_id, codec, body) VALUES (?, ?, ?)"
+    insert_audit = (
+        "INSERT INTO jobprofileaudit (job_id, profile, prefilter_score, analyzed, match_score, notified, "
+        "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+    started = time.perf_counter()
+    batch, audits = [], []
+    compress_seconds = 0.0
+    for row, audit in generate(n, chars):
+        batch.append(row)
+        audits.append(audit)
+        if len(batch) >= 10_000:
+            compress_seconds += _write(legacy, lean, batch, insert_job, insert_desc)
+            for conn in (legacy, lean):
+                conn.executemany(insert_audit, audits)
+                conn.commit()
+            batch, audits = [], []
+    if batch:
+        compress_seconds += _write(legacy, lean, batch, insert_job, insert_desc)
+        for conn in (legacy, lean):
+            conn.executemany(insert_audit, audits)
+            conn.commit()
+    for conn in (legacy, lean):
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("ANALYZE")
+        conn.close()
+    return time.perf_counter() - started, compress_seconds
+
+
+def _write(legacy, lean, batch, insert_job, insert_desc) -> float:
+    legacy.executemany(insert_job, batch)
+    legacy.commit()
+    started = time.perf_counter()
+    descriptions = [(row[0], *compress_description(row[6])) for row in batch]
+    elapsed = time.perf_counter() - started
+    lean.executemany(insert_job, [row[:6] + (None,) + row[7:] for row in batch])
+    lean.executemany(insert_desc, descriptions)
+    lean.commit()
+    return elapsed
+
+
+def size_mb(path: str) -> float:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)) / 2 ** 20
+
+
+def timed(conn: sqlite3.Connection, sql: str, repeat: int = 5) -> float:
+    """Mediana en ms (la primera corrida calienta la cache de páginas y no cuenta)."""
+    conn.execute(sql).fetchall()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+# Las mismas consultas que debug_status (ventana de 7 días, un perfil)
+SINCE = "datetime('now', 'localtime', '-7 days')"
+AUDITS = (
+    "SELECT a.profile, a.match_score, a.is_suitable, a.notified, a.summary, "
+    "j.title, j.company, j.location, j.url, j.date_found "
+    "FROM jobprofileaudit a JOIN job j ON j.id = a.job_id "
+    f"WHERE {{where}} AND j.date_found >= {SINCE} AND a.profile = 'default' ORDER BY {{order}} LIMIT 10"
+)
+QUERIES = {
+    "descartadas por la IA (últimas 10)":
+        AUDITS.format(where="a.analyzed AND NOT a.notified", order="j.date_found DESC"),
+    "matches (mejores 10)": AUDITS.format(where="a.analyzed", order="a.match_score DESC, j.date_found DESC"),
+    "totales por perfil (7 días)":
+        "SELECT sum(CASE WHEN a.analyzed AND NOT a.notified THEN 1 ELSE 0 END), "
+        "sum(CASE WHEN a.analyzed THEN 0 ELSE 1 END) "
+        f"FROM jobprofileaudit a JOIN job j ON j.id = a.job_id WHERE j.date_found >= {SINCE} AND a.profile = 'default'",
+    "resumen (debug_status)":
+        "SELECT count(*), sum(CASE WHEN notified THEN 1 ELSE 0 END), "
+        f"sum(CASE WHEN date_found >= {SINCE} THEN 1 ELSE 0 END), max(date_found) FROM job",
+    "notificadas (últimas 20)": "SELECT id, title FROM job WHERE notified ORDER BY date_found DESC LIMIT 20",
+    "ofertas del último día": "SELECT count(*) FROM job WHERE date_found >= datetime('now', 'localtime', '-1 day')",
+    "(legado) conteo ai_match_score<70": "SELECT count(*) FROM job WHERE ai_match_score < 70",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--desc-chars", type=int, default=2000)
+    parser.add_argument("--retention-days", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="no borra las bases al terminar")
+    args = parser.parse_args()
+    try:
+        run(args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+def run(args):
+
+    print(f"🏗️ Generando {args.rows} ofertas ({args.desc_chars} caracteres de descripción) en {WORKDIR}...")
+    build_seconds, compress_seconds = build(args.rows, args.desc_chars)
+    print(f"   {build_seconds:.0f}s (compresión: {compress_seconds:.1f}s)\n")
+
+    legacy, lean = sqlite3.connect(LEGACY_PATH), sqlite3.connect(LEAN_PATH)
+    print(f"{'':40} {'inline':>12} {'comprimida':>12}")
+    print(f"{'tamaño de la base (MB)':40} {size_mb(LEGACY_PATH):>12.0f} {size_mb(LEAN_PATH):>12.0f}")
+    job_pages = "SELECT sum(pgsize) FROM dbstat WHERE name = 'job'"
+    try:
+        print(f"{'tabla job (MB)':40} {legacy.execute(job_pages).fetchone()[0] / 2 ** 20:>12.0f} "
+              f"{lean.execute(job_pages).fetchone()[0] / 2 ** 20:>12.0f}")
+    except sqlite3.OperationalError:
+        pass  # SQLite sin dbstat
+    for label, sql in QUERIES.items():
+        print(f"{label + ' (ms)':40} {timed(legacy, sql):>12.1f} {timed(lean, sql):>12.1f}")
+    ids_sql = "SELECT id FROM job"
+    print(f"{'lectura de todos los IDs (ms)':40} {timed(legacy, ids_sql, 3):>12.0f} {timed(lean, ids_sql, 3):>12.0f}")
+    legacy.close()
+
+    sample = [r[0] for r in lean.execute("SELECT id FROM job ORDER BY random() LIMIT 50")]
+    started = time.perf_counter()
+    load_descriptions(sample)
+    print(f"\n📄 Carga diferida de 50 descripciones: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    started = time.perf_counter()
+    index = SeenIndex()
+    index.load()
+    print(f"🗂️ SeenIndex.load: {time.perf_counter() - started:.1f}s ({len(index)} huellas)")
+
+    started = time.perf_counter()
+    removed = RetentionService(days=args.retention_days).prune()
+    prune_seconds = time.perf_counter() - started
+    before = size_mb(LEAN_PATH)
+    started = time.perf_counter()
+    lean.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    lean.execute("VACUUM")
+    lean.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    vacuum_seconds = time.perf_counter() - started
+    print(
+        f"🧹 Retención ({args.retention_days} días): {removed} ofertas en {prune_seconds:.1f}s; "
+        f"VACUUM {before:.0f} → {size_mb(LEAN_PATH):.0f} MB en {vacuum_seconds:.1f}s"
+    )
+    for label, sql in QUERIES.items():
+        print(f"   {label + ' (ms)':37} {timed(lean, sql):>12.1f}")
+
+    started = time.perf_counter()
+    index = SeenIndex()
+    index.load()
+    print(f"🗂️ SeenIndex.load tras la poda: {time.perf_counter() - started:.1f}s ({len(index)} huellas, "
+          f"incluidas las podadas)")
+    lean.close()
+
+
+if __name__ == "__main__":
+    main()
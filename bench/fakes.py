@@ -0,0 +1,277 @@
+"""
+Dobles locales de jobspy, Groq y Telegram para medir el pipeline sin red.
+
+- FakeJobSpy reemplaza a `jobspy.scrape_jobs` (DataFrames con las columnas de jobspy).
+- FakeGroq reemplaza al cliente instructor de AIService (`chat.completions.create_with_completion`).
+- FakeBot reemplaza a `telegram.Bot` (`send_message`).
+
+Los usa bench/bench_e2e.py. Registran cuándo se scrapeó y cuándo se notificó
+cada oferta (por URL, en `time.monotonic()`), para medir el tiempo hasta la alerta.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Deque, Dict, List, Optional
+
+import groq
+import httpx
+import pandas as pd
+from telegram.error import RetryAfter
+
+from services.GroqService import BatchAudit, JobAudit, JobAuditItem
+
+SKILLS = [
+    "Python", "Django", "FastAPI", "Flask", "PostgreSQL", "MySQL", "Docker", "Kubernetes", "AWS", "GCP",
+    "React", "TypeScript", "Node.js", "Java", "Spring", "Go", "Rust", "Airflow", "Spark", "Redis",
+    "Celery", "Terraform", "Kafka", "GraphQL", "Pandas",
+]
+ROLES = ["Python Developer", "Backend Engineer", "Data Engineer", "Fullstack Developer", "Software Engineer", "DevOps Engineer"]
+LEVELS = ["Junior", "Semi Senior", "Senior", "Lead", ""]
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "pe", "vi", "so", "da", "gu", "ze", "bo", "fi", "la", "cha"]
+
+
+def _vocabulary(size: int = 3000, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+VOCABULARY = _vocabulary()
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+class FakeJobSpy:
+    """
+    Reemplazo de `scrape_jobs`. Entrega en total `unique_jobs` ofertas
+    distintas, `rows_per_call` filas por llamada. De cada fila, con
+    probabilidad `dup_rate` se repite una oferta ya entregada (misma URL con
+    otro query string, como pasa entre búsquedas) y con `near_dup_rate` se
+    publica una ya entregada con otra URL (casi-duplicado entre portales).
+    Agotadas las únicas, sólo devuelve repetidas. Cada llamada tarda
+    `latency` ± `jitter` segundos y falla con `failure_rate` (error de red) o
+    `block_rate` (429).
+    """
+
+    def __init__(
+        self,
+        unique_jobs: int,
+        rows_per_call: int,
+        dup_rate: float = 0.2,
+        near_dup_rate: float = 0.03,
+        latency: float = 0.5,
+        jitter: float = 0.3,
+        failure_rate: float = 0.0,
+        block_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.unique_jobs = unique_jobs
+        self.rows_per_call = rows_per_call
+        self.dup_rate = dup_rate
+        self.near_dup_rate = near_dup_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.block_rate = block_rate
+        self.seed = seed
+        self.calls = 0
+        self.failures = 0
+        self.rows = 0
+        # URL limpia -> momento en que se entregó por primera vez
+        self.produced_at: Dict[str, float] = {}
+        self._delivered: List[int] = []
+        self._next = 0
+        self._copies = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def produced(self) -> int:
+        return self._next
+
+    def _job(self, index: int, site: str) -> Dict[str, object]:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        skills = rng.sample(SKILLS, rng.randint(3, 6))
+        filler = " ".join(rng.choices(VOCABULARY, k=rng.randint(30, 90)))
+        level = rng.choice(LEVELS)
+        return {
+            "site": site,
+            "job_url": f"https://jobs.example/{index}",
+            "title": f"{level} {rng.choice(ROLES)}".strip(),
+            "company": f"Empresa {index % 5000}",
+            "location": rng.choice(["Buenos Aires", "Madrid", "Ciudad de México", "Bogotá", None]),
+            "date_posted": None,
+            "job_type": rng.choice(["fulltime", "contract", None]),
+            "is_remote": rng.choice([True, False, None]),
+            "min_amount": None,
+            "max_amount": None,
+            "description": (
+                f"Buscamos {level} con {', '.join(skills)}. {filler}\n\n"
+                f"Requisitos: experiencia con {', '.join(skills[:3])}. Deseable: {', '.join(skills[3:]) or 'inglés'}."
+            ),
+        }
+
+    def __call__(self, site_name=None, location: str = "", **kwargs) -> pd.DataFrame:
+        site = (site_name or ["linkedin"])[0]
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            roll = self._rng.random()
+        time.sleep(delay)
+        if roll < self.block_rate:
+            with self._lock:
+                self.failures += 1
+            raise RuntimeError(f"429 Too Many Requests ({site})")
+        if roll < self.block_rate + self.failure_rate:
+            with self._lock:
+                self.failures += 1
+            raise ConnectionError(f"Connection reset by peer ({site})")
+
+        rows = []
+        with self._lock:
+            now = time.monotonic()
+            for _ in range(self.rows_per_call):
+                r = self._rng.random()
+                fresh = self._next < self.unique_jobs
+                if self._delivered and (r < self.dup_rate or not fresh):
+                    row = self._job(self._rng.choice(self._delivered), site)
+                    row["job_url"] += f"?trk={self._rng.randint(0, 10 ** 6)}"
+                elif self._delivered and r < self.dup_rate + self.near_dup_rate:
+                    row = self._job(self._rng.choice(self._delivered), site)
+                    self._copies += 1
+                    row["job_url"] = f"https://{site}.example/copy/{self._copies}"
+                elif fresh:
+                    index = self._next
+                    self._next += 1
+                    self._delivered.append(index)
+                    row = self._job(index, site)
+                    self.produced_at[row["job_url"]] = now
+                else:
+                    break
+                rows.append(row)
+            self.rows += len(rows)
+        return pd.DataFrame(rows)
+
+
+def _rate_limit_error(retry_after: float = 1.0) -> groq.RateLimitError:
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": str(retry_after)}, request=request)
+    return groq.RateLimitError("Rate limit reached (fake)", response=response, body=None)
+
+
+class FakeGroq:
+    """
+    Reemplazo del cliente instructor de AIService. Cada llamada tarda
+    `latency` ± `jitter` segundos; con `rpm` responde 429 al pasar ese
+    límite de requests por minuto (ventana deslizante) y además con
+    probabilidad `error_rate`. Una vacante es match (score 85, apta) con
+    probabilidad `match_rate`, de forma estable por título y descripción.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        rpm: Optional[int] = None,
+        error_rate: float = 0.0,
+        match_rate: float = 0.02,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.match_rate = match_rate
+        self.calls = 0
+        self.rate_limited = 0
+        self.jobs = 0
+        self._window: Deque[float] = deque()
+        self._rng = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create_with_completion=self.create_with_completion))
+
+    def _audit(self, block: str) -> dict:
+        h = _stable_hash(block)
+        if (h % 10_000) / 10_000 < self.match_rate:
+            return {"match_score": 85, "is_suitable": True, "missing_skills": [], "seniority_mismatch": False,
+                    "short_verdict": "Stack alineado con el perfil"}
+        return {"match_score": 10 + h % 50, "is_suitable": False, "missing_skills": ["Kubernetes"],
+                "seniority_mismatch": bool(h & 1), "short_verdict": "Poca superposición técnica"}
+
+    async def create_with_completion(self, model: str, response_model, messages: List[dict], **kwargs):
+        self.calls += 1
+        now = time.monotonic()
+        if self.rpm:
+            while self._window and self._window[0] <= now - 60:
+                self._window.popleft()
+            if len(self._window) >= self.rpm:
+                self.rate_limited += 1
+                raise _rate_limit_error(self._window[0] + 60 - now)
+            self._window.append(now)
+        if self._rng.random() < self.error_rate:
+            self.rate_limited += 1
+            raise _rate_limit_error()
+        await asyncio.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+
+        content = messages[-1]["content"]
+        if response_model is BatchAudit:
+            parts = re.split(r"VACANTE #(\d+)\n", content)[1:]
+            items = [JobAuditItem(job_id=int(n), **self._audit(block)) for n, block in zip(parts[::2], parts[1::2])]
+            result, n_jobs = BatchAudit(audits=items), len(items)
+        else:
+            result, n_jobs = JobAudit(**self._audit(content.split("DATOS DE LA VACANTE:")[-1])), 1
+        self.jobs += n_jobs
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(m["content"]) for m in messages) // 4,
+            completion_tokens=60 * n_jobs,
+        )
+        return result, SimpleNamespace(usage=usage)
+
+
+class FakeBot:
+    """
+    Reemplazo de `telegram.Bot`. `send_message` tarda `latency` segundos y
+    responde RetryAfter si se pasa de `global_rate` mensajes por segundo o de
+    `per_chat_rate` por chat (ventanas de 1s; None = sin límite).
+    """
+
+    def __init__(self, token: str = "", latency: float = 0.05, global_rate: Optional[float] = 30,
+                 per_chat_rate: Optional[float] = None):
+        self.latency = latency
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.sent = 0
+        self.retry_after = 0
+        # URL -> momento en que se entregó su alerta
+        self.delivered_at: Dict[str, float] = {}
+        self._global: Deque[float] = deque()
+        self._per_chat: Dict[str, Deque[float]] = {}
+
+    @staticmethod
+    def _over(window: Deque[float], now: float, rate: Optional[float]) -> bool:
+        while window and window[0] <= now - 1.0:
+            window.popleft()
+        return rate is not None and len(window) >= rate
+
+    async def send_message(self, chat_id, text: str, parse_mode=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        now = time.monotonic()
+        chat_window = self._per_chat.setdefault(str(chat_id), deque())
+        if self._over(self._global, now, self.global_rate) or self._over(chat_window, now, self.per_chat_rate):
+            self.retry_after += 1
+            raise RetryAfter(timedelta(seconds=1))
+        self._global.append(now)
+        chat_window.append(now)
+        self.sent += 1
+        for url in re.findall(r"href='([^']+)'", text):
+            self.delivered_at.setdefault(url, now)
+        return SimpleNamespace(message_id=self.sent)
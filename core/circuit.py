@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker thread-safe.
+
+    Se abre tras `failure_threshold` fallos seguidos (o de inmediato ante un
+    bloqueo) y rechaza llamadas durante `cooldown` segundos. Pasado ese tiempo
+    deja pasar una sola llamada de prueba (half-open): si sale bien se cierra,
+    si falla se vuelve a abrir con el doble de espera, hasta `max_cooldown`.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 600.0, max_cooldown: float = 3600.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True si la llamada puede hacerse (en half-open, sólo una a la vez)."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = CLOSED
+            self.cooldown = self.base_cooldown
+            self._probing = False
+
+    def record_failure(self, blocked: bool = False):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                # La prueba falló: más espera antes del próximo intento
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self._open()
+            elif self.state == CLOSED and (blocked or self.consecutive_failures >= self.failure_threshold):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def retry_in(self) -> float:
+        """Segundos hasta que se permita la llamada de prueba (0 si no está abierto)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failures": self.failures,
+                "successes": self.successes,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "retry_in": round(retry_in, 1),
+            }
@@ -1,27 +1,126 @@
 import os
+from typing import List
 from pydantic import BaseModel
-from dotenv import load_dotenv
+from core.env import database_url
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
 
-load_dotenv()
 
 class Settings(BaseModel):
     PROJECT_NAME: str = "JobFinder"
     API_V1_STR: str = "/api/v1"
     
     # Database
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
-    if not DATABASE_URL:
-        DATABASE_URL = "sqlite:///jobfinder.db"
+    DATABASE_URL: str = database_url()
+    DB_ECHO: bool = os.getenv("DB_ECHO", "false").lower() == "true"
+    # Escritura en lote de ofertas auditadas
+    DB_WRITE_BATCH_SIZE: int = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+    DB_WRITE_INTERVAL: float = float(os.getenv("DB_WRITE_INTERVAL", "2"))
+    # Descripciones comprimidas en JobDescription: "zlib" o "zstd" (requiere el paquete zstandard)
+    DESCRIPTION_CODEC: str = os.getenv("DESCRIPTION_CODEC", "zlib")
+    # Retención: ofertas no notificadas con más de N días se borran (0 = nunca);
+    # su ID queda en SeenJob. Con RETENTION_ARCHIVE_DIR se guardan antes en JSON lines gzip
+    RETENTION_DAYS: int = int(os.getenv("RETENTION_DAYS", "30"))
+    RETENTION_INTERVAL_HOURS: float = float(os.getenv("RETENTION_INTERVAL_HOURS", "24"))
+    RETENTION_ARCHIVE_DIR: str = os.getenv("RETENTION_ARCHIVE_DIR", "")
     
-    # Groq API
-    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
-    if not GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY environment variable is required")
+    # Groq API (la exige el cliente al crearse: las consultas de sólo lectura no la necesitan)
+    GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
 
     GROQ_MODEL: str = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    # Límites de la cuenta (requests y tokens por minuto)
+    GROQ_RPM: int = int(os.getenv("GROQ_RPM", "30"))
+    GROQ_TPM: int = int(os.getenv("GROQ_TPM", "12000"))
+    GROQ_MAX_RETRIES: int = int(os.getenv("GROQ_MAX_RETRIES", "5"))
+
+    # Casi-duplicados entre portales (MinHash/LSH): similitud Jaccard mínima
+    DEDUPE_NEAR_ENABLED: bool = os.getenv("DEDUPE_NEAR_ENABLED", "true").lower() == "true"
+    DEDUPE_NEAR_THRESHOLD: float = float(os.getenv("DEDUPE_NEAR_THRESHOLD", "0.8"))
+
+    # Pre-filtro local (0 = sólo ordena, no descarta)
+    PREFILTER_ENABLED: bool = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+    PREFILTER_THRESHOLD: float = float(os.getenv("PREFILTER_THRESHOLD", "0.02"))
+    # Fracción de descartadas que se analizan igual: sin ellas la calibración
+    # (python -m services.PreFilterService) no ve nada debajo del umbral
+    PREFILTER_EXPLORE_RATE: float = float(os.getenv("PREFILTER_EXPLORE_RATE", "0.02"))
+
+    # Cache de auditorías de IA
+    AUDIT_CACHE_MAX_ENTRIES: int = int(os.getenv("AUDIT_CACHE_MAX_ENTRIES", "50000"))
+    AUDIT_CACHE_TTL_DAYS: int = int(os.getenv("AUDIT_CACHE_TTL_DAYS", "30"))
     
     # Telegram (Optional based on file list)
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     TELEGRAM_CHAT_ID: str = os.getenv("TELEGRAM_CHAT_ID", "")
+    # Perfiles (CV + chat + umbral); sin archivo se usa cv.json con TELEGRAM_CHAT_ID
+    PROFILES_FILE: str = os.getenv("PROFILES_FILE", "profiles.json")
+    NOTIFY_MIN_SCORE: int = int(os.getenv("NOTIFY_MIN_SCORE", "70"))
+    # Límites de la Bot API: ~1 msg/s por chat y ~30 msg/s en total
+    TELEGRAM_PER_CHAT_RATE: float = float(os.getenv("TELEGRAM_PER_CHAT_RATE", "1"))
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    TELEGRAM_CONCURRENCY: int = int(os.getenv("TELEGRAM_CONCURRENCY", "8"))
+    TELEGRAM_MAX_IN_FLIGHT: int = int(os.getenv("TELEGRAM_MAX_IN_FLIGHT", "50"))
+    # Digest: junta ráfagas de alertas de un chat en pocos mensajes largos
+    TELEGRAM_DIGEST: bool = os.getenv("TELEGRAM_DIGEST", "false").lower() == "true"
+    TELEGRAM_DIGEST_WINDOW: float = float(os.getenv("TELEGRAM_DIGEST_WINDOW", "3"))
+
+    # Outbox persistente de notificaciones
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))
+    # Segundos que un mensaje tomado queda invisible antes de reintentarse si no hubo ack
+    OUTBOX_VISIBILITY_TIMEOUT: float = float(os.getenv("OUTBOX_VISIBILITY_TIMEOUT", "60"))
+    OUTBOX_RETRY_DELAY: float = float(os.getenv("OUTBOX_RETRY_DELAY", "30"))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+
+    # Scraping concurrente
+    SCRAPE_MAX_WORKERS: int = int(os.getenv("SCRAPE_MAX_WORKERS", "8"))
+    SCRAPE_PER_SITE_LIMIT: int = int(os.getenv("SCRAPE_PER_SITE_LIMIT", "3"))
+    SCRAPE_PER_COUNTRY_LIMIT: int = int(os.getenv("SCRAPE_PER_COUNTRY_LIMIT", "2"))
+    SCRAPE_CYCLE_BUDGET: float = float(os.getenv("SCRAPE_CYCLE_BUDGET", "120"))
+    # Reintentos y circuit breaker por portal
+    SCRAPE_SITE_ATTEMPTS: int = int(os.getenv("SCRAPE_SITE_ATTEMPTS", "2"))
+    SCRAPE_BREAKER_THRESHOLD: int = int(os.getenv("SCRAPE_BREAKER_THRESHOLD", "3"))
+    SCRAPE_BREAKER_COOLDOWN: float = float(os.getenv("SCRAPE_BREAKER_COOLDOWN", "600"))
+    SCRAPE_BREAKER_MAX_COOLDOWN: float = float(os.getenv("SCRAPE_BREAKER_MAX_COOLDOWN", "3600"))
+    # Scheduler adaptativo: intervalo por búsqueda y tope global de búsquedas por hora
+    SCRAPE_MIN_INTERVAL: float = float(os.getenv("SCRAPE_MIN_INTERVAL", "300"))
+    SCRAPE_MAX_INTERVAL: float = float(os.getenv("SCRAPE_MAX_INTERVAL", "21600"))
+    SCRAPE_HOURLY_BUDGET: int = int(os.getenv("SCRAPE_HOURLY_BUDGET", "240"))
+    SCRAPE_MAX_HOURS_OLD: int = int(os.getenv("SCRAPE_MAX_HOURS_OLD", "24"))
+
+    # Búsquedas: términos x ubicaciones x portales (separados por coma; ubicaciones
+    # vacío = todos los países de main.SEARCH_LOCATIONS)
+    SEARCH_TERMS: List[str] = _csv(os.getenv("SEARCH_TERMS", "Python Developer"))
+    SEARCH_LOCATIONS: List[str] = _csv(os.getenv("SEARCH_LOCATIONS", ""))
+    SEARCH_SITES: List[str] = _csv(os.getenv("SEARCH_SITES", "linkedin,google,indeed"))
+    # Planificador: aprende de los últimos N días cuántas ofertas aporta cada búsqueda
+    # que no traigan las demás; con al menos QUERY_MIN_EVIDENCE IDs y un aporte
+    # marginal menor a QUERY_MIN_MARGINAL_SHARE, la búsqueda se sondea cada QUERY_REDUNDANT_INTERVAL
+    QUERY_PLANNER_ENABLED: bool = os.getenv("QUERY_PLANNER_ENABLED", "true").lower() == "true"
+    QUERY_OVERLAP_DAYS: int = int(os.getenv("QUERY_OVERLAP_DAYS", "14"))
+    QUERY_MIN_EVIDENCE: int = int(os.getenv("QUERY_MIN_EVIDENCE", "50"))
+    QUERY_MIN_MARGINAL_SHARE: float = float(os.getenv("QUERY_MIN_MARGINAL_SHARE", "0.1"))
+    QUERY_REDUNDANT_INTERVAL: float = float(os.getenv("QUERY_REDUNDANT_INTERVAL", "86400"))
+
+    # Varias instancias contra la misma base: búsquedas y ofertas se reparten con leases
+    LEASES_ENABLED: bool = os.getenv("LEASES_ENABLED", "false").lower() == "true"
+    # Vacío = hostname-pid
+    INSTANCE_ID: str = os.getenv("INSTANCE_ID", "")
+    LEASE_TTL: float = float(os.getenv("LEASE_TTL", "900"))
+
+    # Métricas: endpoint Prometheus local (0 = apagado) y resumen por ciclo en JSON lines
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_SUMMARY_FILE: str = os.getenv("METRICS_SUMMARY_FILE", "")
+
+    # Pipeline
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "50"))
+    ANALYSIS_CONCURRENCY: int = int(os.getenv("ANALYSIS_CONCURRENCY", "2"))
+    # Vacantes por request al LLM (1 = sin lotes) y tope de tokens por request
+    ANALYSIS_BATCH_SIZE: int = int(os.getenv("ANALYSIS_BATCH_SIZE", "5"))
+    ANALYSIS_BATCH_TOKEN_BUDGET: int = int(os.getenv("ANALYSIS_BATCH_TOKEN_BUDGET", "6000"))
+    # Tokens máximos de descripción por vacante en el prompt
+    PROMPT_DESCRIPTION_TOKENS: int = int(os.getenv("PROMPT_DESCRIPTION_TOKENS", "700"))
 
 settings = Settings()
\ No newline at end of file
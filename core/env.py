@@ -0,0 +1,12 @@
+import os
+
+from dotenv import load_dotenv
+
+# Sólo dotenv: lo importan también las herramientas de consola, que tienen que arrancar rápido
+load_dotenv()
+
+DEFAULT_DATABASE_URL = "sqlite:///jobfinder.db"
+
+
+def database_url() -> str:
+    return os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL
@@ -0,0 +1,296 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Segundos: de un acceso a disco a un scraping lento
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.label_names}, llegaron {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def label_str(self, key: LabelValues) -> str:
+        return ",".join(f"{n}={v}" for n, v in zip(self.label_names, key))
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Un contador sólo puede crecer")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in sorted(self.snapshot().items())
+        ]
+
+
+class Gauge(_Metric):
+    """Valor puntual. Con `track`, se lee de una función al exponer (p.ej. el tamaño de una cola)."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def track(self, fn: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def untrack(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._functions.pop(key, None)
+            self._values.pop(key, None)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                values[key] = float(fn())
+            except Exception:
+                # Una fuente caída no debe romper el endpoint
+                continue
+        return values
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+            for key, v in sorted(self.snapshot().items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = TIME_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiqueta: [conteo por cubeta (no acumulado) + desborde, suma, cantidad]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[LabelValues, Tuple[int, float]]:
+        """(cantidad, suma) por etiqueta."""
+        with self._lock:
+            return {key: (entry[2], entry[1]) for key, entry in self._values.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(e[0]), e[1], e[2])) for key, e in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas del proceso, en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(
+        self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = TIME_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for m in metrics for line in m.render()) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, Any]]:
+        """Contadores e histogramas (no gauges), para calcular diferencias entre ciclos."""
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if not isinstance(m, Gauge)]
+        return {m.name: m.snapshot() for m in metrics}
+
+    def cycle_summary(self, before: Dict[str, Dict[LabelValues, Any]]) -> Dict[str, Any]:
+        """
+        Lo ocurrido desde `before` (un `snapshot` previo): por métrica, el
+        incremento de cada contador y la cantidad/suma de cada histograma,
+        por etiqueta y en total. Omite lo que no cambió.
+        """
+        summary: Dict[str, Any] = {}
+        with self._lock:
+            metrics = {name: m for name, m in self._metrics.items() if not isinstance(m, Gauge)}
+        for name, after in self.snapshot().items():
+            metric, prev = metrics[name], before.get(name, {})
+            by_label = {}
+            if isinstance(metric, Histogram):
+                for key, (count, total) in after.items():
+                    old_count, old_total = prev.get(key, (0, 0.0))
+                    if count > old_count:
+                        by_label[metric.label_str(key)] = {
+                            "count": count - old_count,
+                            "sum": round(total - old_total, 3),
+                        }
+                if by_label and not metric.label_names:
+                    summary[name] = by_label[""]
+                elif by_label:
+                    summary[name] = {
+                        "count": sum(v["count"] for v in by_label.values()),
+                        "sum": round(sum(v["sum"] for v in by_label.values()), 3),
+                        "by": by_label,
+                    }
+            else:
+                for key, value in after.items():
+                    delta = value - prev.get(key, 0.0)
+                    if delta:
+                        by_label[metric.label_str(key)] = int(delta) if float(delta).is_integer() else round(delta, 3)
+                if by_label and not metric.label_names:
+                    summary[name] = by_label[""]
+                elif by_label:
+                    summary[name] = {"total": sum(by_label.values()), "by": by_label}
+        return summary
+
+
+def start_http_server(registry: "Registry", port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Sirve `/metrics` en un thread daemon. Devuelve el servidor (para `shutdown`)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Los scrapes de Prometheus no van al log de la aplicación
+            return
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.getLogger(__name__).info(f"📈 Métricas en http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# Registro del proceso y métricas del pipeline
+registry = Registry()
+
+SCRAPE_SECONDS = registry.histogram(
+    "jobfinder_scrape_seconds", "Duración de cada scraping por portal y país", ("site", "country")
+)
+SCRAPE_REQUESTS = registry.counter(
+    "jobfinder_scrape_requests_total", "Búsquedas por portal y resultado (ok/error/blocked/circuit_open)", ("site", "result")
+)
+SCRAPED_ROWS = registry.counter("jobfinder_scraped_rows_total", "Ofertas devueltas por cada portal", ("site",))
+LLM_SECONDS = registry.histogram("jobfinder_llm_seconds", "Duración de cada llamada al LLM", ("mode",))
+LLM_TOKENS = registry.counter("jobfinder_llm_tokens_total", "Tokens consumidos en el LLM", ("mode", "kind"))
+LLM_RETRIES = registry.counter("jobfinder_llm_retries_total", "Reintentos ante errores transitorios del LLM")
+DB_FLUSH_SECONDS = registry.histogram("jobfinder_db_flush_seconds", "Duración de cada escritura en lote")
+DB_ROWS = registry.counter("jobfinder_db_rows_total", "Filas insertadas por tabla", ("table",))
+TELEGRAM_SEND_SECONDS = registry.histogram("jobfinder_telegram_send_seconds", "Duración de cada envío a Telegram")
+TELEGRAM_MESSAGES = registry.counter(
+    "jobfinder_telegram_messages_total", "Alertas procesadas por resultado (sent/retry/error)", ("result",)
+)
+JOBS = registry.counter("jobfinder_jobs_total", "Ofertas (o pares oferta-perfil) por etapa del pipeline", ("stage",))
+QUEUE_DEPTH = registry.gauge("jobfinder_queue_depth", "Elementos esperando en cada cola", ("queue",))
+CYCLE_SECONDS = registry.histogram("jobfinder_cycle_seconds", "Duración de cada ciclo completo del pipeline")
@@ -0,0 +1,85 @@
+import asyncio
+import re
+import time
+from typing import Optional
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Convierte duraciones como '7.66s', '2m59.56s', '1h2m' o '300ms' a segundos.
+    Un número sin unidad se interpreta como segundos (formato de Retry-After).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """
+    Token bucket asíncrono.
+
+    `capacity` tokens como máximo, recargados a `refill_per_sec`. `acquire`
+    espera hasta que haya saldo suficiente. `sync` permite que una fuente
+    autoritativa (p.ej. headers de rate limit de la API) corrija el saldo.
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_sec)
+        self._updated = now
+
+    def _wait_time(self, amount: float) -> float:
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_sec
+
+    async def acquire(self, amount: float = 1.0):
+        # Un pedido mayor que la capacidad nunca se completaría
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                wait = self._wait_time(amount)
+                if wait <= 0:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep(wait)
+
+    def consume(self, amount: float):
+        """Descuenta tokens sin esperar (el saldo puede quedar negativo)."""
+        self._refill()
+        self.tokens -= amount
+
+    def sync(self, remaining: Optional[float], reset_after: Optional[float] = None):
+        """Ajusta el saldo con el valor informado por el servidor."""
+        self._refill()
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining <= 0 and reset_after:
+                self.block_for(reset_after)
+
+    def block_for(self, seconds: float):
+        """Bloquea el bucket (p.ej. ante un 429 con Retry-After)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
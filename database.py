@@ -1,11 +1,73 @@
+from sqlalchemy import event, insert, inspect, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import create_engine, SQLModel, Session
 from core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=True)
+engine = create_engine(settings.DATABASE_URL, echo=settings.DB_ECHO)
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        WAL permite leer mientras se escribe y, con synchronous=NORMAL, el
+        commit no hace fsync del archivo principal (sólo en los checkpoints).
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-20000")
+        cursor.close()
+
+def insert_ignore(table):
+    """INSERT que ignora filas cuya clave primaria ya existe (SQLite/Postgres)."""
+    if engine.dialect.name == "sqlite":
+        return sqlite_insert(table).on_conflict_do_nothing()
+    if engine.dialect.name == "postgresql":
+        return pg_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+def upsert(table, columns):
+    """INSERT que, si la clave primaria ya existe, pisa `columns` con los valores nuevos (SQLite/Postgres)."""
+    if engine.dialect.name in ("sqlite", "postgresql"):
+        stmt = (sqlite_insert if engine.dialect.name == "sqlite" else pg_insert)(table)
+        return stmt.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key],
+            set_={column: stmt.excluded[column] for column in columns},
+        )
+    return insert(table)
 
 def get_session():
     with Session(engine) as session:
         yield session
 
+def _add_missing_columns():
+    """
+    create_all no altera tablas existentes: agrega las columnas nuevas
+    (todas opcionales) para que una base creada con versiones anteriores siga andando.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+
+def _add_missing_indexes():
+    """Igual que con las columnas: crea en tablas existentes los índices nuevos del modelo."""
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _add_missing_indexes()
@@ -1,31 +1,282 @@
-import asyncio
-from sqlmodel import Session, select, func
-from database import engine
-from models.JobModels import Job
-from services.RedisServices import RedisQueue
-
-async def show_status():
-    print("--- 📉 Ofertas con Score < 70 (Últimas 10) ---")
-    with Session(engine) as session:
-        # Consulta para scores bajos
-        statement = select(Job).where(Job.ai_match_score < 70).order_by(Job.date_found.desc()).limit(10)
-        results = session.exec(statement).all()
-        
-        if not results:
-            print("   (No hay ofertas con score bajo aún)")
-        
-        for job in results:
-            print(f"❌ [{job.ai_match_score}/100] {job.company} - {job.title}")
-            print(f"   Veredicto: {job.ai_summary}")
-            print(f"   URL: {job.url}\n")
-
-        # Contar total
-        count_stmt = select(func.count()).select_from(Job).where(Job.ai_match_score < 70)
-        total_low = session.exec(count_stmt).one()
-        print(f"📌 Total histórico de descartados (<70): {total_low}")
-
-    print("\n--- ℹ️ Nota ---")
-    print("Redis ha sido removido. El sistema ahora usa una cola interna en memoria.")
+"""
+Estado de JobFinder desde la base, sin levantar el stack completo.
+
+    python debug_status.py [resumen|matches|rechazadas|paises|outbox|cache] [--days 7] [--limit 20] [--json]
+
+Con SQLite lee el archivo directo (sqlite3, sólo lectura) y no importa
+SQLAlchemy, pydantic, jobspy, pandas, groq ni telegram: arranca en unos
+milisegundos. Con otra DATABASE_URL usa SQLAlchemy. No necesita GROQ_API_KEY.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from core.env import database_url
+
+# Mismo default que OUTBOX_MAX_ATTEMPTS en core.config
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# Los casi-duplicados guardan una copia de las auditorías de su canónica: no se cuentan dos veces
+ORIGINALS = "j.canonical_id IS NULL"
+
+
+class Database:
+    """Consultas de sólo lectura con parámetros `:nombre` (válidos en sqlite3 y en SQLAlchemy)."""
+
+    def __init__(self, url: str):
+        self.sqlite = url.startswith("sqlite:///")
+        if self.sqlite:
+            path = url[len("sqlite:///"):]
+            if not os.path.exists(path):
+                raise SystemExit(f"❌ No existe la base {path}")
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            self.conn.row_factory = sqlite3.Row
+            self.tables = {r[0] for r in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        else:
+            from sqlalchemy import create_engine, inspect
+
+            self.engine = create_engine(url)
+            self.tables = set(inspect(self.engine).get_table_names())
+
+    def rows(self, sql: str, **params) -> List[Dict[str, Any]]:
+        if self.sqlite:
+            return [dict(r) for r in self.conn.execute(sql, params)]
+        from sqlalchemy import text
+
+        with self.engine.connect() as conn:
+            return [dict(r._mapping) for r in conn.execute(text(sql), params)]
+
+    def one(self, sql: str, **params) -> Dict[str, Any]:
+        rows = self.rows(sql, **params)
+        return rows[0] if rows else {}
+
+    def moment(self, value: datetime) -> Any:
+        # SQLModel guarda las fechas en SQLite como texto ISO, que se compara bien como string
+        return value.isoformat(sep=" ") if self.sqlite else value
+
+    def since(self, days: float) -> Any:
+        return self.moment(datetime.now() - timedelta(days=days))
+
+
+# --- Reportes: cada uno devuelve datos serializables y los imprime aparte ---
+def summary(db: Database, args) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    if "job" in db.tables:
+        data["jobs"] = db.one(
+            "SELECT count(*) AS total, sum(CASE WHEN notified THEN 1 ELSE 0 END) AS notified, "
+            "sum(CASE WHEN date_found >= :since THEN 1 ELSE 0 END) AS recent, max(date_found) AS last_found "
+            "FROM job",
+            since=db.since(args.days),
+        )
+    if "jobprofileaudit" in db.tables:
+        data["profiles"] = db.rows(
+            "SELECT a.profile, count(*) AS total, sum(CASE WHEN a.analyzed THEN 1 ELSE 0 END) AS analyzed, "
+            "sum(CASE WHEN a.notified THEN 1 ELSE 0 END) AS notified "
+            f"FROM jobprofileaudit a JOIN job j ON j.id = a.job_id WHERE {ORIGINALS} "
+            "GROUP BY a.profile ORDER BY a.profile"
+        )
+    if "outboxmessage" in db.tables:
+        data["outbox_pending"] = db.one("SELECT count(*) AS n FROM outboxmessage")["n"]
+    if "auditcacheentry" in db.tables:
+        data["cache_entries"] = db.one("SELECT count(*) AS n FROM auditcacheentry")["n"]
+    if "seenjob" in db.tables:
+        data["pruned_seen"] = db.one("SELECT count(*) AS n FROM seenjob")["n"]
+    return data
+
+
+def print_summary(data: Dict[str, Any], args):
+    jobs = data.get("jobs")
+    if jobs:
+        print(f"📦 Ofertas: {jobs['total']} ({jobs['recent'] or 0} en {args.days:g} días), "
+              f"{jobs['notified'] or 0} notificadas. Última: {jobs['last_found'] or '-'}")
+    for p in data.get("profiles", []):
+        print(f"👤 {p['profile']}: {p['total']} auditorías, {p['analyzed']} con IA, {p['notified']} notificadas")
+    if "outbox_pending" in data:
+        print(f"📬 Outbox: {data['outbox_pending']} mensajes pendientes")
+    if "cache_entries" in data:
+        print(f"🧠 Cache de auditorías: {data['cache_entries']} entradas")
+    if "pruned_seen" in data:
+        print(f"🧹 IDs podados (siguen contando como vistos): {data['pruned_seen']}")
+
+
+def _audits(db: Database, args, where: str, order: str) -> List[Dict[str, Any]]:
+    profile = "AND a.profile = :profile" if args.profile else ""
+    return db.rows(
+        "SELECT a.profile, a.match_score, a.is_suitable, a.notified, a.summary, "
+        "j.title, j.company, j.location, j.url, j.date_found "
+        "FROM jobprofileaudit a JOIN job j ON j.id = a.job_id "
+        f"WHERE {where} AND {ORIGINALS} AND j.date_found >= :since {profile} ORDER BY {order} LIMIT :limit",
+        since=db.since(args.days), limit=args.limit, profile=args.profile,
+    )
+
+
+def matches(db: Database, args) -> List[Dict[str, Any]]:
+    if "jobprofileaudit" not in db.tables:
+        return []
+    return _audits(db, args, "a.analyzed", "a.match_score DESC, j.date_found DESC")
+
+
+def print_audits(rows: List[Dict[str, Any]], args):
+    if not rows:
+        print(f"   (Sin resultados en los últimos {args.days:g} días)")
+    for r in rows:
+        mark = "✅" if r["notified"] else ("🟡" if r["is_suitable"] else "❌")
+        print(f"{mark} [{r['match_score']}/100] {r['company']} - {r['title']} ({r['profile']})")
+        if r["summary"]:
+            print(f"   Veredicto: {r['summary']}")
+        print(f"   URL: {r['url']}")
+
+
+def rejected(db: Database, args) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"recent": [], "totals": {}}
+    if "jobprofileaudit" in db.tables:
+        data["recent"] = _audits(db, args, "a.analyzed AND NOT a.notified", "j.date_found DESC")
+        profile = "AND a.profile = :profile" if args.profile else ""
+        data["totals"] = db.one(
+            "SELECT sum(CASE WHEN a.analyzed AND NOT a.notified THEN 1 ELSE 0 END) AS by_llm, "
+            "sum(CASE WHEN a.analyzed THEN 0 ELSE 1 END) AS by_prefilter "
+            f"FROM jobprofileaudit a JOIN job j ON j.id = a.job_id WHERE {ORIGINALS} AND j.date_found >= :since {profile}",
+            since=db.since(args.days), profile=args.profile,
+        )
+    if "job" in db.tables:
+        # Auditorías de antes de los perfiles (campos ai_* de Job)
+        data["totals"]["legacy_below_70"] = db.one(
+            "SELECT count(*) AS n FROM job WHERE ai_match_score < 70"
+        )["n"]
+    return data
+
+
+def print_rejected(data: Dict[str, Any], args):
+    print(f"--- 📉 Descartadas por la IA (últimas {args.limit}) ---")
+    print_audits(data["recent"], args)
+    totals = data["totals"]
+    print(f"\n📌 En {args.days:g} días: {totals.get('by_llm') or 0} descartadas por la IA, "
+          f"{totals.get('by_prefilter') or 0} por el pre-filtro")
+    if totals.get("legacy_below_70"):
+        print(f"📌 Histórico (antes de los perfiles) con score < 70: {totals['legacy_below_70']}")
+
+
+def countries(db: Database, args) -> List[Dict[str, Any]]:
+    if "scrapetarget" not in db.tables:
+        return []
+    group = "country, site" if args.by_site else "country"
+    return db.rows(
+        f"SELECT {group}, count(*) AS targets, sum(polls) AS polls, sum(new_jobs) AS new_jobs, "
+        "sum(errors) AS errors, sum(yield_ewma) AS yield_ewma, avg(latency_ewma) AS latency, "
+        "max(last_success) AS last_success "
+        f"FROM scrapetarget GROUP BY {group} ORDER BY new_jobs DESC"
+    )
+
+
+def print_countries(rows: List[Dict[str, Any]], args):
+    if not rows:
+        print("   (El scheduler todavía no registró búsquedas)")
+    print(f"{'país':<22} {'búsquedas':>9} {'nuevas':>7} {'nuevas/b':>8} {'errores':>7} {'ewma':>6} {'seg':>5}")
+    for r in rows:
+        name = f"{r['country']}/{r['site']}" if args.by_site else r["country"]
+        per_poll = (r["new_jobs"] or 0) / r["polls"] if r["polls"] else 0.0
+        print(f"{name:<22} {r['polls'] or 0:>9} {r['new_jobs'] or 0:>7} {per_poll:>8.2f} {r['errors'] or 0:>7} "
+              f"{r['yield_ewma'] or 0:>6.2f} {r['latency'] or 0:>5.1f}")
+
+
+def outbox(db: Database, args) -> Dict[str, Any]:
+    if "outboxmessage" not in db.tables:
+        return {}
+    now, limit = db.moment(datetime.now()), OUTBOX_MAX_ATTEMPTS
+    return {
+        "totals": db.one(
+            "SELECT count(*) AS pending, "
+            "sum(CASE WHEN visible_at <= :now AND attempts < :max THEN 1 ELSE 0 END) AS ready, "
+            "sum(CASE WHEN attempts > 0 AND attempts < :max THEN 1 ELSE 0 END) AS retrying, "
+            "sum(CASE WHEN attempts >= :max THEN 1 ELSE 0 END) AS dead, min(created_at) AS oldest "
+            "FROM outboxmessage",
+            now=now, max=limit,
+        ),
+        "chats": db.rows(
+            "SELECT chat_id, count(*) AS pending FROM outboxmessage GROUP BY chat_id ORDER BY pending DESC"
+        ),
+        "errors": db.rows(
+            "SELECT id, chat_id, attempts, last_error FROM outboxmessage "
+            "WHERE last_error IS NOT NULL ORDER BY id DESC LIMIT :limit",
+            limit=min(args.limit, 10),
+        ),
+    }
+
+
+def print_outbox(data: Dict[str, Any], args):
+    if not data:
+        print("   (No hay tabla de outbox todavía)")
+        return
+    t = data["totals"]
+    print(f"📬 {t['pending']} pendientes: {t['ready'] or 0} listos para enviar, {t['retrying'] or 0} reintentando, "
+          f"{t['dead'] or 0} descartados (≥{OUTBOX_MAX_ATTEMPTS} intentos). Más viejo: {t['oldest'] or '-'}")
+    for c in data["chats"]:
+        print(f"   chat {c['chat_id']}: {c['pending']}")
+    for e in data["errors"]:
+        print(f"   ⚠️ #{e['id']} (chat {e['chat_id']}, {e['attempts']} intentos): {e['last_error']}")
+
+
+def cache(db: Database, args) -> Dict[str, Any]:
+    if "auditcacheentry" not in db.tables:
+        return {}
+    return {
+        "totals": db.one(
+            "SELECT count(*) AS entries, sum(hits) AS hits, sum(CASE WHEN hits > 0 THEN 1 ELSE 0 END) AS reused, "
+            "min(created_at) AS oldest, max(last_hit) AS last_hit FROM auditcacheentry"
+        ),
+        "models": db.rows(
+            "SELECT model, count(*) AS entries, sum(hits) AS hits FROM auditcacheentry "
+            "GROUP BY model ORDER BY entries DESC"
+        ),
+    }
+
+
+def print_cache(data: Dict[str, Any], args):
+    if not data:
+        print("   (No hay cache de auditorías todavía)")
+        return
+    t = data["totals"]
+    entries, hits = t["entries"] or 0, t["hits"] or 0
+    # Cada entrada vigente fue un miss (se guardó tras llamar al LLM); las desalojadas no cuentan
+    rate = hits / (hits + entries) if hits + entries else 0.0
+    print(f"🧠 {entries} entradas, {hits} hits (≈{rate:.0%} de aciertos), {t['reused'] or 0} reutilizadas al menos una vez")
+    print(f"   Más vieja: {t['oldest'] or '-'} | último hit: {t['last_hit'] or '-'}")
+    for m in data["models"]:
+        print(f"   {m['model']}: {m['entries']} entradas, {m['hits'] or 0} hits")
+
+
+REPORTS = {
+    "resumen": (summary, print_summary),
+    "matches": (matches, print_audits),
+    "rechazadas": (rejected, print_rejected),
+    "paises": (countries, print_countries),
+    "outbox": (outbox, print_outbox),
+    "cache": (cache, print_cache),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("report", nargs="?", default="resumen", choices=list(REPORTS))
+    parser.add_argument("--days", type=float, default=7, help="ventana en días (por fecha de hallazgo)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--profile", help="sólo las auditorías de este perfil")
+    parser.add_argument("--by-site", action="store_true", help="paises: separar por portal")
+    parser.add_argument("--json", action="store_true", help="salida en JSON")
+    parser.add_argument("--db", default=database_url(), help="DATABASE_URL (por defecto la del entorno/.env)")
+    args = parser.parse_args(argv)
+
+    collect, render = REPORTS[args.report]
+    data = collect(Database(args.db), args)
+    if args.json:
+        json.dump(data, sys.stdout, default=str, ensure_ascii=False, indent=2)
+        print()
+    else:
+        render(data, args)
+
 
 if __name__ == "__main__":
-    asyncio.run(show_status())
+    main()
@@ -2,18 +2,27 @@ import asyncio
 import json
 import logging
 import os
+import time
+from dataclasses import asdict
 from datetime import datetime
+from typing import Optional
 
 from telegram import Bot
-from telegram.constants import ParseMode
-from sqlmodel import Session, select
 
 from core.config import settings
-from database import engine, create_db_and_tables
-from models.JobModels import Job
-from services.JobServices import JobService
+from core.metrics import CYCLE_SECONDS, QUEUE_DEPTH, registry, start_http_server
+from database import create_db_and_tables
+from services.ScrapeService import ScrapeService
+from services.SchedulerService import AdaptiveScheduler
+from services.QueryPlannerService import QueryPlanner
+from services.PipelineService import JobPipeline, PipelineStats
 from services.GroqService import ai_service
-from services.RedisServices import MemoryQueue
+from services.DedupeService import near_dup_index, seen_index
+from services.LeaseService import JobLeases, instance_id
+from services.ProfileService import DEFAULT_PROFILE, Profile, load_profiles
+from services.RedisServices import OutboxQueue
+from services.StorageService import RetentionService
+from services.TelegramService import TelegramSender
 
 # Configuración de Logging
 logging.basicConfig(
@@ -21,209 +30,239 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Cargar datos del CV
-try:
-    with open("cv.json", "r") as f:
-        CV_DATA = json.load(f)
-except FileNotFoundError:
-    logger.error("cv.json no encontrado. Usando diccionario vacío.")
-    CV_DATA = {}
+# Perfiles (CV + chat + umbral) de profiles.json, o cv.json + TELEGRAM_CHAT_ID.
+# Viven todo el proceso: el IDF del pre-filtro de cada uno aprende de cada ciclo
+PROFILES = load_profiles()
 
-def process_jobs_sync():
+# Términos a buscar en cada país y portal (SEARCH_TERMS en .env)
+SEARCH_TERMS = settings.SEARCH_TERMS
+
+# Búsqueda en todos los países de habla hispana
+ALL_LOCATIONS = [
+    {"loc": "Argentina", "country": "argentina"},
+    {"loc": "Spain", "country": "spain"},
+    {"loc": "Mexico", "country": "mexico"},
+    {"loc": "Colombia", "country": "colombia"},
+    {"loc": "Chile", "country": "chile"},
+    {"loc": "Peru", "country": "peru"},
+    {"loc": "Ecuador", "country": "ecuador"},
+    {"loc": "Venezuela", "country": "venezuela"},
+    {"loc": "Guatemala", "country": "guatemala"},
+    {"loc": "Cuba", "country": "cuba"},
+    {"loc": "Bolivia", "country": "bolivia"},
+    {"loc": "Dominican Republic", "country": "dominican republic"},
+    {"loc": "Honduras", "country": "honduras"},
+    {"loc": "Paraguay", "country": "paraguay"},
+    {"loc": "El Salvador", "country": "el salvador"},
+    {"loc": "Nicaragua", "country": "nicaragua"},
+    {"loc": "Costa Rica", "country": "costa rica"},
+    {"loc": "Panama", "country": "panama"},
+    {"loc": "Uruguay", "country": "uruguay"},
+]
+# SEARCH_LOCATIONS en .env acota la lista (p. ej. "Argentina,Spain")
+SEARCH_LOCATIONS = [
+    t for t in ALL_LOCATIONS
+    if not settings.SEARCH_LOCATIONS or t["loc"].lower() in {loc.lower() for loc in settings.SEARCH_LOCATIONS}
+]
+
+def format_job_message(job_data: dict) -> str:
+    """Arma el mensaje HTML de Telegram para una oferta."""
+    # Formatear skills faltantes
+    skills_text = ", ".join(job_data['missing_skills']) if job_data['missing_skills'] else "Ninguna detectada"
+    seniority_alert = "\n⚠️ <b>Alerta:</b> Posible discrepancia de seniority" if job_data['seniority_mismatch'] else ""
+    suitability_icon = "✅" if job_data['is_suitable'] else "⚖️"
+    profile = job_data.get('profile')
+    profile_line = f"👤 <b>Perfil:</b> {profile}\n" if profile and profile != DEFAULT_PROFILE else ""
+
+    return (
+        f"🚀 <b>{suitability_icon} Oportunidad Encontrada</b>\n\n"
+        f"{profile_line}"
+        f"🏢 <b>Empresa:</b> {job_data['company']}\n"
+        f"💼 <b>Puesto:</b> {job_data['title']}\n"
+        f"📍 <b>Ubicación:</b> {job_data['location']}\n\n"
+        f"🎯 <b>Match:</b> <code>{job_data['match_score']}/100</code>\n"
+        f"📉 <b>Skills Faltantes:</b> <i>{skills_text}</i>"
+        f"{seniority_alert}\n\n"
+        f"📝 <b>Veredicto IA:</b>\n{job_data['summary']}\n\n"
+        f"<a href='{job_data['url']}'>🔗 Ver Vacante en Portal</a>"
+    )
+
+def format_site_metrics(metrics: dict) -> str:
+    """Resumen de una línea del circuit breaker de cada portal."""
+    parts = []
+    for site, m in metrics.items():
+        detail = f"{m['failures']} fallos, {m['rejected']} omitidas"
+        if m["state"] != "closed":
+            detail += f", reintento en {m['retry_in']:.0f}s"
+        parts.append(f"{site}={m['state']} ({detail})")
+    return " | ".join(parts) or "sin datos"
+
+def record_cycle_summary(record: dict):
+    """Registra el resumen del ciclo: al log y, con METRICS_SUMMARY_FILE, como una línea JSON."""
+    line = json.dumps(record, ensure_ascii=False)
+    logger.info(f"📈 Resumen del ciclo: {line}")
+    if settings.METRICS_SUMMARY_FILE:
+        with open(settings.METRICS_SUMMARY_FILE, "a") as f:
+            f.write(line + "\n")
+
+async def process_jobs(queue: OutboxQueue, scheduler: Optional[AdaptiveScheduler] = None) -> PipelineStats:
     """
-    Función síncrona que:
-    1. Scrapea ofertas (bloqueante)
-    2. Verifica duplicados en DB
-    3. Analiza con IA (bloqueante)
-    4. Guarda resultados
-    5. Retorna lista de notificaciones
+    Ejecuta un ciclo completo como pipeline:
+    1. Scrapea ofertas (concurrente, con presupuesto de tiempo por ciclo). Con
+       `scheduler` sólo corren las búsquedas vencidas; sin él, todas.
+    2. Deduplica en el ciclo y verifica duplicados en DB
+    3. Analiza con IA cada oferta nueva para cada perfil
+    4. Guarda resultados (una auditoría por oferta y perfil)
+    5. Deja cada notificación en la outbox (al chat del perfil), en la misma transacción que el job
+    Las etapas corren en paralelo, unidas por colas acotadas.
     """
-    job_service = JobService()
-    logger.info("🔎 Iniciando scraping de ofertas...")
-    
-    # Búsqueda en todos los países de habla hispana
-    search_locations = [
-        {"loc": "Argentina", "country": "argentina"},
-        {"loc": "Spain", "country": "spain"},
-        {"loc": "Mexico", "country": "mexico"},
-        {"loc": "Colombia", "country": "colombia"},
-        {"loc": "Chile", "country": "chile"},
-        {"loc": "Peru", "country": "peru"},
-        {"loc": "Ecuador", "country": "ecuador"},
-        {"loc": "Venezuela", "country": "venezuela"},
-        {"loc": "Guatemala", "country": "guatemala"},
-        {"loc": "Cuba", "country": "cuba"},
-        {"loc": "Bolivia", "country": "bolivia"},
-        {"loc": "Dominican Republic", "country": "dominican republic"},
-        {"loc": "Honduras", "country": "honduras"},
-        {"loc": "Paraguay", "country": "paraguay"},
-        {"loc": "El Salvador", "country": "el salvador"},
-        {"loc": "Nicaragua", "country": "nicaragua"},
-        {"loc": "Costa Rica", "country": "costa rica"},
-        {"loc": "Panama", "country": "panama"},
-        {"loc": "Uruguay", "country": "uruguay"},
-    ]
-    
-    all_jobs = []
-    for target in search_locations:
-        try:
-            logger.info(f"🔎 Buscando 'Python Developer' en {target['loc']}...")
-            jobs = job_service.get_latest_jobs(
-                term="Python Developer", 
-                location=target["loc"], 
-                country=target["country"],
-                limit=15
-            )
-            all_jobs.extend(jobs)
-        except Exception as e:
-            logger.error(f"❌ Error buscando en {target['loc']}: {e}")
+    def render_notification(job_data: dict, profile: Profile):
+        chat_id = profile.chat_id or settings.TELEGRAM_CHAT_ID
+        if chat_id:
+            return chat_id, format_job_message(job_data)
+        logger.warning(f"Perfil {profile.name} sin chat_id ni TELEGRAM_CHAT_ID. No se enviarán mensajes.")
+        return None
 
-    # Deduplicar por ID (URL)
-    unique_jobs_map = {job.id: job for job in all_jobs}
-    scraped_jobs = list(unique_jobs_map.values())
-    
-    logger.info(f"✅ Se encontraron {len(scraped_jobs)} candidatos únicos totales en todos los países.")
-    
-    notifications = []
-    
-    with Session(engine) as session:
-        for job in scraped_jobs:
-            # Verificar si ya existe por ID (URL)
-            existing_job = session.get(Job, job.id)
-            if existing_job:
-                continue
-
-            logger.info(f"🤖 Analizando: {job.title} @ {job.company}")
-            
-            # Análisis de IA
-            audit = ai_service.analyze_job(job, CV_DATA)
-
-            # Logging detallado
-            logger.info(f"📊 Análisis para {job.company} - {job.title}:")
-            logger.info(f"   🎯 Score: {audit.match_score}/100 | {'✅ Apto' if audit.is_suitable else '❌ No apto'}")
-            logger.info(f"   📝 Veredicto: {audit.short_verdict}")
-            if audit.missing_skills:
-                logger.info(f"   📉 Faltantes: {', '.join(audit.missing_skills)}")
-            if audit.seniority_mismatch:
-                logger.info(f"   ⚠️ Alerta: Discrepancia de Seniority")
-
-            # Actualizar campos del modelo con el resultado de la auditoría
-            job.ai_match_score = audit.match_score
-            job.ai_summary = audit.short_verdict
-            # job.is_junior removed as requested
-            job.is_suitable = audit.is_suitable
-            job.seniority_mismatch = audit.seniority_mismatch
-            # Serializamos la lista de skills faltantes a JSON string
-            job.missing_skills = json.dumps(audit.missing_skills) if audit.missing_skills else "[]"
-
-            # Guardar en DB
-            session.add(job)
-            session.commit()
-            session.refresh(job)
-
-            # Criterio de Notificación: Score >= 70 OR marcado como suitable
-            if (job.ai_match_score >= 70 or job.is_suitable) and not job.notified:
-                notifications.append({
-                    "title": job.title,
-                    "company": job.company,
-                    "location": job.location,
-                    "match_score": job.ai_match_score,
-                    "summary": job.ai_summary,
-                    "url": job.url,
-                    "missing_skills": json.loads(job.missing_skills) if job.missing_skills else [],
-                    "seniority_mismatch": job.seniority_mismatch,
-                    "is_suitable": job.is_suitable
-                })
-                
-                # Marcar como notificado
-                job.notified = True
-                session.add(job)
-                session.commit()
-    
-    return notifications
+    scrape_service = ScrapeService()
+    if scheduler is not None:
+        tasks = await asyncio.get_running_loop().run_in_executor(None, scheduler.due_tasks)
+    else:
+        tasks = [
+            task
+            for term in SEARCH_TERMS
+            for task in scrape_service.build_tasks(term=term, targets=SEARCH_LOCATIONS, sites=settings.SEARCH_SITES, limit=15)
+        ]
+    if not tasks:
+        return PipelineStats()
+    logger.info(f"🔎 Iniciando scraping de ofertas ({len(tasks)} búsquedas)...")
+    metrics_before = registry.snapshot()
+    started = time.monotonic()
 
-async def scraper_scheduler(queue: MemoryQueue):
-    """Loop infinito que ejecuta el scraping cada X tiempo."""
-    loop = asyncio.get_running_loop()
+    pipeline = JobPipeline(
+        profiles=PROFILES,
+        outbox=queue,
+        render_notification=render_notification,
+        scrape_service=scrape_service,
+        near_index=near_dup_index if settings.DEDUPE_NEAR_ENABLED else None,
+        analyze_workers=settings.ANALYSIS_CONCURRENCY,
+        batch_size=settings.ANALYSIS_BATCH_SIZE,
+        queue_size=settings.PIPELINE_QUEUE_SIZE,
+        on_scrape_result=scheduler.record if scheduler is not None else None,
+        leases=JobLeases(instance_id()) if settings.LEASES_ENABLED else None,
+    )
+    stats = await pipeline.run(tasks)
+    elapsed = time.monotonic() - started
+    CYCLE_SECONDS.observe(elapsed)
+    if scheduler is not None:
+        await asyncio.get_running_loop().run_in_executor(None, scheduler.save)
+        logger.info("📅 Búsquedas (mejor y peor rendimiento):\n" + "\n".join(scheduler.summary()))
+    logger.info(
+        f"✅ Ciclo: {stats.scraped} scrapeadas, {stats.duplicates} duplicadas, "
+        f"{stats.already_seen} ya vistas, {stats.leased_elsewhere} tomadas por otra instancia, {stats.near_duplicates} casi-duplicadas, {stats.new} nuevas, {stats.filtered} descartadas por pre-filtro, {stats.analyzed} analizadas, {stats.errors} con error, "
+        f"{stats.notified} notificadas."
+    )
+    if ai_service.cache is not None:
+        logger.info(f"🗃️ Cache de auditorías: {ai_service.cache.stats()}")
+    logger.info(f"🧾 Uso de tokens (individual vs lote): {ai_service.usage_summary()}")
+    if hasattr(scrape_service.job_service, "site_metrics"):
+        logger.info(f"🔌 Portales: {format_site_metrics(scrape_service.job_service.site_metrics())}")
+    record_cycle_summary({
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(elapsed, 1),
+        "tasks": len(tasks),
+        "stats": asdict(stats),
+        "metrics": registry.cycle_summary(metrics_before),
+    })
+    return stats
 
+async def scraper_scheduler(queue: OutboxQueue):
+    """
+    Loop infinito de scraping. Cada búsqueda (término, ubicación, portal)
+    tiene su propio intervalo según cuántas ofertas nuevas trae; el loop
+    duerme hasta que vence la próxima. El planificador espacia las búsquedas
+    que casi sólo traen ofertas que ya trae otra.
+    """
+    scheduler = AdaptiveScheduler(
+        terms=SEARCH_TERMS,
+        targets=SEARCH_LOCATIONS,
+        sites=settings.SEARCH_SITES,
+        limit=15,
+        owner=instance_id() if settings.LEASES_ENABLED else None,
+        planner=QueryPlanner() if settings.QUERY_PLANNER_ENABLED else None,
+    )
     while True:
         try:
             logger.info("⏳ Ejecutando ciclo de scraping...")
-            
-            # Ejecutar la lógica síncrona en un thread pool para no bloquear el loop async
-            jobs_to_notify = await loop.run_in_executor(None, process_jobs_sync)
-            
-            if jobs_to_notify:
-                logger.info(f"📨 Encolando {len(jobs_to_notify)} notificaciones...")
-                
-                if settings.TELEGRAM_CHAT_ID:
-                    for job_data in jobs_to_notify:
-                        # Formatear skills faltantes
-                        skills_text = ", ".join(job_data['missing_skills']) if job_data['missing_skills'] else "Ninguna detectada"
-                        seniority_alert = "\n⚠️ <b>Alerta:</b> Posible discrepancia de seniority" if job_data['seniority_mismatch'] else ""
-                        suitability_icon = "✅" if job_data['is_suitable'] else "⚖️"
-
-                        msg_text = (
-                            f"🚀 <b>{suitability_icon} Oportunidad Encontrada</b>\n\n"
-                            f"🏢 <b>Empresa:</b> {job_data['company']}\n"
-                            f"💼 <b>Puesto:</b> {job_data['title']}\n"
-                            f"📍 <b>Ubicación:</b> {job_data['location']}\n\n"
-                            f"🎯 <b>Match:</b> <code>{job_data['match_score']}/100</code>\n"
-                            f"📉 <b>Skills Faltantes:</b> <i>{skills_text}</i>"
-                            f"{seniority_alert}\n\n"
-                            f"📝 <b>Veredicto IA:</b>\n{job_data['summary']}\n\n"
-                            f"<a href='{job_data['url']}'>🔗 Ver Vacante en Portal</a>"
-                        )
-                        await queue.enqueue(settings.TELEGRAM_CHAT_ID, msg_text)
-                else:
-                    logger.warning("TELEGRAM_CHAT_ID no configurado. No se enviarán mensajes.")
-
-            logger.info("💤 Ciclo finalizado. Durmiendo 5 minutos.")
-            
+            await process_jobs(queue, scheduler)
         except Exception as e:
             logger.error(f"❌ Error en scraper_scheduler: {e}")
-        
-        # Esperar 5 minutos (300 segundos)
-        await asyncio.sleep(300)
 
-async def telegram_worker(queue: MemoryQueue):
-    """Consume mensajes de la cola de memoria y los envía a Telegram."""
+        wait = scheduler.seconds_until_next()
+        logger.info(f"💤 Ciclo finalizado. Próxima búsqueda en {wait / 60:.1f} minutos.")
+        await asyncio.sleep(wait)
+
+async def telegram_worker(queue: OutboxQueue):
+    """
+    Consume mensajes de la outbox y los envía a Telegram respetando los
+    límites por chat y globales. Cada mensaje se confirma (ack) recién después
+    de enviarlo; si falla o Telegram pide esperar, vuelve a la cola.
+    """
     if not settings.TELEGRAM_BOT_TOKEN:
         logger.warning("⚠️ TELEGRAM_BOT_TOKEN no configurado. Worker de Telegram pausado.")
         return
 
+    # El gauge se evalúa en el thread del servidor de métricas, no en el event loop
+    QUEUE_DEPTH.track(queue.pending, queue="outbox")
     bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-    logger.info("📡 Worker de Telegram iniciado (Cola Interna)...")
+    sender = TelegramSender(bot, queue)
+    pending = await asyncio.to_thread(queue.pending)
+    logger.info(
+        f"📡 Worker de Telegram iniciado (Outbox, {pending} pendientes"
+        f"{', modo digest' if sender.digest else ''})..."
+    )
+    await sender.run()
 
+async def retention_worker():
+    """
+    Cada RETENTION_INTERVAL_HOURS borra las ofertas no notificadas más
+    viejas que RETENTION_DAYS (sus IDs quedan en el set de vistos).
+    """
+    if settings.RETENTION_DAYS <= 0:
+        return
+    retention = RetentionService(near_index=near_dup_index if settings.DEDUPE_NEAR_ENABLED else None)
+    loop = asyncio.get_running_loop()
     while True:
         try:
-            msg_data = await queue.dequeue()
-            if msg_data:
-                chat_id = msg_data.get("chat_id")
-                text = msg_data.get("text")
-                if chat_id and text:
-                    await bot.send_message(
-                        chat_id=chat_id, text=text, parse_mode=ParseMode.HTML
-                    )
-                    logger.info(f"✅ Mensaje enviado a {chat_id}")
+            await loop.run_in_executor(None, retention.prune)
         except Exception as e:
-            logger.error(f"❌ Error en telegram_worker: {e}")
-            await asyncio.sleep(5)
+            logger.error(f"❌ Error en la retención: {e}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL_HOURS * 3600)
 
 async def main():
     print(f"🚀 Iniciando {settings.PROJECT_NAME} Orchestrator (Redis-Free)...")
+    if not settings.GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY environment variable is required")
     
     # 1. Inicializar DB
     create_db_and_tables()
     print("💾 Base de datos inicializada.")
+    if settings.LEASES_ENABLED:
+        print(f"🤝 Modo distribuido: instancia {instance_id()}")
+    if settings.METRICS_PORT:
+        start_http_server(registry, settings.METRICS_PORT, settings.METRICS_HOST)
+    # Índice de IDs ya vistos (deduplicación sin una consulta por oferta)
+    seen_index.load()
+    if settings.DEDUPE_NEAR_ENABLED:
+        near_dup_index.load()
     
-    # 2. Inicializar Cola compartida en memoria
-    shared_queue = MemoryQueue()
+    # 2. Outbox persistente compartida (sobrevive a reinicios)
+    shared_queue = OutboxQueue()
     
     # 3. Iniciar tareas concurrentes
     await asyncio.gather(
         telegram_worker(shared_queue),
-        scraper_scheduler(shared_queue)
+        scraper_scheduler(shared_queue),
+        retention_worker(),
     )
 
 if __name__ == "__main__":
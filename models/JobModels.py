@@ -1,5 +1,6 @@
 from datetime import datetime, date
 from typing import Optional, List
+from sqlalchemy import BigInteger, Column, Integer
 from sqlmodel import SQLModel, Field, JSON
 
 class Job(SQLModel, table=True):
@@ -8,13 +9,16 @@ class Job(SQLModel, table=True):
     company: str
     location: str
     url: str
-    date_found: datetime = Field(default_factory=datetime.now)
+    date_found: datetime = Field(default_factory=datetime.now, index=True)
 
+    # En memoria durante el pipeline; en la base queda NULL y el texto va
+    # comprimido a JobDescription (las filas viejas se mueven con `compact`)
     description: Optional[str] = Field(default=None)
     salary: Optional[str] = Field(default=None)
     is_remote: bool = Field(default=False)
 
     # --- Capa de Inteligencia ---
+    # (Histórico, perfil único: las auditorías nuevas van a JobProfileAudit)
     ai_match_score: Optional[int] = Field(default=None)
     ai_summary: Optional[str] = Field(default=None)
     is_junior: Optional[bool] = Field(default=None)
@@ -24,7 +28,97 @@ class Job(SQLModel, table=True):
     seniority_mismatch: Optional[bool] = Field(default=None)
     missing_skills: Optional[str] = Field(default=None)  # Guardaremos la lista como JSON string
 
+    # Puntaje del pre-filtro local (histórico: ahora va en JobProfileAudit)
+    prefilter_score: Optional[float] = Field(default=None)
+
+    # Casi-duplicados: firma MinHash y oferta canónica cuya auditoría se reutiliza
+    minhash: Optional[bytes] = Field(default=None)
+    canonical_id: Optional[str] = Field(default=None, index=True)
+
+    notified: bool = Field(default=False, index=True)
+
+class JobDescription(SQLModel, table=True):
+    # Descripción de una oferta, comprimida (se lee sólo cuando hace falta)
+    job_id: str = Field(primary_key=True)
+    codec: str  # "zlib" o "zstd"
+    body: bytes
+
+class SeenJob(SQLModel, table=True):
+    # Huella de 64 bits (con signo) del ID de una oferta borrada por la retención:
+    # sigue contando como vista aunque ya no esté en Job
+    # En SQLite, INTEGER PRIMARY KEY es el rowid: 8 bytes por fila y sin índice aparte
+    id_hash: int = Field(
+        sa_column=Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)
+    )
+
+class JobProfileAudit(SQLModel, table=True):
+    # Auditoría de una oferta para un perfil (CV + chat); reemplaza a los campos ai_* de Job
+    job_id: str = Field(primary_key=True)
+    profile: str = Field(primary_key=True, index=True)
+    prefilter_score: Optional[float] = Field(default=None)
+    analyzed: bool = Field(default=False)  # False = descartada por el pre-filtro, sin LLM
+    match_score: Optional[int] = Field(default=None, index=True)
+    summary: Optional[str] = Field(default=None)
+    is_suitable: Optional[bool] = Field(default=None)
+    seniority_mismatch: Optional[bool] = Field(default=None)
+    missing_skills: Optional[str] = Field(default=None)  # lista como JSON string
     notified: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class AuditCacheEntry(SQLModel, table=True):
+    # Hash de (oferta normalizada + CV + modelo + versión de prompt)
+    key: str = Field(primary_key=True)
+    audit_json: str
+    model: str
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+    last_hit: datetime = Field(default_factory=datetime.now, index=True)
+    hits: int = Field(default=0)
+
+class ScrapeTarget(SQLModel, table=True):
+    # Estado del scheduler adaptativo por (término, ubicación, portal)
+    key: str = Field(primary_key=True)
+    term: str
+    location: str
+    country: str
+    site: str
+    interval: float  # segundos entre polls
+    next_due: datetime = Field(default_factory=datetime.now, index=True)
+    last_polled: Optional[datetime] = Field(default=None)
+    last_success: Optional[datetime] = Field(default=None)
+    polls: int = Field(default=0)
+    errors: int = Field(default=0)
+    new_jobs: int = Field(default=0)
+    empty_streak: int = Field(default=0)
+    yield_ewma: float = Field(default=0.0)  # ofertas nuevas por poll (media móvil)
+    latency_ewma: float = Field(default=0.0)  # segundos por poll (media móvil)
+    # Lease de la instancia que la está corriendo (modo distribuido)
+    leased_by: Optional[str] = Field(default=None)
+    lease_until: Optional[datetime] = Field(default=None)
+
+class QueryResult(SQLModel, table=True):
+    # Qué ofertas trajo cada búsqueda (huella de 64 bits del ID) en la ventana del
+    # planificador: de acá sale cuánto se solapan las búsquedas entre sí
+    key: str = Field(primary_key=True)
+    id_hash: int = Field(sa_column=Column(BigInteger, primary_key=True, autoincrement=False))
+    seen_at: datetime = Field(default_factory=datetime.now, index=True)
+
+class JobLease(SQLModel, table=True):
+    # Oferta nueva tomada por una instancia para analizarla (modo distribuido)
+    job_id: str = Field(primary_key=True)
+    owner: str
+    lease_until: datetime = Field(index=True)
+
+class OutboxMessage(SQLModel, table=True):
+    # Notificación pendiente; se borra al confirmar el envío (ack)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    chat_id: str
+    text: str
+    job_id: Optional[str] = Field(default=None, index=True)
+    created_at: datetime = Field(default_factory=datetime.now)
+    # Hasta cuándo queda invisible (tomado por un worker o esperando reintento)
+    visible_at: datetime = Field(default_factory=datetime.now, index=True)
+    attempts: int = Field(default=0)
+    last_error: Optional[str] = Field(default=None)
 
 class Message(SQLModel, table=True):
     id: str = Field(primary_key=True)
@@ -0,0 +1,137 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session, select, func, delete
+
+from core.config import settings
+from database import engine
+from models.JobModels import AuditCacheEntry, Job
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# Subir ante cualquier cambio en cómo se arma la clave (incluido normalize_text):
+# las entradas con la versión anterior dejan de encontrarse y vencen por TTL/LRU.
+# k2: normalize_text pasa a ASCII (descarta emojis y símbolos no latinos)
+CACHE_KEY_VERSION = "k2"
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Minúsculas, sin acentos ni puntuación/markdown y con espacios colapsados."""
+    if not text:
+        return ""
+    # NFKD separa los acentos; al pasar a ASCII se descartan (junto con emojis)
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD_RE.sub(" ", text.lower()).strip()
+
+
+def audit_cache_key(job: Job, cv_fingerprint: str, model: str, prompt_version: str) -> str:
+    """
+    Clave por contenido: la misma oferta publicada con otra URL produce la
+    misma clave, y cambiar el CV, el modelo, el prompt o la normalización
+    (CACHE_KEY_VERSION) la invalida.
+    """
+    hasher = hashlib.sha256()
+    for part in (
+        CACHE_KEY_VERSION,
+        normalize_text(job.title),
+        normalize_text(job.company),
+        normalize_text(job.description),
+        cv_fingerprint,
+        model,
+        prompt_version,
+    ):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+class AuditCache:
+    """
+    Cache persistente (tabla AuditCacheEntry) de auditorías de IA.
+
+    Las entradas vencen a los `ttl` y, si se supera `max_entries`, se eliminan
+    las menos usadas recientemente. Lleva contadores de hits/misses.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.AUDIT_CACHE_MAX_ENTRIES,
+        ttl: timedelta = timedelta(days=settings.AUDIT_CACHE_TTL_DAYS),
+        evict_every: int = 100,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve el JSON de la auditoría cacheada o None."""
+        with Session(engine) as session:
+            entry = session.get(AuditCacheEntry, key)
+            if entry is None or entry.created_at < datetime.now() - self.ttl:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.hits += 1
+            entry.last_hit = datetime.now()
+            session.add(entry)
+            session.commit()
+            with self._lock:
+                self.hits += 1
+            return entry.audit_json
+
+    def put(self, key: str, audit_json: str, model: str):
+        with Session(engine) as session:
+            entry = session.get(AuditCacheEntry, key) or AuditCacheEntry(key=key, audit_json=audit_json, model=model)
+            entry.audit_json = audit_json
+            entry.model = model
+            entry.created_at = datetime.now()
+            entry.last_hit = entry.created_at
+            session.add(entry)
+            session.commit()
+        with self._lock:
+            self._puts += 1
+            should_evict = self._puts % self.evict_every == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Borra entradas vencidas y, si sobra, las de uso más antiguo."""
+        removed = 0
+        with Session(engine) as session:
+            expired = session.exec(
+                delete(AuditCacheEntry).where(AuditCacheEntry.created_at < datetime.now() - self.ttl)
+            )
+            removed += expired.rowcount or 0
+            total = session.exec(select(func.count()).select_from(AuditCacheEntry)).one()
+            overflow = total - self.max_entries
+            if overflow > 0:
+                oldest = select(AuditCacheEntry.key).order_by(AuditCacheEntry.last_hit).limit(overflow)
+                lru = session.exec(delete(AuditCacheEntry).where(AuditCacheEntry.key.in_(oldest)))
+                removed += lru.rowcount or 0
+            session.commit()
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            self.logger.info(f"🧹 Cache de auditorías: {removed} entradas eliminadas")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,341 @@
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from core.config import settings
+from database import engine
+from models.JobModels import Job, SeenJob
+from services.CacheService import normalize_text
+
+
+def id_hash(job_id: str) -> int:
+    """Huella de 64 bits de un ID (URL)."""
+    return int.from_bytes(hashlib.blake2b(job_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def signed_id_hash(job_id: str) -> int:
+    """`id_hash` como entero de 64 bits con signo (lo que guarda SeenJob)."""
+    return int.from_bytes(hashlib.blake2b(job_id.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class SeenIndex:
+    """
+    Índice en memoria de IDs ya guardados.
+
+    Guarda sólo una huella de 64 bits por ID en un array NumPy ordenado
+    (8 bytes por fila: ~8 MB por millón de ofertas) y busca con `searchsorted`.
+    Las altas recientes van a un set chico que se fusiona al array cada
+    `merge_every` inserciones. Con 64 bits la probabilidad de colisión es
+    despreciable (~1e-7 con millones de filas): en el peor caso se omite una
+    oferta nueva.
+
+    Lo que el índice no conoce se confirma con una sola consulta `IN (...)`,
+    así también se detectan filas escritas por otro proceso. Las ofertas
+    borradas por la retención siguen contando como vistas: sus huellas
+    quedan en SeenJob.
+    """
+
+    def __init__(self, merge_every: int = 4096, query_chunk: int = 500):
+        self.logger = logging.getLogger(__name__)
+        self.merge_every = merge_every
+        self.query_chunk = query_chunk
+        self._sorted = np.empty(0, dtype=np.uint64)
+        self._recent: Set[int] = set()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sorted) + len(self._recent)
+
+    def load(self, batch_size: int = 50_000):
+        """Carga las huellas de todos los IDs de Job y de SeenJob (en streaming)."""
+        chunks = []
+        # Cursor del driver: evita el costo del ORM por fila en tablas grandes
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(select(Job.id))
+            for partition in result.scalars().partitions(batch_size):
+                chunks.append(np.fromiter((id_hash(i) for i in partition), dtype=np.uint64, count=len(partition)))
+            result = conn.execution_options(stream_results=True).execute(select(SeenJob.id_hash))
+            for partition in result.scalars().partitions(batch_size):
+                chunks.append(np.array(partition, dtype=np.int64).view(np.uint64))
+        hashes = np.unique(np.concatenate(chunks)) if chunks else np.empty(0, dtype=np.uint64)
+        with self._lock:
+            self._sorted = np.union1d(hashes, np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent)))
+            self._recent.clear()
+            self.loaded = True
+        self.logger.info(f"🗂️ Índice de vistos cargado: {len(self._sorted)} IDs ({self._sorted.nbytes / 1e6:.1f} MB)")
+
+    def _merge(self):
+        recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+        self._sorted = np.union1d(self._sorted, recent)
+        self._recent.clear()
+
+    def add(self, job_ids: Iterable[str]):
+        with self._lock:
+            self._recent.update(id_hash(i) for i in job_ids)
+            if len(self._recent) >= self.merge_every:
+                self._merge()
+
+    def _known_mask(self, hashes: np.ndarray) -> np.ndarray:
+        with self._lock:
+            sorted_hashes = self._sorted
+            recent = self._recent.copy() if self._recent else None
+        if len(sorted_hashes):
+            pos = np.searchsorted(sorted_hashes, hashes).clip(max=len(sorted_hashes) - 1)
+            mask = sorted_hashes[pos] == hashes
+        else:
+            mask = np.zeros(len(hashes), dtype=bool)
+        if recent:
+            mask |= np.fromiter((int(h) in recent for h in hashes), dtype=bool, count=len(hashes))
+        return mask
+
+    def _existing_in_db(self, job_ids: List[str]) -> Set[str]:
+        found: Set[str] = set()
+        with Session(engine) as session:
+            for start in range(0, len(job_ids), self.query_chunk):
+                chunk = job_ids[start:start + self.query_chunk]
+                found.update(session.exec(select(Job.id).where(Job.id.in_(chunk))).all())
+                by_hash = {signed_id_hash(i): i for i in chunk if i not in found}
+                if by_hash:
+                    pruned = session.exec(select(SeenJob.id_hash).where(SeenJob.id_hash.in_(list(by_hash))))
+                    found.update(by_hash[h] for h in pruned.all())
+        return found
+
+    def filter_new(self, job_ids: List[str]) -> List[str]:
+        """Devuelve los IDs que no están guardados, en el orden recibido."""
+        if not job_ids:
+            return []
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+        hashes = np.fromiter((id_hash(i) for i in job_ids), dtype=np.uint64, count=len(job_ids))
+        candidates = [job_id for job_id, known in zip(job_ids, self._known_mask(hashes)) if not known]
+        if not candidates:
+            return []
+        existing = self._existing_in_db(candidates)
+        if existing:
+            self.add(existing)
+        return [job_id for job_id in candidates if job_id not in existing]
+
+
+class NearDupIndex:
+    """
+    Detección de casi-duplicados (la misma vacante publicada en LinkedIn,
+    Indeed y Google con otra URL) con MinHash + LSH.
+
+    El texto normalizado (título + empresa + descripción) se parte en shingles
+    de `shingle` palabras; la firma son `num_perm` mínimos de hashes
+    multiply-shift (semillas fijas, así las firmas guardadas valen entre
+    procesos). Se divide en `bands` bandas: dos ofertas son candidatas si
+    coinciden en alguna banda completa y duplicadas si la fracción de mínimos
+    iguales (estimación de Jaccard) llega a `threshold`.
+
+    Con 64 mínimos en 16 bandas de 4, los candidatos aparecen desde ~0.5 de
+    similitud y el error de la estimación ronda ±0.05.
+
+    Cada banda se indexa con una clave de 64 bits en arrays NumPy ordenados
+    (búsqueda con `searchsorted`, ~12 bytes por banda y oferta) más un dict
+    chico de altas recientes, como SeenIndex. La firma se guarda en
+    `Job.minhash`, y `load` reconstruye el índice desde la base. `remove`
+    busca la fila de cada ID en un dict y la marca como borrada (no vuelve a
+    ser canónica) sin reordenar los arrays; `load` las descarta.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle: int = 3,
+        threshold: float = settings.DEDUPE_NEAR_THRESHOLD,
+        merge_every: int = 4096,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.logger = logging.getLogger(__name__)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.threshold = threshold
+        self.merge_every = merge_every
+        rng = np.random.RandomState(20240601)
+        self._a = rng.randint(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.randint(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._band_mult = rng.randint(1, 2 ** 63, size=(bands, self.rows), dtype=np.uint64) | np.uint64(1)
+        self._band_salt = np.arange(bands, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        self._sigs = np.empty((0, num_perm), dtype=np.uint32)
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._rows = np.empty(0, dtype=np.int32)
+        self._recent: Dict[int, List[int]] = defaultdict(list)
+        self._recent_count = 0
+        self._removed: Set[int] = set()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # --- Firmas ---
+    @staticmethod
+    def _token_hash(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def signature(self, job: Job) -> Optional[np.ndarray]:
+        text = normalize_text(f"{job.title} {job.company} {job.description or ''}")
+        tokens = text.split()
+        if not tokens:
+            return None
+        hashed = np.fromiter((self._token_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+        # Hash de cada shingle: combinación lineal (con overflow) de sus palabras
+        n = max(1, len(hashed) - self.shingle + 1)
+        shingles = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for i in range(min(self.shingle, len(hashed))):
+                shingles = shingles * np.uint64(0x100000001B3) + hashed[i:i + n]
+            # Multiply-shift: 32 bits altos de a*x + b
+            perms = (shingles[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return perms.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sigs: np.ndarray) -> np.ndarray:
+        """Claves de banda (n, bands) para firmas (n, num_perm)."""
+        banded = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return (banded * self._band_mult[None, :, :]).sum(axis=2) + self._band_salt[None, :]
+
+    # --- Índice ---
+    def load(self, batch_size: int = 50_000):
+        """Reconstruye el índice con las firmas guardadas (sólo ofertas canónicas)."""
+        ids: List[str] = []
+        chunks = []
+        with engine.connect() as conn:
+            stmt = select(Job.id, Job.minhash).where(Job.minhash.is_not(None), Job.canonical_id.is_(None))
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            for partition in result.partitions(batch_size):
+                ids.extend(row[0] for row in partition)
+                chunks.append(np.frombuffer(b"".join(row[1] for row in partition), dtype=np.uint32))
+        sigs = np.concatenate(chunks).reshape(-1, self.num_perm) if chunks else np.empty((0, self.num_perm), np.uint32)
+        keys = self._band_keys(sigs)
+        order = np.argsort(keys.ravel(), kind="stable")
+        with self._lock:
+            self._sigs, self._ids = sigs.copy(), ids
+            self._row_of = {job_id: row for row, job_id in enumerate(ids)}
+            self._keys = keys.ravel()[order]
+            self._rows = (np.arange(keys.size, dtype=np.int32) // self.bands)[order]
+            self._recent.clear()
+            self._recent_count = 0
+            self._removed.clear()
+            self.loaded = True
+        self.logger.info(f"🧬 Índice de casi-duplicados cargado: {len(ids)} firmas ({sigs.nbytes / 1e6:.1f} MB)")
+
+    def _merge(self):
+        keys = np.fromiter(self._recent.keys(), dtype=np.uint64, count=len(self._recent))
+        counts = [len(v) for v in self._recent.values()]
+        keys = np.repeat(keys, counts)
+        rows = np.fromiter((r for v in self._recent.values() for r in v), dtype=np.int32, count=len(keys))
+        all_keys = np.concatenate([self._keys, keys])
+        order = np.argsort(all_keys, kind="stable")
+        self._keys = all_keys[order]
+        self._rows = np.concatenate([self._rows, rows])[order]
+        self._recent.clear()
+        self._recent_count = 0
+
+    def _add(self, job_id: str, sig: np.ndarray):
+        row = len(self._ids)
+        if row == len(self._sigs):
+            grown = np.empty((len(self._sigs) + max(1024, len(self._sigs) // 4), self.num_perm), dtype=np.uint32)
+            grown[:row] = self._sigs
+            self._sigs = grown
+        self._sigs[row] = sig
+        self._ids.append(job_id)
+        previous = self._row_of.get(job_id)
+        if previous is not None:
+            self._removed.add(previous)
+        self._row_of[job_id] = row
+        for key in self._band_keys(sig[None, :])[0]:
+            self._recent[int(key)].append(row)
+        self._recent_count += self.bands
+        if self._recent_count >= self.merge_every:
+            self._merge()
+
+    def remove(self, job_ids: Iterable[str]) -> int:
+        """Saca del índice las ofertas `job_ids` (borradas o que no llegaron a guardarse)."""
+        removed = 0
+        with self._lock:
+            for job_id in job_ids:
+                row = self._row_of.pop(job_id, None)
+                if row is not None:
+                    self._removed.add(row)
+                    removed += 1
+        return removed
+
+    def _candidates(self, keys: np.ndarray) -> Set[int]:
+        rows: Set[int] = set()
+        if len(self._keys):
+            lo = np.searchsorted(self._keys, keys, side="left")
+            hi = np.searchsorted(self._keys, keys, side="right")
+            for start, end in zip(lo, hi):
+                rows.update(self._rows[start:end].tolist())
+        for key in keys:
+            rows.update(self._recent.get(int(key), ()))
+        return rows
+
+    def _lookup(self, job_id: str, sig: np.ndarray) -> Optional[str]:
+        rows = [
+            r for r in self._candidates(self._band_keys(sig[None, :])[0])
+            if self._ids[r] != job_id and r not in self._removed
+        ]
+        if not rows:
+            return None
+        similarity = (self._sigs[rows] == sig[None, :]).mean(axis=1)
+        best = int(np.argmax(similarity))
+        return self._ids[rows[best]] if similarity[best] >= self.threshold else None
+
+    def find(self, job: Job) -> Optional[str]:
+        """ID de la oferta canónica de la que `job` es casi-duplicado, o None."""
+        sig = self.signature(job)
+        if sig is None:
+            return None
+        with self._lock:
+            return self._lookup(job.id, sig)
+
+    def partition(self, jobs: List[Job]) -> Tuple[List[Job], List[Job]]:
+        """
+        Separa (únicas, casi-duplicadas). Las únicas entran al índice y llevan
+        su firma en `job.minhash`; las duplicadas quedan enlazadas con
+        `canonical_id`. Una única que al final no se guarda hay que sacarla con
+        `remove`, si no sus copias quedarían enlazadas a una oferta inexistente.
+        """
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load()
+        unique, duplicates = [], []
+        sigs = [self.signature(job) for job in jobs]
+        with self._lock:
+            for job, sig in zip(jobs, sigs):
+                canonical = self._lookup(job.id, sig) if sig is not None else None
+                if canonical is None:
+                    if sig is not None:
+                        job.minhash = sig.tobytes()
+                        self._add(job.id, sig)
+                    unique.append(job)
+                else:
+                    job.canonical_id = canonical
+                    duplicates.append(job)
+        return unique, duplicates
+
+
+# Instancias compartidas por el proceso
+seen_index = SeenIndex()
+near_dup_index = NearDupIndex()
@@ -1,9 +1,20 @@
-import instructor
-from groq import Groq
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import List, Dict, Any, Optional, Set, Union
+
+import httpx
+import groq
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any
 from core.config import settings
+from core.metrics import LLM_RETRIES, LLM_SECONDS, LLM_TOKENS
+from core.ratelimit import TokenBucket, parse_duration
 from models.JobModels import Job
+from services.CacheService import AuditCache, audit_cache_key
+from services.PromptService import CVPrompt, as_cv_prompt, condense_description, estimate_tokens
 
 class JobAudit(BaseModel):
     match_score: int = Field(description="Puntaje de 0 a 100 de compatibilidad técnica")
@@ -12,58 +23,407 @@ class JobAudit(BaseModel):
     seniority_mismatch: bool = Field(description="True si la oferta pide mucha más experiencia de la que el perfil muestra")
     short_verdict: str = Field(description="Justificación técnica objetiva de máximo 15 palabras")
 
+
+class JobAuditItem(JobAudit):
+    job_id: int = Field(description="Número de la vacante evaluada (el indicado en 'VACANTE #')")
+
+
+class BatchAudit(BaseModel):
+    audits: List[JobAuditItem] = Field(description="Una auditoría por cada vacante recibida")
+
+
+class TransientAnalysisError(Exception):
+    """
+    La API no pudo responder (429, 5xx, red) tras agotar los reintentos.
+    El job no debe guardarse: se reintentará en un próximo ciclo.
+    """
+
+
+class InvalidAnalysisError(TransientAnalysisError):
+    """
+    La API respondió, pero algo que no valida como auditoría (también al
+    pedirla sola). Igual que en TransientAnalysisError, el job no se guarda.
+    """
+
+
+SYSTEM_PROMPT = (
+    "Actúa como un motor de auditoría técnica. Tu tarea es realizar un análisis de "
+    "compatibilidad estricto entre un perfil profesional y una oferta laboral.\n\n"
+    "REGLAS DE EVALUACIÓN:\n"
+    "1. Basate únicamente en hechos presentes en los datos. Si una habilidad no está en el perfil, "
+    "asumí que el candidato no la posee.\n"
+    "2. El 'match_score' debe ser una métrica de superposición técnica (tech-stack overlap).\n"
+    "3. Identificá discrepancias de 'seniority' comparando los años de experiencia y nivel de "
+    "responsabilidad de los proyectos en el CV contra los requerimientos de la oferta.\n"
+    "4. Sé crítico con el lenguaje corporativo de las ofertas: extrae los requisitos técnicos "
+    "reales ocultos tras descripciones genéricas.\n"
+    "5. El veredicto debe ser una conclusión lógica, no una recomendación motivacional.\n"
+    "6. PRIORIDAD GEOGRÁFICA CRÍTICA: El candidato vive en 'Mar del Plata, Argentina'. Si la oferta es presencial o híbrida en esta ciudad, AUMENTA EL 'match_score' en +20 puntos y considera 'is_suitable' como True (salvo incompatibilidad técnica total), ya que estas ofertas son escasas y valiosas."
+)
+
+# Subir ante cualquier cambio de prompt: invalida la cache de auditorías
+PROMPT_VERSION = "v2"
+
+BATCH_INSTRUCTIONS = (
+    "\n\nMODO LOTE: vas a recibir varias vacantes numeradas ('VACANTE #n'). Evaluá cada una "
+    "de forma independiente con las mismas reglas y devolvé exactamente una auditoría por vacante, "
+    "indicando su número en 'job_id'."
+)
+
+# Tokens reservados para la respuesta al estimar el consumo de TPM
+COMPLETION_TOKENS_ESTIMATE = 200
+
+
+def plan_batches(job_tokens: List[int], overhead: int, token_budget: int, max_size: int) -> List[List[int]]:
+    """
+    Agrupa índices de jobs en lotes cuyo costo estimado (overhead del prompt +
+    tokens de cada vacante + respuesta) no supere `token_budget`.
+    Un job que no entra solo igual forma su propio lote.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = overhead
+    for idx, tokens in enumerate(job_tokens):
+        cost = tokens + COMPLETION_TOKENS_ESTIMATE
+        if current and (used + cost > token_budget or len(current) >= max_size):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(idx)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+@dataclass
+class CallUsage:
+    """Tokens de una llamada a la API."""
+    mode: str
+    jobs: int
+    estimated_prompt_tokens: int
+    prompt_tokens: int
+    completion_tokens: int
+    elapsed: float
+
+
+@dataclass
+class UsageStats:
+    requests: int = 0
+    jobs: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, call: CallUsage):
+        self.requests += 1
+        self.jobs += call.jobs
+        self.prompt_tokens += call.prompt_tokens
+        self.completion_tokens += call.completion_tokens
+
+    def summary(self) -> Dict[str, Any]:
+        total = self.prompt_tokens + self.completion_tokens
+        return {
+            **asdict(self),
+            "tokens_per_job": round(total / self.jobs, 1) if self.jobs else 0.0,
+            "jobs_per_1k_tokens": round(1000 * self.jobs / total, 2) if total else 0.0,
+        }
+
+
+class GroqRateLimiter:
+    """
+    Limita requests por minuto y tokens por minuto con dos token buckets.
+    Los headers x-ratelimit-* que devuelve Groq corrigen el saldo local, y un
+    429 con Retry-After bloquea ambos buckets el tiempo indicado.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(capacity=rpm, refill_per_sec=rpm / 60.0)
+        self.tokens = TokenBucket(capacity=tpm, refill_per_sec=tpm / 60.0)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def update_from_headers(self, headers: httpx.Headers):
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.requests.sync(float(remaining_requests), parse_duration(headers.get("x-ratelimit-reset-requests")))
+        if remaining_tokens is not None:
+            self.tokens.sync(float(remaining_tokens), parse_duration(headers.get("x-ratelimit-reset-tokens")))
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.requests.block_for(retry_after)
+            self.tokens.block_for(retry_after)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    # instructor envuelve los errores de la API; recorremos la cadena de causas
+    while exc is not None:
+        if isinstance(exc, (groq.APIConnectionError, groq.APITimeoutError)):
+            return True
+        if isinstance(exc, groq.APIStatusError):
+            return exc.status_code == 429 or exc.status_code >= 500
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
 class AIService:
-    def __init__(self, api_key: str = settings.GROQ_API_KEY, model: str = settings.GROQ_MODEL):
-        self.client = instructor.from_groq(Groq(api_key=api_key), mode=instructor.Mode.JSON)
+    def __init__(
+        self,
+        api_key: str = settings.GROQ_API_KEY,
+        model: str = settings.GROQ_MODEL,
+        concurrency: int = settings.ANALYSIS_CONCURRENCY,
+        rpm: int = settings.GROQ_RPM,
+        tpm: int = settings.GROQ_TPM,
+        max_retries: int = settings.GROQ_MAX_RETRIES,
+        cache: Optional[AuditCache] = None,
+        batch_size: int = settings.ANALYSIS_BATCH_SIZE,
+        batch_token_budget: int = settings.ANALYSIS_BATCH_TOKEN_BUDGET,
+        description_tokens: int = settings.PROMPT_DESCRIPTION_TOKENS,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.limiter = GroqRateLimiter(rpm=rpm, tpm=tpm)
+        self.api_key = api_key
+        self._client = None
         self.model = model
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.batch_token_budget = batch_token_budget
+        self.description_tokens = description_tokens
+        self.usage: Dict[str, UsageStats] = {"single": UsageStats(), "batch": UsageStats()}
+        # Últimas llamadas, para inspeccionar el consumo por request
+        self.calls: deque = deque(maxlen=500)
+
+    @property
+    def client(self):
+        """
+        Cliente instructor/Groq, creado en el primer uso: importar el módulo
+        no construye clientes HTTP ni exige GROQ_API_KEY.
+        """
+        if self._client is None:
+            if not self.api_key:
+                raise ValueError("GROQ_API_KEY environment variable is required")
+            import instructor
+            from groq import AsyncGroq
+
+            # Los headers de rate limit se leen de cada respuesta HTTP (incluidos los 429)
+            http_client = httpx.AsyncClient(event_hooks={"response": [self._on_response]})
+            # Los reintentos los manejamos nosotros (con jitter y respetando el limiter)
+            groq_client = AsyncGroq(api_key=self.api_key, http_client=http_client, max_retries=0)
+            self._client = instructor.from_groq(groq_client, mode=instructor.Mode.JSON)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    async def _on_response(self, response: httpx.Response):
+        self.limiter.update_from_headers(response.headers)
+
+    def _job_block(self, job: Job) -> str:
+        # La descripción se condensa por presupuesto de tokens (requisitos y stack primero)
+        job_desc = condense_description(job.description, self.description_tokens) if job.description else ""
+        return f"Título: {job.title}\nDescripción: {job_desc or 'Sin descripción disponible'}"
+
+    def _build_messages(self, job: Job, cv: CVPrompt) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"DATOS DEL CANDIDATO:\n{cv.text}\n\n"
+                    f"DATOS DE LA VACANTE:\n{self._job_block(job)}"
+                ),
+            },
+        ]
+
+    def _build_batch_messages(self, jobs: List[Job], cv: CVPrompt) -> List[Dict[str, str]]:
+        vacancies = "\n\n".join(f"VACANTE #{n}\n{self._job_block(job)}" for n, job in enumerate(jobs, start=1))
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT + BATCH_INSTRUCTIONS},
+            {"role": "user", "content": f"DATOS DEL CANDIDATO:\n{cv.text}\n\n{vacancies}"},
+        ]
+
+    def _record(self, mode: str, jobs: int, messages: List[Dict[str, str]], completion: Any, started: float):
+        usage = getattr(completion, "usage", None)
+        call = CallUsage(
+            mode=mode,
+            jobs=jobs,
+            estimated_prompt_tokens=sum(estimate_tokens(m["content"]) for m in messages),
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            elapsed=round(time.monotonic() - started, 3),
+        )
+        self.usage[mode].add(call)
+        self.calls.append(call)
+        LLM_SECONDS.observe(call.elapsed, mode=mode)
+        LLM_TOKENS.inc(call.prompt_tokens, mode=mode, kind="prompt")
+        LLM_TOKENS.inc(call.completion_tokens, mode=mode, kind="completion")
+        self.logger.debug(
+            f"🧾 {mode}: {jobs} vacantes, {call.prompt_tokens}+{call.completion_tokens} tokens "
+            f"(estimado {call.estimated_prompt_tokens}) en {call.elapsed}s"
+        )
+
+    async def _complete(self, messages: List[Dict[str, str]], response_model, expected_jobs: int = 1):
+        """
+        Una llamada a la API con reintentos ante 429/5xx (backoff exponencial con jitter).
+        Devuelve (modelo validado, completion cruda).
+        """
+        needed = sum(estimate_tokens(m["content"]) for m in messages) + COMPLETION_TOKENS_ESTIMATE * expected_jobs
+        attempt = 0
+        while True:
+            await self.limiter.acquire(needed)
+            try:
+                return await self.client.chat.completions.create_with_completion(
+                    model=self.model,
+                    response_model=response_model,
+                    messages=messages,
+                )
+            except Exception as e:
+                if not _is_transient(e):
+                    raise
+                attempt += 1
+                LLM_RETRIES.inc()
+                if attempt > self.max_retries:
+                    raise TransientAnalysisError(str(e)[:200]) from e
+                delay = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+                self.logger.warning(f"⏳ Groq no disponible ({str(e)[:80]}). Reintento {attempt} en {delay:.1f}s")
+                await asyncio.sleep(delay)
 
-    def analyze_job(self, job: Job, cv_data: Dict[str, Any]) -> JobAudit:
+    async def _cache_get(self, job: Job, cv: CVPrompt):
+        if self.cache is None:
+            return None, None
+        key = audit_cache_key(job, cv.fingerprint, self.model, PROMPT_VERSION)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        return key, JobAudit.model_validate_json(cached) if cached is not None else None
+
+    async def _cache_put(self, key: Optional[str], audit: JobAudit):
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, audit.model_dump_json(), self.model)
+
+    async def _analyze_uncached(self, job: Job, cv: CVPrompt) -> Optional[JobAudit]:
+        """Llamada individual; devuelve None si la API respondió algo inválido."""
+        messages = self._build_messages(job, cv)
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                audit, completion = await self._complete(messages, JobAudit)
+            except TransientAnalysisError:
+                raise
+            except Exception as e:
+                self.logger.error(f"❌ Respuesta inválida de IA para {job.title}: {str(e)[:100]}")
+                return None
+        self._record("single", 1, messages, completion, started)
+        return audit
+
+    async def analyze_job(self, job: Job, cv: Union[CVPrompt, Dict[str, Any]]) -> JobAudit:
         """
         Analiza de forma objetiva una oferta contra un perfil (CV) proporcionado.
+        Si la misma oferta (por contenido) ya fue auditada contra el mismo CV,
+        modelo y prompt, devuelve la auditoría cacheada sin llamar a la API.
+        Lanza TransientAnalysisError si la API sigue rechazando tras los reintentos
+        e InvalidAnalysisError si la respuesta no valida.
         """
-        try:
-            # Asegurar que sea string (pandas puede devolver float NaN)
-            job_desc = str(job.description) if job.description is not None else "Sin descripción disponible"
-            
-            audit = self.client.chat.completions.create(
-                model=self.model,
-                response_model=JobAudit,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Actúa como un motor de auditoría técnica. Tu tarea es realizar un análisis de "
-                            "compatibilidad estricto entre un perfil profesional (JSON) y una oferta laboral.\n\n"
-                            "REGLAS DE EVALUACIÓN:\n"
-                            "1. Basate únicamente en hechos presentes en los datos. Si una habilidad no está en el JSON, "
-                            "asumí que el candidato no la posee.\n"
-                            "2. El 'match_score' debe ser una métrica de superposición técnica (tech-stack overlap).\n"
-                            "3. Identificá discrepancias de 'seniority' comparando los años de experiencia y nivel de "
-                            "responsabilidad de los proyectos en el CV contra los requerimientos de la oferta.\n"
-                            "4. Sé crítico con el lenguaje corporativo de las ofertas: extrae los requisitos técnicos "
-                            "reales ocultos tras descripciones genéricas.\n"
-                            "5. El veredicto debe ser una conclusión lógica, no una recomendación motivacional.\n"
-                            "6. PRIORIDAD GEOGRÁFICA CRÍTICA: El candidato vive en 'Mar del Plata, Argentina'. Si la oferta es presencial o híbrida en esta ciudad, AUMENTA EL 'match_score' en +20 puntos y considera 'is_suitable' como True (salvo incompatibilidad técnica total), ya que estas ofertas son escasas y valiosas."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": (
-                            f"DATOS DEL CANDIDATO (JSON):\n{cv_data}\n\n"
-                            f"DATOS DE LA VACANTE:\nTítulo: {job.title}\nDescripción: {job_desc[:3000]}"
-                        ),
-                    },
-                ]
-            )
-            return audit
-        except Exception as e:
-            return JobAudit(
-                match_score=0,
-                is_suitable=False,
-                missing_skills=["Error en procesamiento de IA"],
-                seniority_mismatch=False,
-                short_verdict=f"Error técnico: {str(e)[:50]}"
+        cv = as_cv_prompt(cv)
+        key, cached = await self._cache_get(job, cv)
+        if cached is not None:
+            return cached
+        audit = await self._analyze_uncached(job, cv)
+        if audit is None:
+            raise InvalidAnalysisError(f"respuesta inválida para {job.title}")
+        await self._cache_put(key, audit)
+        return audit
+
+    async def _run_batch(self, jobs: List[Job], cv: CVPrompt) -> Dict[int, JobAudit]:
+        """Un request con varias vacantes; devuelve sólo los ítems válidos por posición."""
+        messages = self._build_batch_messages(jobs, cv)
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                batch, completion = await self._complete(messages, BatchAudit, expected_jobs=len(jobs))
+            except TransientAnalysisError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"⚠️ Lote de {len(jobs)} vacantes inválido, se analizan por separado: {str(e)[:100]}")
+                return {}
+        results: Dict[int, JobAudit] = {}
+        for item in batch.audits:
+            idx = item.job_id - 1
+            # Se descartan números fuera de rango o repetidos
+            if 0 <= idx < len(jobs) and idx not in results:
+                results[idx] = JobAudit(**item.model_dump(exclude={"job_id"}))
+        self._record("batch", len(results), messages, completion, started)
+        return results
+
+    async def analyze_batch(self, jobs: List[Job], cv: Union[CVPrompt, Dict[str, Any]]) -> Dict[str, JobAudit]:
+        """
+        Analiza varias ofertas enviando varias por request (el system prompt y el
+        CV viajan una sola vez). El tamaño de cada lote se decide por presupuesto
+        de tokens. Los ítems que falten o no validen se reintentan con llamadas
+        individuales. Devuelve {job.id: JobAudit} sólo con las analizadas: las
+        que faltan (API caída o respuesta inválida) no se guardan y se
+        reintentan en otro ciclo. Un lote que falla no corta a los demás: se
+        esperan todos y se conserva lo que sí respondió.
+        """
+        cv = as_cv_prompt(cv)
+        results: Dict[str, JobAudit] = {}
+        keys: Dict[str, Optional[str]] = {}
+        pending: List[Job] = []
+        unavailable: Set[str] = set()
+        for job in jobs:
+            key, cached = await self._cache_get(job, cv)
+            keys[job.id] = key
+            if cached is not None:
+                results[job.id] = cached
+            else:
+                pending.append(job)
+
+        if len(pending) > 1 and self.batch_size > 1:
+            overhead = sum(estimate_tokens(m["content"]) for m in self._build_batch_messages([], cv))
+            plan = plan_batches(
+                [estimate_tokens(self._job_block(job)) for job in pending],
+                overhead, self.batch_token_budget, self.batch_size,
             )
+            groups = [[pending[i] for i in group] for group in plan if len(group) > 1]
+            outcomes = await asyncio.gather(*[self._run_batch(group, cv) for group in groups], return_exceptions=True)
+            for group, outcome in zip(groups, outcomes):
+                if isinstance(outcome, BaseException):
+                    # Con la API caída no tiene sentido reintentarlas de a una ahora
+                    self._note_failure(outcome, len(group))
+                    unavailable.update(job.id for job in group)
+                    continue
+                for idx, audit in outcome.items():
+                    results[group[idx].id] = audit
+
+        # Fallback individual para lo que el lote no resolvió
+        missing = [job for job in pending if job.id not in results and job.id not in unavailable]
+        singles = await asyncio.gather(*[self._analyze_uncached(job, cv) for job in missing], return_exceptions=True)
+        for job, audit in zip(missing, singles):
+            if isinstance(audit, BaseException):
+                self._note_failure(audit, 1)
+            elif audit is not None:
+                results[job.id] = audit
+
+        for job in pending:
+            if job.id in results:
+                await self._cache_put(keys[job.id], results[job.id])
+        return results
+
+    def _note_failure(self, error: BaseException, jobs: int):
+        """Registra una falla reintentable; cualquier otra se propaga (las demás tareas ya terminaron)."""
+        if not isinstance(error, TransientAnalysisError):
+            raise error
+        self.logger.error(f"❌ Groq no respondió para {jobs} vacantes: {error}")
+
+    def usage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Tokens y throughput por token de llamadas individuales vs. en lote."""
+        return {mode: stats.summary() for mode, stats in self.usage.items()}
+
+    def recent_calls(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Detalle de tokens (prompt/completion) de las últimas llamadas."""
+        return [asdict(call) for call in list(self.calls)[-limit:]]
 
 # Instancia genérica
-ai_service = AIService()
+ai_service = AIService(cache=AuditCache())
@@ -1,76 +1,207 @@
 import logging
-from typing import List
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+import pandas as pd
 from jobspy import scrape_jobs
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+from core.circuit import CircuitBreaker
+from core.config import settings
+from core.metrics import SCRAPE_REQUESTS, SCRAPE_SECONDS, SCRAPED_ROWS
 from models.JobModels import Job
 
+DEFAULT_SITES = ["linkedin", "google", "indeed"]
+
+# Errores que indican que el portal nos está bloqueando: no tiene sentido reintentar
+_BLOCK_RE = re.compile(r"\b(429|403)\b|too many requests|rate.?limit|blocked|captcha|forbidden", re.I)
+
+
+def is_block_error(error: BaseException) -> bool:
+    return bool(_BLOCK_RE.search(str(error)))
+
+
+class SiteUnavailableError(Exception):
+    """Ningún portal pedido respondió (fallaron o tienen el circuito abierto)."""
+
+
+class CircuitOpenError(SiteUnavailableError):
+    """Todos los portales pedidos tienen el circuito abierto: no se llamó a ninguno."""
+
+    def __init__(self, message: str, retry_in: float):
+        super().__init__(message)
+        self.retry_in = retry_in
+
 
 class JobService:
-    def __init__(self):
+    """
+    Scraping con JobSpy, un portal por llamada a `scrape_jobs`.
+
+    Cada portal tiene su propio presupuesto de reintentos y su circuit breaker:
+    tras `SCRAPE_BREAKER_THRESHOLD` fallos seguidos (o un bloqueo) el portal se
+    saltea durante el cool-down, y los demás siguen devolviendo resultados.
+    """
+
+    def __init__(
+        self,
+        site_attempts: int = settings.SCRAPE_SITE_ATTEMPTS,
+        breaker_threshold: int = settings.SCRAPE_BREAKER_THRESHOLD,
+        breaker_cooldown: float = settings.SCRAPE_BREAKER_COOLDOWN,
+        breaker_max_cooldown: float = settings.SCRAPE_BREAKER_MAX_COOLDOWN,
+    ):
         self.logger = logging.getLogger(__name__)
+        self.site_attempts = max(1, site_attempts)
+        self.breakers: Dict[str, CircuitBreaker] = defaultdict(
+            lambda: CircuitBreaker(breaker_threshold, breaker_cooldown, breaker_max_cooldown)
+        )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def _scrape_safe(self, **kwargs):
+    def _scrape_site(self, site: str, **kwargs):
         """
-        Ejecuta scrape_jobs con reintentos automáticos ante fallos (Rate limits, errores de red).
-        Backoff exponencial: espera 4s, 8s, 10s... entre reintentos.
+        Ejecuta scrape_jobs para un solo portal con reintentos propios
+        (backoff exponencial corto: 1s, 2s, 4s). Un bloqueo no se reintenta.
         """
-        return scrape_jobs(**kwargs)
+        retrying = Retrying(
+            stop=stop_after_attempt(self.site_attempts),
+            wait=wait_exponential(multiplier=1, min=1, max=4),
+            retry=retry_if_exception(lambda e: not is_block_error(e)),
+            reraise=True,
+        )
+        return retrying(scrape_jobs, site_name=[site], **kwargs)
 
-    def get_latest_jobs(
-        self, 
-        term: str = "python developer", 
+    def site_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Estado del circuit breaker y contadores de cada portal."""
+        return {site: breaker.snapshot() for site, breaker in sorted(self.breakers.items())}
+
+    def scrape_frame(
+        self,
+        term: str = "python developer",
         location: str = "Argentina",
         country: str = "argentina",
-        limit: int = 15
-    ) -> List[Job]:
+        limit: int = 15,
+        sites: Optional[List[str]] = None,
+        hours_old: int = 24,
+    ) -> pd.DataFrame:
         """
-        Consume JobSpy y mapea los resultados a nuestro modelo de SQLModel Job.
+        Consume JobSpy y devuelve un DataFrame limpio (columnas JOB_COLUMNS).
+        `sites` permite limitar la búsqueda a un subconjunto de portales
+        (por defecto LinkedIn, Google e Indeed) y `hours_old` la antigüedad
+        máxima de las ofertas. Si un portal falla se devuelven los resultados
+        de los demás; si fallan todos se lanza SiteUnavailableError para que el
+        scheduler no lo confunda con una búsqueda sin resultados. Si no se
+        llamó a ninguno porque todos tienen el circuito abierto se lanza
+        CircuitOpenError, con los segundos hasta que alguno vuelva a probar.
         """
-        try:
-            # Llamada a la librería JobSpy (envuelta en retry)
-            jobs_df = self._scrape_safe(
-                site_name=["linkedin", "google", "indeed"],
-                search_term=term,
-                location=location,
-                results_wanted=limit,
-                hours_old=24,
-                country_relevant=country,
-                description_format="markdown",
-            )
-            if jobs_df is None or jobs_df.empty:
-                self.logger.info(f"No se encontraron ofertas en {location}.")
-                return []
-
-            internal_jobs = []
-            for _, row in jobs_df.iterrows():
-                # El ID es la URL limpia
-                job_url = str(row.get("job_url", ""))
-                clean_url = job_url.split("?")[0] if job_url else None
-
-                if not clean_url:
-                    continue
-
-                # Mapeo exacto con JobModels.Job
-                job = Job(
-                    id=clean_url,
-                    title=str(row.get("title", "Sin Título")),
-                    company=str(row.get("company", "Empresa No Especificada")),
-                    location=str(row.get("location", location)),
-                    url=clean_url,
-                    description=row.get("description")
-                    if row.get("description")
-                    else "Sin descripción disponible",
-                    salary=str(row.get("salary")) if row.get("salary") else None,
-                    is_remote=bool(row.get("is_remote", False)),
-                    # Los campos de IA (score, summary, is_junior) y notified
-                    # usan sus valores por defecto definidos en el modelo.
+        sites = sites or DEFAULT_SITES
+        frames = []
+        unavailable = []
+        retry_in = []
+        for site in sites:
+            breaker = self.breakers[site]
+            if not breaker.allow():
+                SCRAPE_REQUESTS.inc(site=site, result="circuit_open")
+                retry_in.append(breaker.retry_in())
+                self.logger.info(f"🔌 {site} con circuito abierto: se omite {location} ({retry_in[-1]:.0f}s)")
+                unavailable.append(site)
+                continue
+            started = time.perf_counter()
+            try:
+                jobs_df = self._scrape_site(
+                    site,
+                    search_term=term,
+                    location=location,
+                    results_wanted=limit,
+                    hours_old=hours_old,
+                    country_relevant=country,
+                    description_format="markdown",
                 )
-                internal_jobs.append(job)
+            except Exception as e:
+                blocked = is_block_error(e)
+                breaker.record_failure(blocked=blocked)
+                SCRAPE_SECONDS.observe(time.perf_counter() - started, site=site, country=country)
+                SCRAPE_REQUESTS.inc(site=site, result="blocked" if blocked else "error")
+                self.logger.error(f"Error scraping {location} ({site}){' [bloqueado]' if blocked else ''}: {e}")
+                unavailable.append(site)
+                continue
+            breaker.record_success()
+            SCRAPE_SECONDS.observe(time.perf_counter() - started, site=site, country=country)
+            SCRAPE_REQUESTS.inc(site=site, result="ok")
+            SCRAPED_ROWS.inc(len(jobs_df), site=site)
+            frames.append(jobs_df)
+
+        if len(retry_in) == len(sites):
+            raise CircuitOpenError(f"Circuito abierto en {', '.join(unavailable)} para {location}", min(retry_in))
+        if len(unavailable) == len(sites):
+            raise SiteUnavailableError(f"Sin respuesta de {', '.join(unavailable)} para {location}")
+        frame = clean_jobs_frame(frames, location)
+        if frame.empty:
+            self.logger.info(f"No se encontraron ofertas en {location}.")
+        return frame
+
+    def get_latest_jobs(
+        self,
+        term: str = "python developer",
+        location: str = "Argentina",
+        country: str = "argentina",
+        limit: int = 15,
+        sites: Optional[List[str]] = None,
+        hours_old: int = 24,
+    ) -> List[Job]:
+        """Igual que `scrape_frame`, pero mapeado a modelos Job."""
+        return frame_to_jobs(
+            self.scrape_frame(
+                term=term, location=location, country=country, limit=limit, sites=sites, hours_old=hours_old
+            )
+        )
+
+
+# --- Ingesta columnar ---
+JOB_COLUMNS = ["id", "title", "company", "location", "url", "description", "salary", "is_remote"]
+
+
+def _text(df: pd.DataFrame, column: str, default) -> pd.Series:
+    """
+    Columna de texto sin NaN/None/vacíos. (El `if row.get(...)` anterior
+    trataba NaN como verdadero y guardaba el string "nan".)
+    """
+    if column not in df:
+        return pd.Series(default, index=df.index, dtype="string")
+    values = df[column].astype("string").str.strip()
+    return values.mask(values.isna() | (values == ""), default)
+
+
+def clean_jobs_frame(frames: Iterable[Optional[pd.DataFrame]], default_location: str = "") -> pd.DataFrame:
+    """
+    Une los DataFrames de JobSpy y los normaliza con operaciones vectoriales:
+    ID = URL sin query string, textos sin NaN (con sus valores por defecto),
+    descarta filas sin URL y duplicados dentro del lote.
+    """
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=JOB_COLUMNS)
+    df = pd.concat(frames, ignore_index=True)
+
+    urls = _text(df, "job_url", pd.NA).str.split("?", n=1).str[0].str.strip()
+    out = pd.DataFrame({
+        "id": urls,
+        "title": _text(df, "title", "Sin Título"),
+        "company": _text(df, "company", "Empresa No Especificada"),
+        "location": _text(df, "location", default_location),
+        "url": urls,
+        "description": _text(df, "description", "Sin descripción disponible"),
+        "salary": _text(df, "salary", pd.NA),
+        "is_remote": df["is_remote"].eq(True) if "is_remote" in df else False,
+    })
+    out = out[out["id"].notna() & (out["id"] != "")].drop_duplicates(subset="id")
+    # object con None: lo que esperan SQLModel y el resto del pipeline
+    return out.astype(object).where(out.notna(), None).reset_index(drop=True)
+
 
-            return internal_jobs
+def frame_to_jobs(frame: pd.DataFrame) -> List[Job]:
+    """Construye los modelos Job (sólo para las filas que llegan hasta acá)."""
+    if frame is None or frame.empty:
+        return []
+    return [Job(**record) for record in frame[JOB_COLUMNS].to_dict("records")]
 
-        except Exception as e:
-            self.logger.error(f"Error scraping {location}: {e}")
-            return []
 
+# Instancia compartida: los circuit breakers persisten entre ciclos
+job_service = JobService()
@@ -0,0 +1,80 @@
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from core.config import settings
+from database import engine, insert_ignore
+from models.JobModels import JobLease
+
+
+def instance_id() -> str:
+    """Identificador de esta instancia en los leases (INSTANCE_ID o hostname-pid)."""
+    return settings.INSTANCE_ID or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobLeases:
+    """
+    Reparto de ofertas nuevas entre instancias que comparten la base.
+
+    Antes de analizar, cada instancia inserta un lease por oferta (si ya
+    existe, se ignora) y se queda con las que son suyas o cuyo lease venció,
+    con `SELECT ... FOR UPDATE SKIP LOCKED` en Postgres; en SQLite el UPDATE
+    ya es atómico porque hay un solo escritor. Así una oferta que traen dos
+    búsquedas en dos instancias se analiza una sola vez. Si la instancia se
+    cae, el lease vence a los `ttl` segundos y la oferta la toma quien la
+    vuelva a scrapear.
+    """
+
+    def __init__(self, owner: str = "", ttl: float = settings.LEASE_TTL, chunk: int = 500):
+        self.logger = logging.getLogger(__name__)
+        self.owner = owner or instance_id()
+        self.ttl = timedelta(seconds=ttl)
+        self.chunk = chunk
+
+    def claim(self, job_ids: List[str]) -> List[str]:
+        """Devuelve, de `job_ids`, las ofertas que quedaron a cargo de esta instancia."""
+        if not job_ids:
+            return []
+        now = datetime.now()
+        until = now + self.ttl
+        free = (JobLease.owner == self.owner) | (JobLease.lease_until < now)
+        owned = set()
+        with Session(engine) as session:
+            # Leases abandonados hace rato (ofertas que nadie volvió a traer)
+            session.exec(delete(JobLease).where(JobLease.lease_until < now - self.ttl))
+            for i in range(0, len(job_ids), self.chunk):
+                chunk = job_ids[i:i + self.chunk]
+                session.exec(
+                    insert_ignore(JobLease.__table__),
+                    params=[{"job_id": job_id, "owner": self.owner, "lease_until": until} for job_id in chunk],
+                )
+                ids = select(JobLease.job_id).where(JobLease.job_id.in_(chunk), free).with_for_update(skip_locked=True)
+                stmt = (
+                    update(JobLease)
+                    .where(JobLease.job_id.in_(ids), free)
+                    .values(owner=self.owner, lease_until=until)
+                    .returning(JobLease.job_id)
+                )
+                owned.update(session.exec(stmt).scalars())
+            session.commit()
+        if len(owned) < len(job_ids):
+            self.logger.info(f"🤝 {len(job_ids) - len(owned)} ofertas nuevas ya las tiene otra instancia")
+        return [job_id for job_id in job_ids if job_id in owned]
+
+    def release(self, job_ids: List[str]):
+        """Libera las ofertas ya guardadas (o descartadas para reintentar)."""
+        if not job_ids:
+            return
+        with Session(engine) as session:
+            for i in range(0, len(job_ids), self.chunk):
+                session.exec(
+                    delete(JobLease).where(
+                        JobLease.job_id.in_(job_ids[i:i + self.chunk]), JobLease.owner == self.owner
+                    )
+                )
+            session.commit()
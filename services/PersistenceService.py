@@ -0,0 +1,126 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.metrics import DB_FLUSH_SECONDS, DB_ROWS
+from database import engine, insert_ignore
+from models.JobModels import Job, JobDescription, JobProfileAudit
+from services.DedupeService import SeenIndex, seen_index
+from services.RedisServices import OutboxQueue
+from services.StorageService import description_rows
+
+
+class JobWriter:
+    """
+    Buffer de escritura de ofertas auditadas.
+
+    Acumula jobs con sus auditorías por perfil (ya con `notified` decidido) y
+    los inserta en INSERT multi-fila dentro de una sola transacción cuando se
+    llega a `batch_size` o pasan `flush_interval` segundos desde el primer job
+    pendiente. Las filas cuya clave ya existe se ignoran, y `flush` devuelve
+    sólo los jobs efectivamente insertados (para notificar una única vez).
+
+    Con `outbox`, el mensaje de cada auditoría con `notified` de un job
+    insertado (armado por `notifier(job, auditoría)`, que devuelve
+    `(chat_id, texto)` o None) se escribe en la misma transacción: no queda
+    una auditoría notificada sin su alerta pendiente.
+
+    La descripción no va en la fila de Job: se guarda comprimida en
+    JobDescription (ver StorageService).
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.DB_WRITE_BATCH_SIZE,
+        flush_interval: float = settings.DB_WRITE_INTERVAL,
+        index: SeenIndex = seen_index,
+        outbox: Optional[OutboxQueue] = None,
+        notifier: Optional[Callable[[Job, JobProfileAudit], Optional[Tuple[str, str]]]] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.seen_index = index
+        self.outbox = outbox
+        self.notifier = notifier
+        self._pending: List[Tuple[Job, List[JobProfileAudit]]] = []
+        self._first_pending_at = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, job: Job, audits: Iterable[JobProfileAudit] = ()):
+        with self._lock:
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending.append((job, list(audits)))
+
+    def seconds_until_due(self) -> float:
+        """Segundos hasta que el buffer deba volcarse (inf si está vacío)."""
+        with self._lock:
+            if not self._pending:
+                return float("inf")
+            if len(self._pending) >= self.batch_size:
+                return 0.0
+            return max(0.0, self._first_pending_at + self.flush_interval - time.monotonic())
+
+    def flush(self) -> List[Tuple[Job, List[JobProfileAudit]]]:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return []
+        started = time.monotonic()
+        rows = [job.model_dump(exclude={"description"}) for job, _ in batch]
+        # Se comprime antes de abrir la transacción (no retiene el lock de escritura)
+        compressed = description_rows(job for job, _ in batch)
+        with Session(engine) as session:
+            inserted_ids = set(session.exec(insert_ignore(Job.__table__).returning(Job.id), params=rows).scalars())
+            written = [(job, audits) for job, audits in batch if job.id in inserted_ids]
+            descriptions = [row for row in compressed if row["job_id"] in inserted_ids]
+            if descriptions:
+                session.exec(insert_ignore(JobDescription.__table__), params=descriptions)
+            audit_rows = [audit.model_dump() for _, audits in written for audit in audits]
+            if audit_rows:
+                session.exec(insert_ignore(JobProfileAudit.__table__), params=audit_rows)
+            staged = 0
+            if self.outbox is not None and self.notifier is not None:
+                for job, audits in written:
+                    for audit in audits:
+                        if not audit.notified:
+                            continue
+                        message = self.notifier(job, audit)
+                        if message:
+                            self.outbox.stage(session, *message, job_id=job.id)
+                            staged += 1
+            session.commit()
+        if staged:
+            self.outbox.notify()
+        self.seen_index.add(inserted_ids)
+        elapsed = time.monotonic() - started
+        DB_FLUSH_SECONDS.observe(elapsed)
+        DB_ROWS.inc(len(inserted_ids), table="job")
+        DB_ROWS.inc(len(descriptions), table="jobdescription")
+        DB_ROWS.inc(len(audit_rows), table="jobprofileaudit")
+        DB_ROWS.inc(staged, table="outboxmessage")
+        self.logger.info(
+            f"💾 {len(inserted_ids)}/{len(batch)} ofertas guardadas ({len(audit_rows)} auditorías) "
+            f"en {elapsed * 1000:.0f}ms"
+        )
+        return written
+
+
+def load_profile_audits(job_ids: Iterable[str]) -> Dict[str, List[JobProfileAudit]]:
+    """Auditorías por perfil guardadas de cada oferta de `job_ids`."""
+    job_ids = list(job_ids)
+    audits: Dict[str, List[JobProfileAudit]] = {job_id: [] for job_id in job_ids}
+    if not job_ids:
+        return audits
+    with Session(engine) as session:
+        for audit in session.exec(select(JobProfileAudit).where(JobProfileAudit.job_id.in_(job_ids))):
+            audits[audit.job_id].append(audit)
+    return audits
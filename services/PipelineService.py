@@ -0,0 +1,476 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import threading
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from core.metrics import JOBS, QUEUE_DEPTH
+from models.JobModels import Job, JobProfileAudit
+from services.GroqService import JobAudit, TransientAnalysisError, ai_service
+from services.JobServices import frame_to_jobs
+from services.LeaseService import JobLeases
+from services.DedupeService import NearDupIndex, SeenIndex, seen_index
+from services.PersistenceService import JobWriter, load_profile_audits
+from services.ProfileService import Profile
+from services.RedisServices import OutboxQueue
+from services.ScrapeService import ScrapeResult, ScrapeService, ScrapeTask
+
+# Marca de fin de stream entre etapas
+_DONE = object()
+
+
+@dataclass
+class PipelineStats:
+    scraped: int = 0
+    duplicates: int = 0
+    already_seen: int = 0
+    near_duplicates: int = 0
+    leased_elsewhere: int = 0
+    new: int = 0
+    # Desde acá se cuentan pares (oferta, perfil)
+    filtered: int = 0
+    analyzed: int = 0
+    errors: int = 0
+    notified: int = 0
+
+
+def build_notification(job: Job, audit: JobProfileAudit) -> Dict[str, Any]:
+    return {
+        "profile": audit.profile,
+        "title": job.title,
+        "company": job.company,
+        "location": job.location,
+        "match_score": audit.match_score,
+        "summary": audit.summary,
+        "url": job.url,
+        "missing_skills": json.loads(audit.missing_skills) if audit.missing_skills else [],
+        "seniority_mismatch": audit.seniority_mismatch,
+        "is_suitable": audit.is_suitable,
+    }
+
+
+def make_profile_audit(
+    job: Job, profile: Profile, audit: Optional[JobAudit], prefilter_score: Optional[float]
+) -> JobProfileAudit:
+    """Fila de auditoría de (oferta, perfil). Sin `audit`, la descartó el pre-filtro."""
+    if audit is None:
+        return JobProfileAudit(job_id=job.id, profile=profile.name, prefilter_score=prefilter_score)
+    return JobProfileAudit(
+        job_id=job.id,
+        profile=profile.name,
+        prefilter_score=prefilter_score,
+        analyzed=True,
+        match_score=audit.match_score,
+        summary=audit.short_verdict,
+        is_suitable=audit.is_suitable,
+        seniority_mismatch=audit.seniority_mismatch,
+        # Serializamos la lista de skills faltantes a JSON string
+        missing_skills=json.dumps(audit.missing_skills) if audit.missing_skills else "[]",
+    )
+
+
+def copy_profile_audits(job: Job, audits: List[JobProfileAudit]) -> List[JobProfileAudit]:
+    """Las auditorías de la canónica, para su casi-duplicado `job` (que nunca alerta)."""
+    return [
+        JobProfileAudit(**audit.model_dump(exclude={"job_id", "notified", "created_at"}), job_id=job.id)
+        for audit in audits
+    ]
+
+
+@dataclass
+class _Outcome:
+    """Resultado de una oferta para un perfil (o de un casi-duplicado, sin perfil)."""
+    job: Job
+    profile: Optional[Profile] = None
+    audit: Optional[JobProfileAudit] = None
+    failed: bool = False
+
+
+class JobPipeline:
+    """
+    Pipeline productor/consumidor de un ciclo:
+
+        scrape -> dedupe -> filtro DB -> pre-filtro local -> análisis IA -> persistencia + outbox
+
+    Las etapas se comunican con colas acotadas, así una etapa lenta frena a la
+    anterior (backpressure) en vez de acumular memoria. La primera notificación
+    sale en cuanto el primer país devuelve una oferta apta, sin esperar al resto.
+    La deduplicación por ID vale para todo el ciclo; con `near_index`, además,
+    la misma vacante publicada en otro portal se enlaza a la canónica. Si la
+    canónica es de este ciclo, sus copias esperan a que se resuelva: se
+    guardan con ella, o se descartan (y vuelven el próximo ciclo) si falló.
+    Cada copia se guarda con las auditorías por perfil de su canónica (sin
+    `notified`), así se lee igual que cualquier otra oferta.
+
+    Se scrapea y deduplica una sola vez por ciclo y cada oferta nueva se
+    reparte entre los `profiles` (CV + chat + umbral): sólo el pre-filtro y el
+    análisis escalan con la cantidad de perfiles. El pre-filtro de cada perfil
+    descarta (sin llamar al LLM) los pares con puntaje bajo y alimenta una cola
+    de prioridad común, así se analizan primero los mejores pares disponibles.
+    Una oferta se guarda cuando llegaron los resultados de todos sus perfiles;
+    si alguno falló no se guarda y vuelve a evaluarse en el próximo ciclo (la
+    cache de auditorías evita repetir las llamadas que sí salieron).
+
+    Con `leases`, las ofertas nuevas se reservan en la base antes de
+    analizarlas: si otra instancia ya la tomó, acá se saltea.
+    """
+
+    def __init__(
+        self,
+        profiles: List[Profile],
+        outbox: OutboxQueue,
+        render_notification: Callable[[Dict[str, Any], Profile], Optional[Tuple[str, str]]],
+        scrape_service: Optional[ScrapeService] = None,
+        index: Optional[SeenIndex] = None,
+        near_index: Optional[NearDupIndex] = None,
+        writer: Optional[JobWriter] = None,
+        analyze_workers: int = 2,
+        batch_size: int = 1,
+        queue_size: int = 50,
+        on_scrape_result: Optional[Callable[[ScrapeResult, int], None]] = None,
+        leases: Optional[JobLeases] = None,
+    ):
+        if not profiles:
+            raise ValueError("Se necesita al menos un perfil")
+        self.logger = logging.getLogger(__name__)
+        self.profiles = profiles
+        by_name = {p.name: p for p in profiles}
+        self.scrape_service = scrape_service or ScrapeService()
+        self.seen_index = index or seen_index
+        self.near_index = near_index
+        self.leases = leases
+        # La alerta se guarda en la outbox en la misma transacción que el job
+        self.writer = writer or JobWriter(
+            index=self.seen_index,
+            outbox=outbox,
+            notifier=lambda job, audit: render_notification(build_notification(job, audit), by_name[audit.profile]),
+        )
+        self.analyze_workers = max(1, analyze_workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size
+        # Recibe cada búsqueda con su cantidad de ofertas nuevas (scheduler adaptativo)
+        self.on_scrape_result = on_scrape_result
+        self.stats = PipelineStats()
+        self._seq = itertools.count()
+        # Por oferta en vuelo: resultados de perfil que faltan y los ya recibidos
+        self._remaining: Dict[str, int] = {}
+        self._outcomes: Dict[str, List[_Outcome]] = {}
+        # Ofertas ya resueltas (guardadas o descartadas) cuyo lease falta liberar
+        self._settled: List[str] = []
+        # Canónicas de este ciclo todavía sin guardar, sus casi-duplicados en
+        # espera y las que fallaron (a sacar del índice de casi-duplicados)
+        self._provisional: Set[str] = set()
+        self._held: Dict[str, List[Job]] = {}
+        self._dropped: Set[str] = set()
+        self._unindex: List[str] = []
+        # Auditorías de las canónicas (de este ciclo o leídas de la base) para sus copias
+        self._canonical_audits: Dict[str, List[JobProfileAudit]] = {}
+
+    def _count(self, stage: str, amount: int):
+        """Suma a las estadísticas del ciclo y al contador de métricas."""
+        setattr(self.stats, stage, getattr(self.stats, stage) + amount)
+        if amount:
+            JOBS.inc(amount, stage=stage)
+
+    # --- Etapa 1: scraping (threads) ---
+    def _scrape_producer(self, tasks: List[ScrapeTask], out_q: asyncio.Queue, loop, stop: threading.Event):
+        def put(item) -> bool:
+            future = asyncio.run_coroutine_threadsafe(out_q.put(item), loop)
+            # Bloquea el thread mientras la cola esté llena (backpressure)
+            while not stop.is_set():
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except FutureTimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        for result in self.scrape_service.iter_results(tasks):
+            if not put(result):
+                return
+
+    # --- Etapa 2: dedupe del ciclo + filtro contra DB + pre-filtro ---
+    async def _put_ranked(self, out_q: asyncio.PriorityQueue, priority: float, item):
+        # El contador desempata sin comparar los jobs entre sí
+        await out_q.put((priority, next(self._seq), item))
+
+    async def _filter_stage(self, in_q: asyncio.Queue, out_q: asyncio.PriorityQueue, persist_q: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        seen: Set[str] = set()
+        done = False
+        while not done:
+            first = await in_q.get()
+            if first is _DONE:
+                break
+            # Se procesan juntos todos los resultados (países/portales) que ya estén en cola
+            results = [first]
+            while not in_q.empty():
+                item = in_q.get_nowait()
+                if item is _DONE:
+                    done = True
+                    break
+                results.append(item)
+
+            # Dedupe sobre el DataFrame: los Job se construyen sólo para las filas nuevas
+            frame = pd.concat([r.frame.assign(_source=i) for i, r in enumerate(results)], ignore_index=True)
+            self._count("scraped", len(frame))
+            repeated = frame["id"].isin(seen) | frame["id"].duplicated()
+            self._count("duplicates", int(repeated.sum()))
+            frame = frame[~repeated]
+            seen.update(frame["id"])
+            fresh: List[Job] = []
+            if len(frame):
+                # Índice en memoria + una sola consulta IN (...) para lo desconocido
+                new_ids = await loop.run_in_executor(None, self.seen_index.filter_new, frame["id"].tolist())
+                self._count("already_seen", len(frame) - len(new_ids))
+                if self.leases is not None and new_ids:
+                    owned = await loop.run_in_executor(None, self.leases.claim, new_ids)
+                    self._count("leased_elsewhere", len(new_ids) - len(owned))
+                    new_ids = owned
+                frame = frame[frame["id"].isin(new_ids)]
+                fresh = frame_to_jobs(frame)
+            if fresh and self.near_index is not None:
+                # Misma vacante en otro portal: se guarda enlazada a la canónica, sin LLM ni alerta
+                fresh, near_dups = await loop.run_in_executor(None, self.near_index.partition, fresh)
+                self._provisional.update(job.id for job in fresh if job.minhash is not None)
+                self._count("near_duplicates", len(near_dups))
+                unknown = {
+                    job.canonical_id for job in near_dups
+                    if job.canonical_id not in self._provisional and job.canonical_id not in self._dropped
+                } - self._canonical_audits.keys()
+                if unknown:
+                    self._canonical_audits.update(await loop.run_in_executor(None, load_profile_audits, unknown))
+                for job in near_dups:
+                    if job.canonical_id in self._provisional:
+                        self._held.setdefault(job.canonical_id, []).append(job)
+                    elif job.canonical_id in self._dropped:
+                        # Canónica fallida que todavía no salió del índice: vuelve el próximo ciclo
+                        if self.leases is not None:
+                            self._settled.append(job.id)
+                    else:
+                        self._remaining[job.id] = 1
+                        await persist_q.put(_Outcome(job))
+            self._count("new", len(fresh))
+            if self.on_scrape_result is not None:
+                source = dict(zip(frame["id"], frame["_source"]))
+                new_per_result = Counter(source[job.id] for job in fresh)
+                for i, result in enumerate(results):
+                    self.on_scrape_result(result, new_per_result[i])
+            if not fresh:
+                continue
+
+            for job in fresh:
+                self._remaining[job.id] = len(self.profiles)
+            label = len(self.profiles) > 1
+            for profile in self.profiles:
+                if profile.prefilter is None:
+                    for job in fresh:
+                        await self._put_ranked(out_q, 0.0, (job, profile, None))
+                    continue
+                # Puntuar es CPU (NumPy sobre todo el lote): fuera del event loop
+                accepted, rejected = await loop.run_in_executor(
+                    None, profile.prefilter.rank, fresh, profile.name if label else ""
+                )
+                self._count("filtered", len(rejected))
+                # Los descartados se guardan igual para no volver a evaluarlos
+                for job, score in rejected:
+                    await persist_q.put(_Outcome(job, profile, make_profile_audit(job, profile, None, score)))
+                for job, score in accepted:
+                    await self._put_ranked(out_q, -score, (job, profile, score))
+        for _ in range(self.analyze_workers):
+            await self._put_ranked(out_q, math.inf, _DONE)
+
+    # --- Etapa 3: análisis IA ---
+    async def _next_batch(self, in_q: asyncio.PriorityQueue):
+        """
+        Espera el primer par (job, perfil, puntaje) y suma los del mismo perfil
+        que ya estén en cola (sin esperar) hasta `batch_size`.
+        Devuelve (pares, fin_del_stream).
+        """
+        _, _, first = await in_q.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        others = []
+        while len(batch) < self.batch_size and not in_q.empty():
+            entry = in_q.get_nowait()
+            item = entry[2]
+            if item is _DONE:
+                # La marca de fin es de otro worker: se devuelve a la cola
+                others.append(entry)
+                break
+            if item[1] is first[1]:
+                batch.append(item)
+            else:
+                # Otro perfil: se lo lleva otro lote
+                others.append(entry)
+        # Sin awaits de por medio: el lugar que liberamos sigue libre
+        for entry in others:
+            in_q.put_nowait(entry)
+        return batch, False
+
+    @staticmethod
+    def _log_audit(logger: logging.Logger, job: Job, audit: JobAudit, prefix: str = ""):
+        logger.info(f"📊 {prefix}Análisis para {job.company} - {job.title}:")
+        logger.info(f"   🎯 Score: {audit.match_score}/100 | {'✅ Apto' if audit.is_suitable else '❌ No apto'}")
+        logger.info(f"   📝 Veredicto: {audit.short_verdict}")
+        if audit.missing_skills:
+            logger.info(f"   📉 Faltantes: {', '.join(audit.missing_skills)}")
+        if audit.seniority_mismatch:
+            logger.info(f"   ⚠️ Alerta: Discrepancia de Seniority")
+
+    async def _analyze_worker(self, in_q: asyncio.PriorityQueue, out_q: asyncio.Queue):
+        logger = self.logger
+        while True:
+            batch, done = await self._next_batch(in_q)
+            if done:
+                await out_q.put(_DONE)
+                break
+            profile = batch[0][1]
+            jobs = [job for job, _, _ in batch]
+            prefix = f"[{profile.name}] " if len(self.profiles) > 1 else ""
+            for job in jobs:
+                logger.info(f"🤖 {prefix}Analizando: {job.title} @ {job.company}")
+            try:
+                if len(jobs) == 1:
+                    audits = {jobs[0].id: await ai_service.analyze_job(jobs[0], profile.cv)}
+                else:
+                    audits = await ai_service.analyze_batch(jobs, profile.cv)
+            except TransientAnalysisError as e:
+                logger.error(f"❌ {prefix}Groq no respondió para {len(jobs)} vacantes: {e}")
+                audits = {}
+            # Las que no se pudieron analizar no se guardan: vuelven en el próximo ciclo
+            failed = [job for job in jobs if job.id not in audits]
+            self._count("errors", len(failed))
+            for job in failed:
+                await out_q.put(_Outcome(job, profile, failed=True))
+
+            for job, _, score in batch:
+                audit = audits.get(job.id)
+                if audit is None:
+                    continue
+                self._count("analyzed", 1)
+                self._log_audit(logger, job, audit, prefix)
+                await out_q.put(_Outcome(job, profile, make_profile_audit(job, profile, audit, score)))
+
+    # --- Etapa 4: persistencia (en lote) + outbox de notificaciones ---
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        # Todo lo resuelto hasta acá entra en este flush (no hay awaits de por medio)
+        settled, self._settled = self._settled, []
+        unindex, self._unindex = self._unindex, []
+        if unindex:
+            await loop.run_in_executor(None, self.near_index.remove, unindex)
+        written = await loop.run_in_executor(None, self.writer.flush)
+        self._count("notified", sum(audit.notified for _, audits in written for audit in audits))
+        if self.leases is not None and settled:
+            await loop.run_in_executor(None, self.leases.release, settled)
+
+    def _collect(self, outcome: _Outcome) -> Optional[Tuple[Job, List[JobProfileAudit]]]:
+        """Junta el resultado; con todos los perfiles de la oferta devuelve (job, auditorías)."""
+        job = outcome.job
+        outcomes = self._outcomes.setdefault(job.id, [])
+        outcomes.append(outcome)
+        self._remaining[job.id] -= 1
+        if self._remaining[job.id] > 0:
+            return None
+        del self._remaining[job.id], self._outcomes[job.id]
+        if self.leases is not None:
+            self._settled.append(job.id)
+        failed = any(o.failed for o in outcomes)
+        if job.id in self._provisional:
+            self._provisional.discard(job.id)
+            if failed:
+                # No se guarda: deja de ser canónica y sus copias se descartan con ella
+                self._dropped.add(job.id)
+                self._unindex.append(job.id)
+                held = self._held.pop(job.id, [])
+                if self.leases is not None:
+                    self._settled.extend(dup.id for dup in held)
+        if failed:
+            return None
+        if job.canonical_id is not None:
+            return job, copy_profile_audits(job, self._canonical_audits.get(job.canonical_id, []))
+        audits = []
+        for o in outcomes:
+            if o.audit is None:
+                continue
+            # La marca de notificado se escribe junto con la auditoría
+            o.audit.notified = o.audit.analyzed and o.profile.should_notify(o.audit.match_score, o.audit.is_suitable)
+            audits.append(o.audit)
+        job.notified = any(a.notified for a in audits)
+        if job.minhash is not None and self.near_index is not None:
+            self._canonical_audits[job.id] = audits
+        return job, audits
+
+    async def _persist_stage(self, in_q: asyncio.Queue):
+        remaining = self.analyze_workers
+        while remaining:
+            try:
+                # Espera nuevos jobs sólo hasta que venza el buffer de escritura
+                timeout = self.writer.seconds_until_due()
+                outcome = await asyncio.wait_for(in_q.get(), timeout=None if timeout == math.inf else timeout)
+            except asyncio.TimeoutError:
+                await self._flush()
+                continue
+            if outcome is _DONE:
+                remaining -= 1
+                continue
+            ready = self._collect(outcome)
+            if ready is None:
+                continue
+            job, audits = ready
+            self.writer.add(job, audits)
+            # Los casi-duplicados en espera van en el mismo lote que su canónica
+            for dup in self._held.pop(job.id, []):
+                self.writer.add(dup, copy_profile_audits(dup, audits))
+                if self.leases is not None:
+                    self._settled.append(dup.id)
+            # Un match no espera al intervalo: su alerta sale con este flush
+            if job.notified or self.writer.seconds_until_due() == 0:
+                await self._flush()
+        await self._flush()
+
+    async def run(self, tasks: List[ScrapeTask]) -> PipelineStats:
+        loop = asyncio.get_running_loop()
+        stop = threading.Event()
+        scraped_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        ranked_q: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=self.queue_size)
+        audited_q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def producer():
+            try:
+                await loop.run_in_executor(None, self._scrape_producer, tasks, scraped_q, loop, stop)
+            finally:
+                await scraped_q.put(_DONE)
+
+        depths = {"scraped": scraped_q, "ranked": ranked_q, "audited": audited_q}
+        for name, q in depths.items():
+            QUEUE_DEPTH.track(q.qsize, queue=name)
+        QUEUE_DEPTH.track(lambda: len(self.writer), queue="write_buffer")
+        stages = [
+            asyncio.create_task(producer()),
+            asyncio.create_task(self._filter_stage(scraped_q, ranked_q, audited_q)),
+            *[asyncio.create_task(self._analyze_worker(ranked_q, audited_q)) for _ in range(self.analyze_workers)],
+            asyncio.create_task(self._persist_stage(audited_q)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            stop.set()
+            for stage in stages:
+                stage.cancel()
+            if self.near_index is not None and self._provisional:
+                # Ciclo interrumpido: las canónicas sin guardar no pueden quedar en el índice
+                self.near_index.remove(self._provisional)
+            for name in [*depths, "write_buffer"]:
+                QUEUE_DEPTH.untrack(queue=name)
+        return self.stats
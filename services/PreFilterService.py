@@ -0,0 +1,206 @@
+import logging
+import math
+import random
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, select
+
+from core.config import settings
+from models.JobModels import Job, JobProfileAudit
+from services.CacheService import normalize_text
+
+# Palabras vacías (es/en) que no aportan a la similitud
+STOPWORDS = frozenset(
+    "a al con de del el en es la las lo los o para por que se su un una y "
+    "an and are as at be by for from in is of on or our the to we with you your".split()
+)
+
+
+class PreFilter:
+    """
+    Ranking local (CPU) de ofertas contra el CV antes de gastar llamadas al LLM.
+
+    Cada texto se convierte en un vector TF-IDF disperso de unigramas y bigramas
+    hasheados (`n_features` cubetas). El IDF se aprende de todas las ofertas vistas
+    en el proceso. El puntaje es la similitud coseno con el vector del CV, donde
+    las `skills` pesan más que la experiencia y el resumen. Todo el lote se puntúa
+    con operaciones NumPy, sin bucles por oferta.
+
+    Una fracción `explore_rate` de las que quedan debajo del umbral se manda
+    igual al LLM (al final de la cola): es la muestra con la que
+    `calibration_report` mide qué se pierde al descartar.
+    """
+
+    SKILL_WEIGHT = 3.0
+
+    def __init__(
+        self,
+        cv_data: Dict[str, Any],
+        threshold: float = settings.PREFILTER_THRESHOLD,
+        n_features: int = 2 ** 18,
+        explore_rate: float = settings.PREFILTER_EXPLORE_RATE,
+    ):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features debe ser potencia de 2")
+        self.logger = logging.getLogger(__name__)
+        self.threshold = threshold
+        self.explore_rate = explore_rate
+        self._rng = random.Random()
+        self.n_features = n_features
+        self._mask = n_features - 1
+        self.doc_freq = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        self.skills = [normalize_text(s) for s in cv_data.get("skills", []) if normalize_text(s)]
+        self._cv_features, self._cv_tf = self._build_cv_vector(cv_data)
+
+    # --- Vectorización ---
+    def _hash(self, text: str) -> np.ndarray:
+        tokens = [t for t in normalize_text(text).split() if t not in STOPWORDS]
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        # hash() alcanza: los vectores sólo se comparan dentro del mismo proceso
+        return np.fromiter((hash(g) & self._mask for g in grams), dtype=np.int64, count=len(grams))
+
+    def _build_cv_vector(self, cv_data: Dict[str, Any]):
+        experience = cv_data.get("experience", [])
+        general = " ".join(
+            [str(cv_data.get("role", "")), str(cv_data.get("summary", ""))]
+            + [f"{e.get('title', '')} {e.get('description', '')}" for e in experience if isinstance(e, dict)]
+        )
+        weights = np.zeros(self.n_features, dtype=np.float64)
+        np.add.at(weights, self._hash(general), 1.0)
+        np.add.at(weights, self._hash(" ".join(self.skills)), self.SKILL_WEIGHT)
+        features = np.flatnonzero(weights)
+        # TF sublineal, igual que en las ofertas
+        weights[features] = 1.0 + np.log(weights[features])
+        return features, weights
+
+    def _idf(self, features: np.ndarray) -> np.ndarray:
+        return np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq[features])) + 1.0
+
+    def score_batch(self, jobs: List[Job]) -> np.ndarray:
+        """Puntaje coseno (0..1) de cada oferta contra el CV."""
+        n = len(jobs)
+        if n == 0 or len(self._cv_features) == 0:
+            return np.zeros(n)
+
+        hashed = [self._hash(f"{job.title} {job.title} {job.description or ''}") for job in jobs]
+        doc_ids = np.repeat(np.arange(n, dtype=np.int64), [len(h) for h in hashed])
+        if len(doc_ids) == 0:
+            return np.zeros(n)
+        # Pares únicos (oferta, feature) con su frecuencia
+        pairs, counts = np.unique(doc_ids * self.n_features + np.concatenate(hashed), return_counts=True)
+        pair_docs = pairs // self.n_features
+        pair_feats = pairs & self._mask
+
+        # El IDF se actualiza con el lote antes de puntuar
+        np.add.at(self.doc_freq, pair_feats, 1)
+        self.n_docs += n
+
+        weights = (1.0 + np.log(counts)) * self._idf(pair_feats)
+        cv_weights = self._cv_tf[pair_feats] * self._idf(pair_feats)
+        dot = np.bincount(pair_docs, weights=weights * cv_weights, minlength=n)
+        doc_norm = np.sqrt(np.bincount(pair_docs, weights=weights ** 2, minlength=n))
+        cv_norm = math.sqrt(float(np.sum((self._cv_tf[self._cv_features] * self._idf(self._cv_features)) ** 2)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(doc_norm > 0, dot / (doc_norm * cv_norm), 0.0)
+        return scores
+
+    def matched_skills(self, job: Job) -> List[str]:
+        text = f" {normalize_text(job.title)} {normalize_text(job.description)} "
+        return [skill for skill in self.skills if f" {skill} " in text]
+
+    # --- Decisión ---
+    def rank(self, jobs: List[Job], label: str = "") -> Tuple[List[Tuple[Job, float]], List[Tuple[Job, float]]]:
+        """
+        Puntúa el lote y lo separa en (aceptadas ordenadas por puntaje desc,
+        descartadas), como pares (job, puntaje). `label` identifica el perfil en el log.
+        Loguea una línea por lote; el detalle por oferta va en DEBUG.
+        """
+        scores = self.score_batch(jobs)
+        prefix = f"[{label}] " if label else ""
+        detail = self.logger.isEnabledFor(logging.DEBUG)
+        accepted, rejected = [], []
+        explored = 0
+        for job, score in zip(jobs, scores):
+            score = round(float(score), 4)
+            keep = score >= self.threshold
+            explore = not keep and self._rng.random() < self.explore_rate
+            explored += explore
+            if detail:
+                self.logger.debug(
+                    f"🧮 {prefix}Pre-filtro {'✅' if keep else '🎲' if explore else '🚫'} {score:.3f} "
+                    f"[{', '.join(self.matched_skills(job)) or '-'}] {job.title} @ {job.company}"
+                )
+            (accepted if keep or explore else rejected).append((job, score))
+        accepted.sort(key=lambda pair: pair[1], reverse=True)
+        if jobs:
+            self.logger.info(
+                f"🧮 {prefix}Pre-filtro: {len(accepted)}/{len(jobs)} ofertas al LLM"
+                + (f" ({explored} por exploración)" if explored else "")
+                + f", {len(rejected)} descartadas (umbral {self.threshold:.2f})"
+            )
+        return accepted, rejected
+
+
+def calibration_report(
+    session: Session,
+    buckets: int = 10,
+    match_threshold: int = settings.NOTIFY_MIN_SCORE,
+    profile: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Compara el puntaje del pre-filtro con el `match_score` de las auditorías
+    guardadas para ajustar PREFILTER_THRESHOLD: por cada rango de pre-filtro,
+    cuántas ofertas analizadas hubo y qué proporción terminó siendo un match.
+    Con `profile` se limita a las auditorías de ese perfil.
+
+    Sólo cuentan las analizadas: debajo del umbral eso es la muestra al azar
+    de PREFILTER_EXPLORE_RATE, así que ahí `jobs` es chico (no el total
+    descartado) pero `match_rate` estima bien lo que se pierde. Con la
+    exploración apagada, los rangos debajo del umbral no aparecen.
+    """
+    # Las copias de los casi-duplicados repetirían la muestra de su canónica
+    query = select(JobProfileAudit.prefilter_score, JobProfileAudit.match_score).join(
+        Job, Job.id == JobProfileAudit.job_id
+    ).where(
+        Job.canonical_id.is_(None),
+        JobProfileAudit.analyzed,
+        JobProfileAudit.prefilter_score.is_not(None),
+        JobProfileAudit.match_score.is_not(None),
+    )
+    if profile is not None:
+        query = query.where(JobProfileAudit.profile == profile)
+    rows = session.exec(query).all()
+    if not rows:
+        return []
+    data = np.array(rows, dtype=np.float64)
+    edges = np.linspace(0.0, max(float(data[:, 0].max()), 1e-9), buckets + 1)
+    idx = np.clip(np.digitize(data[:, 0], edges) - 1, 0, buckets - 1)
+    report = []
+    for b in range(buckets):
+        in_bucket = data[idx == b]
+        if len(in_bucket) == 0:
+            continue
+        report.append({
+            "prefilter_from": round(float(edges[b]), 3),
+            "prefilter_to": round(float(edges[b + 1]), 3),
+            "jobs": int(len(in_bucket)),
+            "avg_ai_score": round(float(in_bucket[:, 1].mean()), 1),
+            "match_rate": round(float((in_bucket[:, 1] >= match_threshold).mean()), 3),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    # Uso: python -m services.PreFilterService [perfil]
+    with Session(engine) as session:
+        for row in calibration_report(session, profile=sys.argv[1] if len(sys.argv) > 1 else None):
+            print(
+                f"{row['prefilter_from']:.3f}-{row['prefilter_to']:.3f}: {row['jobs']:>5} ofertas | "
+                f"score IA medio {row['avg_ai_score']:>5} | match {row['match_rate']:.0%}"
+                + (" (muestra de descartadas)" if row["prefilter_to"] <= settings.PREFILTER_THRESHOLD else "")
+            )
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from services.PreFilterService import PreFilter
+from services.PromptService import CVPrompt
+
+DEFAULT_PROFILE = "default"
+
+
+@dataclass
+class Profile:
+    """Una persona a la que se le buscan ofertas: su CV, su chat y su umbral de alerta."""
+    name: str
+    cv: CVPrompt
+    chat_id: str = ""
+    min_score: int = settings.NOTIFY_MIN_SCORE
+    # Cada perfil aprende su propio IDF y descarta según su CV
+    prefilter: Optional[PreFilter] = None
+
+    @classmethod
+    def from_cv(cls, name: str, cv_data: Dict[str, Any], chat_id: str = "", min_score: Optional[int] = None) -> "Profile":
+        prefilter = PreFilter(cv_data) if settings.PREFILTER_ENABLED and cv_data.get("skills") else None
+        return cls(
+            name=name,
+            cv=CVPrompt.from_dict(cv_data),
+            chat_id=str(chat_id or ""),
+            min_score=settings.NOTIFY_MIN_SCORE if min_score is None else int(min_score),
+            prefilter=prefilter,
+        )
+
+    def should_notify(self, match_score: Optional[int], is_suitable: Optional[bool]) -> bool:
+        # Criterio de Notificación: Score >= umbral del perfil OR marcado como suitable
+        return (match_score or 0) >= self.min_score or bool(is_suitable)
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_profiles(path: str = settings.PROFILES_FILE, default_cv: str = "cv.json") -> List[Profile]:
+    """
+    Lee los perfiles de `path`, una lista de objetos:
+
+        [{"name": "juan", "cv": "cv_juan.json", "chat_id": "123", "min_score": 75}, ...]
+
+    `cv` puede ser una ruta (relativa al archivo de perfiles) o el CV inline.
+    Sin archivo de perfiles se usa un único perfil con `default_cv` y
+    TELEGRAM_CHAT_ID, como antes.
+    """
+    logger = logging.getLogger(__name__)
+    if not os.path.exists(path):
+        try:
+            cv_data = _read_json(default_cv)
+        except FileNotFoundError:
+            logger.error(f"{default_cv} no encontrado. Usando diccionario vacío.")
+            cv_data = {}
+        return [Profile.from_cv(DEFAULT_PROFILE, cv_data, settings.TELEGRAM_CHAT_ID)]
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    profiles = []
+    for entry in _read_json(path):
+        cv = entry.get("cv", {})
+        cv_data = _read_json(os.path.join(base_dir, cv)) if isinstance(cv, str) else cv
+        profiles.append(
+            Profile.from_cv(entry["name"], cv_data, entry.get("chat_id", ""), entry.get("min_score"))
+        )
+    names = [p.name for p in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nombres de perfil repetidos en {path}: {names}")
+    logger.info(f"👥 {len(profiles)} perfiles cargados: {', '.join(names)}")
+    return profiles
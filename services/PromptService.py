@@ -0,0 +1,226 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union
+
+# --- Estimación de tokens ---
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Aproximación a un tokenizer BPE sin dependencias: cada signo cuenta como
+    un token y cada palabra como uno cada ~4 caracteres.
+    """
+    if not text:
+        return 0
+    return sum(1 if len(piece) <= 4 else (len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+# --- CV compacto ---
+def _flatten(value: Any) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_flatten(v)}" for k, v in value.items() if v not in (None, "", [], {}))
+    if isinstance(value, (list, tuple)):
+        return ", ".join(_flatten(v) for v in value if v not in (None, "", [], {}))
+    return str(value).strip()
+
+
+def render_cv(cv_data: Dict[str, Any]) -> str:
+    """
+    Renderiza el CV en texto plano compacto y estable (mismo dict -> mismo texto).
+    Las claves conocidas van primero; cualquier otra se agrega al final.
+    """
+    lines = []
+    known = ("name", "role", "summary", "location", "skills", "experience", "projects", "education", "languages")
+    if cv_data.get("role"):
+        lines.append(f"Rol: {_flatten(cv_data['role'])}")
+    if cv_data.get("location"):
+        lines.append(f"Ubicación: {_flatten(cv_data['location'])}")
+    if cv_data.get("summary"):
+        lines.append(f"Resumen: {_flatten(cv_data['summary'])}")
+    if cv_data.get("skills"):
+        lines.append(f"Skills: {_flatten(cv_data['skills'])}")
+    for key, label in (("experience", "Experiencia"), ("projects", "Proyectos"), ("education", "Educación")):
+        items = cv_data.get(key) or []
+        if items:
+            lines.append(f"{label}:")
+            for item in items if isinstance(items, list) else [items]:
+                if isinstance(item, dict):
+                    head = " @ ".join(str(item[k]) for k in ("title", "company") if item.get(k))
+                    rest = "; ".join(
+                        _flatten(v) for k, v in item.items() if k not in ("title", "company") and v not in (None, "", [], {})
+                    )
+                    lines.append(f"- {head}: {rest}" if head and rest else f"- {head or rest}")
+                else:
+                    lines.append(f"- {_flatten(item)}")
+    if cv_data.get("languages"):
+        lines.append(f"Idiomas: {_flatten(cv_data['languages'])}")
+    for key in sorted(k for k in cv_data if k not in known):
+        if cv_data[key] not in (None, "", [], {}):
+            lines.append(f"{key}: {_flatten(cv_data[key])}")
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class CVPrompt:
+    """CV ya renderizado para el prompt, con su huella para la cache de auditorías."""
+    data: Dict[str, Any]
+    text: str
+    fingerprint: str
+    tokens: int
+
+    @classmethod
+    def from_dict(cls, cv_data: Dict[str, Any]) -> "CVPrompt":
+        text = render_cv(cv_data)
+        canonical = json.dumps(cv_data, sort_keys=True, ensure_ascii=False)
+        return cls(
+            data=cv_data,
+            text=text,
+            fingerprint=hashlib.sha256(canonical.encode("utf-8")).hexdigest(),
+            tokens=estimate_tokens(text),
+        )
+
+
+def as_cv_prompt(cv: Union["CVPrompt", Dict[str, Any]]) -> CVPrompt:
+    return cv if isinstance(cv, CVPrompt) else CVPrompt.from_dict(cv)
+
+
+# --- Condensado de descripciones ---
+_MD_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_MD_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL_RE = re.compile(r"https?://\S+")
+_HTML_RE = re.compile(r"<[^>]+>")
+_MD_MARKS_RE = re.compile(r"(\*\*|__|\*|`|~~|\\(?=[^\w\s]))")
+_LINE_PREFIX_RE = re.compile(r"^\s*(#{1,6}\s*|>\s*|[-*+•·]\s+|\d+[.)]\s+)")
+_NON_TEXT_RE = re.compile(r"[^\w\s.,;:()/+#&'\"%$€¿?¡!-]", re.UNICODE)
+
+# Encabezados -> prioridad (menor = más importante). None = descartar.
+_SECTION_RULES: List[Tuple[re.Pattern, Union[int, None]]] = [
+    (re.compile(r"equal opportunit|igualdad de oportunidades|eeo\b|diversity|diversidad|inclusi[oó]n|discriminat", re.I), None),
+    (re.compile(r"benefi|perks|ofrecemos|we offer|what we offer|what you.?ll get|compensaci|salario|salary|por qu[eé] unirte|why join", re.I), None),
+    (re.compile(r"requisit|requirement|qualificat|must.?have|excluyente|skills|stack|tecnolog|technolog|conocimientos|experiencia|experience|what you.?ll bring|perfil|profile|buscamos|looking for", re.I), 0),
+    (re.compile(r"nice.?to.?have|deseable|plus|bonus|valorable", re.I), 1),
+    (re.compile(r"responsabilidad|responsibilit|tareas|funciones|what you.?ll do|your role|el rol|the role|d[ií]a a d[ií]a", re.I), 1),
+    (re.compile(r"about us|sobre nosotros|qui[eé]nes somos|nuestra empresa|our company|culture|cultura|misi[oó]n|mission", re.I), 3),
+]
+_DEFAULT_PRIORITY = 2
+_BOILERPLATE_RE = re.compile(
+    r"equal opportunity employer|without regard to|igualdad de oportunidades|no discrimina|"
+    r"reasonable accommodation|ajustes razonables|background check",
+    re.I,
+)
+
+
+def strip_markdown(text: str) -> str:
+    text = _MD_IMAGE_RE.sub("", text)
+    text = _MD_LINK_RE.sub(r"\1", text)
+    text = _URL_RE.sub("", text)
+    text = _HTML_RE.sub(" ", text)
+    text = _MD_MARKS_RE.sub("", text)
+    lines = []
+    for line in text.splitlines():
+        line = _NON_TEXT_RE.sub("", _LINE_PREFIX_RE.sub("", line))
+        line = re.sub(r"\s+", " ", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _is_heading(raw: str, clean: str) -> bool:
+    stripped = raw.strip()
+    return bool(clean) and len(clean) <= 60 and (
+        stripped.startswith("#")
+        or (stripped.startswith("**") and stripped.rstrip(":").endswith("**"))
+        or clean.endswith(":")
+    )
+
+
+def _section_priority(heading: str) -> Union[int, None]:
+    for pattern, priority in _SECTION_RULES:
+        if pattern.search(heading):
+            return priority
+    return _DEFAULT_PRIORITY
+
+
+def truncate_tokens(text: str, token_budget: int) -> str:
+    """
+    Corta `text` en el último límite de palabra o signo que entra en
+    `token_budget` (según `estimate_tokens`). Una sola palabra más larga que
+    el presupuesto se corta por caracteres.
+    """
+    if token_budget <= 0:
+        return ""
+    used, end = 0, 0
+    for match in _PIECE_RE.finditer(text):
+        piece = match.group()
+        cost = 1 if len(piece) <= 4 else (len(piece) + 3) // 4
+        if used + cost > token_budget:
+            if end == 0:
+                return piece[:token_budget * 4]
+            break
+        used += cost
+        end = match.end()
+    else:
+        return text
+    return text[:end].rstrip()
+
+
+def condense_description(text: str, token_budget: int) -> str:
+    """
+    Limpia el markdown, descarta beneficios y texto legal (EEO) y, si aún no
+    entra en `token_budget`, conserva primero requisitos/stack y
+    responsabilidades, luego el resto, y por último la presentación de la empresa.
+    Las secciones elegidas mantienen el orden original. La línea que no entra
+    entera (p. ej. una descripción de un solo párrafo) se corta en un límite
+    de palabra; con presupuesto, un texto no vacío nunca queda vacío.
+    """
+    if not text or token_budget <= 0:
+        return ""
+    sections: List[List[Any]] = [[_DEFAULT_PRIORITY, [], False]]  # [prioridad, líneas, tiene título]
+    for raw in str(text).splitlines():
+        clean = strip_markdown(raw)
+        if not clean:
+            continue
+        if _is_heading(raw, clean):
+            sections.append([_section_priority(clean), [clean], True])
+        elif not _BOILERPLATE_RE.search(clean):
+            sections[-1][1].append(clean)
+
+    kept = [
+        (pos, prio, "\n".join(lines))
+        for pos, (prio, lines, titled) in enumerate(sections)
+        if prio is not None and len(lines) > int(titled)
+    ]
+    chosen: Dict[int, str] = {}
+    remaining = token_budget
+    for pos, _, body in sorted(kept, key=lambda s: (s[1], s[0])):
+        if remaining <= 0:
+            break
+        cost = estimate_tokens(body)
+        if cost <= remaining:
+            chosen[pos] = body
+            remaining -= cost
+            continue
+        # Recorte de la sección que no entra entera: líneas completas y la
+        # primera que sobra, cortada en un límite de palabra
+        partial = []
+        for line in body.splitlines():
+            line_cost = estimate_tokens(line)
+            if line_cost > remaining:
+                cut = truncate_tokens(line, remaining)
+                if cut:
+                    partial.append(cut)
+                break
+            partial.append(line)
+            remaining -= line_cost
+        # Un título sin contenido no aporta
+        if len(partial) > 1 or (partial and not sections[pos][2]):
+            chosen[pos] = "\n".join(partial)
+        break
+    condensed = "\n".join(chosen[pos] for pos in sorted(chosen))
+    if condensed:
+        return condensed
+    # Todo era beneficios/legal o sólo títulos: mejor el texto recortado que nada
+    return truncate_tokens(strip_markdown(str(text)), token_budget)
@@ -0,0 +1,280 @@
+import argparse
+import heapq
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+from sqlmodel import Session, delete, select
+
+from core.config import settings
+from database import engine, upsert
+from models.JobModels import QueryResult, ScrapeTarget
+from services.DedupeService import signed_id_hash
+
+
+@dataclass
+class QueryStats:
+    key: str
+    ids: int  # IDs distintos que trajo en la ventana
+    exclusive: int  # de esos, los que no trajo ninguna otra búsqueda
+    marginal: int  # IDs nuevos que suma en el orden greedy (ver overlap_stats)
+    redundant: bool = False
+
+    @property
+    def exclusive_share(self) -> float:
+        return self.exclusive / self.ids if self.ids else 0.0
+
+    @property
+    def marginal_share(self) -> float:
+        return self.marginal / self.ids if self.ids else 0.0
+
+
+def overlap_stats(sets: Dict[str, Set[int]]) -> Dict[str, QueryStats]:
+    """
+    Solapamiento entre búsquedas a partir de los IDs que trajo cada una.
+
+    `exclusive` cuenta los IDs que sólo trae esa búsqueda. No sirve para
+    decidir qué cortar: dos búsquedas idénticas tienen 0 exclusivos cada una
+    y cortar ambas pierde todo. `marginal` sale de un set cover greedy: se
+    elige siempre la búsqueda que más IDs agrega a los ya cubiertos, y lo que
+    agrega es su aporte marginal. Las ganancias sólo bajan a medida que se
+    cubre más, así que se evalúa en forma perezosa (heap con cotas viejas).
+    """
+    counts: Dict[int, int] = {}
+    for ids in sets.values():
+        for id_hash in ids:
+            counts[id_hash] = counts.get(id_hash, 0) + 1
+    stats = {
+        key: QueryStats(key, len(ids), sum(1 for i in ids if counts[i] == 1), 0)
+        for key, ids in sets.items()
+    }
+    covered: Set[int] = set()
+    heap = [(-len(ids), key) for key, ids in sets.items()]
+    heapq.heapify(heap)
+    while heap:
+        _, key = heapq.heappop(heap)
+        gain = len(sets[key] - covered)
+        if heap and gain < -heap[0][0]:
+            heapq.heappush(heap, (-gain, key))
+            continue
+        stats[key].marginal = gain
+        covered |= sets[key]
+    return stats
+
+
+def group_sets(sets: Dict[str, Set[int]], group: Callable[[str], str]) -> Dict[str, Set[int]]:
+    """Une los IDs de las búsquedas por `group(key)` (p. ej. por término)."""
+    grouped: Dict[str, Set[int]] = {}
+    for key, ids in sets.items():
+        grouped.setdefault(group(key), set()).update(ids)
+    return grouped
+
+
+def coverage(sets: Dict[str, Set[int]], keys: Iterable[str]) -> Tuple[int, int]:
+    """(IDs que cubren las búsquedas `keys`, IDs que cubren todas)."""
+    kept: Set[int] = set()
+    for key in keys:
+        kept |= sets.get(key, set())
+    total: Set[int] = set()
+    for ids in sets.values():
+        total |= ids
+    return len(kept), len(total)
+
+
+def key_part(part: str) -> Callable[[str], str]:
+    """Extrae "term", "location" o "site" de una clave `term|location|site`."""
+    index = ["term", "location", "site"].index(part)
+    return lambda key: key.split("|")[index]
+
+
+class QueryPlanner:
+    """
+    Aprende cuánto se solapan las búsquedas (término, ubicación, portal).
+
+    Cada resultado de scraping se registra en QueryResult: qué IDs trajo cada
+    búsqueda en los últimos `window_days` días, hayan sido nuevos o no. Con
+    eso `refresh()` calcula el aporte marginal de cada búsqueda (ver
+    `overlap_stats`); las que tienen al menos `min_evidence` IDs y aportan
+    menos de `min_share` de lo que traen son redundantes: el scheduler las
+    corre cada `redundant_interval` segundos como mínimo (así se sigue
+    midiendo si vuelven a aportar) y las deja al final cuando no alcanza el
+    presupuesto horario.
+
+    Reporte: `python -m services.QueryPlannerService [--by term]`.
+    """
+
+    def __init__(
+        self,
+        window_days: int = settings.QUERY_OVERLAP_DAYS,
+        min_evidence: int = settings.QUERY_MIN_EVIDENCE,
+        min_share: float = settings.QUERY_MIN_MARGINAL_SHARE,
+        redundant_interval: float = settings.QUERY_REDUNDANT_INTERVAL,
+        refresh_interval: float = 900,
+        query_chunk: int = 500,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.window = timedelta(days=window_days)
+        self.min_evidence = min_evidence
+        self.min_share = min_share
+        self.redundant_interval = redundant_interval
+        self.refresh_interval = refresh_interval
+        self.query_chunk = max(1, query_chunk)
+        self.stats: Dict[str, QueryStats] = {}
+        self._pending: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+        self._refreshed_at: Optional[float] = None
+
+    # --- Registro ---
+    def observe(self, key: str, job_ids: Iterable[str]):
+        """Anota los IDs que trajo la búsqueda `key` (se guardan en `flush`)."""
+        pairs = {(key, signed_id_hash(job_id)) for job_id in job_ids}
+        with self._lock:
+            self._pending |= pairs
+
+    def flush(self) -> int:
+        """Guarda lo anotado; un par ya registrado renueva su `seen_at` (sigue en la ventana)."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        now = datetime.now()
+        with Session(engine) as session:
+            session.exec(
+                upsert(QueryResult.__table__, ["seen_at"]),
+                params=[{"key": key, "id_hash": id_hash, "seen_at": now} for key, id_hash in pending],
+            )
+            session.commit()
+        return len(pending)
+
+    def prune(self) -> int:
+        """Borra lo registrado antes de la ventana."""
+        with Session(engine) as session:
+            result = session.exec(delete(QueryResult).where(QueryResult.seen_at < datetime.now() - self.window))
+            session.commit()
+        return result.rowcount or 0
+
+    def load_sets(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Set[int]]:
+        """IDs por búsqueda dentro de la ventana (sólo `keys`, si se pasan)."""
+        stmt = select(QueryResult.key, QueryResult.id_hash).where(QueryResult.seen_at >= datetime.now() - self.window)
+        if keys is None:
+            chunks = [stmt]
+        else:
+            # El filtro va en la consulta (clave primaria), en tandas de `query_chunk` claves
+            wanted = sorted(set(keys))
+            chunks = [
+                stmt.where(QueryResult.key.in_(wanted[i:i + self.query_chunk]))
+                for i in range(0, len(wanted), self.query_chunk)
+            ]
+        sets: Dict[str, Set[int]] = {}
+        with Session(engine) as session:
+            for chunk in chunks:
+                for key, id_hash in session.exec(chunk):
+                    sets.setdefault(key, set()).add(id_hash)
+        return sets
+
+    # --- Plan ---
+    def is_candidate(self, stats: QueryStats) -> bool:
+        return stats.ids >= self.min_evidence and stats.marginal_share < self.min_share
+
+    def analyze(self, sets: Dict[str, Set[int]]) -> Dict[str, QueryStats]:
+        stats = overlap_stats(sets)
+        for entry in stats.values():
+            entry.redundant = self.is_candidate(entry)
+        return stats
+
+    def refresh(self, keys: Iterable[str], force: bool = False):
+        """Recalcula el plan para las búsquedas `keys` cada `refresh_interval` segundos."""
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+        self._refreshed_at = now
+        self.flush()
+        self.prune()
+        sets = self.load_sets(keys)
+        before = {key for key, s in self.stats.items() if s.redundant}
+        self.stats = self.analyze(sets)
+        redundant = {key for key, s in self.stats.items() if s.redundant}
+        if redundant != before:
+            kept, total = coverage(sets, (key for key in sets if key not in redundant))
+            self.logger.info(
+                f"🧭 Planificador: {len(redundant)} de {len(sets)} búsquedas redundantes; "
+                f"sin ellas se cubren {kept} de {total} ofertas ({kept / max(1, total):.0%})"
+            )
+
+    def is_redundant(self, key: str) -> bool:
+        stats = self.stats.get(key)
+        return stats is not None and stats.redundant
+
+    def weight(self, key: str) -> float:
+        """Factor de prioridad: el aporte marginal, o 1 mientras no haya evidencia."""
+        stats = self.stats.get(key)
+        if stats is None or stats.ids < self.min_evidence:
+            return 1.0
+        return max(0.01, stats.marginal_share)
+
+
+def _calls_per_day() -> Dict[str, float]:
+    with Session(engine) as session:
+        rows = session.exec(select(ScrapeTarget.key, ScrapeTarget.interval)).all()
+    return {key: 86400 / interval for key, interval in rows if interval}
+
+
+def report(planner: QueryPlanner, by: Optional[str] = None) -> dict:
+    """
+    Aporte de cada búsqueda (o de cada término, ubicación o portal), de mayor
+    a menor, y cuántas ofertas se seguirían cubriendo sin las redundantes.
+    """
+    sets = planner.load_sets()
+    calls = _calls_per_day()
+    if by:
+        group = key_part(by)
+        grouped_calls: Dict[str, float] = {}
+        for key in sets:
+            grouped_calls[group(key)] = grouped_calls.get(group(key), 0.0) + calls.get(key, 0.0)
+        sets, calls = group_sets(sets, group), grouped_calls
+    stats = planner.analyze(sets)
+    rows = []
+    for entry in sorted(stats.values(), key=lambda s: (s.marginal, s.ids), reverse=True):
+        row = asdict(entry)
+        row["exclusive_share"] = round(entry.exclusive_share, 3)
+        row["marginal_share"] = round(entry.marginal_share, 3)
+        row["calls_per_day"] = round(calls.get(entry.key, 0.0), 1)
+        rows.append(row)
+    kept, total = coverage(sets, (key for key, entry in stats.items() if not entry.redundant))
+    return {"queries": rows, "total_ids": total, "kept_ids": kept}
+
+
+if __name__ == "__main__":
+    from database import create_db_and_tables
+
+    parser = argparse.ArgumentParser(description="Aporte marginal de cada búsqueda (IDs que no trae otra)")
+    parser.add_argument("--days", type=int, default=settings.QUERY_OVERLAP_DAYS, help="ventana en días")
+    parser.add_argument("--by", choices=["term", "location", "site"], help="agrupa las búsquedas")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    create_db_and_tables()
+    planner = QueryPlanner(window_days=args.days)
+    result = report(planner, args.by)
+    rows = result["queries"]
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    if not rows:
+        raise SystemExit(f"Sin resultados registrados en los últimos {args.days} días")
+    print(f"{'búsqueda':48} {'IDs':>7} {'exclus.':>8} {'%':>5} {'marginal':>9} {'%':>5} {'llam./día':>10}")
+    for row in rows:
+        flag = "  🔻 redundante" if row["redundant"] else ""
+        print(
+            f"{row['key'][:48]:48} {row['ids']:>7} {row['exclusive']:>8} {row['exclusive_share']:>5.0%} "
+            f"{row['marginal']:>9} {row['marginal_share']:>5.0%} {row['calls_per_day']:>10.1f}{flag}"
+        )
+    redundant = sum(row["redundant"] for row in rows)
+    total, kept = result["total_ids"], result["kept_ids"]
+    print(
+        f"\n{len(rows)} búsquedas, {total} ofertas distintas, ~{sum(r['calls_per_day'] for r in rows):.0f} llamadas/día. "
+        f"Sin las {redundant} redundantes se cubren {kept} ({kept / max(1, total):.0%})."
+    )
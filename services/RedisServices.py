@@ -1,6 +1,16 @@
 import asyncio
 import json
-from typing import Optional
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional
+
+from sqlalchemy import case
+from sqlmodel import Session, select, update, delete, func
+
+from core.config import settings
+from database import engine
+from models.JobModels import OutboxMessage
 
 class MemoryQueue:
     def __init__(self):
@@ -15,3 +25,149 @@ class MemoryQueue:
         """Saca un mensaje de la cola (blocking get)."""
         # get() bloquea de forma asíncrona hasta que haya un item
         return await self.queue.get()
+
+
+class OutboxQueue:
+    """
+    Cola persistente de notificaciones (tabla OutboxMessage).
+
+    Los mensajes de ofertas se escriben con `stage` en la misma transacción
+    que el job, así un reinicio no pierde alertas ya marcadas como notificadas.
+    `dequeue` toma lotes de `batch_size` filas y las deja invisibles por
+    `visibility_timeout` segundos: si no llega el `ack` (el proceso murió o el
+    envío falló), vuelven a entregarse. En memoria sólo vive el lote actual;
+    la cola atrasada queda en la base.
+
+    Cada entrega cuenta un intento y a los `max_attempts` el mensaje se
+    descarta. Un `nack(..., throttled=True)` (Telegram pidió esperar, o la
+    copia de un mensaje que seguía esperando turno) devuelve ese intento: sólo
+    los errores de envío acercan al descarte.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        visibility_timeout: float = settings.OUTBOX_VISIBILITY_TIMEOUT,
+        retry_delay: float = settings.OUTBOX_RETRY_DELAY,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+        poll_interval: float = settings.OUTBOX_POLL_INTERVAL,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = max(1, batch_size)
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._buffer: Deque[dict] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    # --- Productor ---
+    def stage(self, session: Session, chat_id: str, text: str, job_id: Optional[str] = None):
+        """Agrega el mensaje a la transacción del llamador (no hace commit)."""
+        session.add(OutboxMessage(chat_id=chat_id, text=text, job_id=job_id))
+
+    def notify(self):
+        """Despierta al consumidor; se puede llamar desde cualquier thread."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _insert(self, chat_id: str, text: str):
+        with Session(engine) as session:
+            self.stage(session, chat_id, text)
+            session.commit()
+
+    async def enqueue(self, chat_id: str, text: str):
+        """Mete un mensaje suelto en la outbox (transacción propia)."""
+        await asyncio.get_running_loop().run_in_executor(None, self._insert, chat_id, text)
+        self.notify()
+
+    # --- Consumidor ---
+    def claim(self, limit: int) -> List[dict]:
+        """Toma hasta `limit` mensajes visibles y los oculta por el visibility timeout."""
+        now = datetime.now()
+        visible = (OutboxMessage.visible_at <= now) & (OutboxMessage.attempts < self.max_attempts)
+        ids = (
+            select(OutboxMessage.id)
+            .where(visible)
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), visible)
+            .values(visible_at=now + self.visibility_timeout, attempts=OutboxMessage.attempts + 1)
+            .returning(OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.text, OutboxMessage.attempts)
+        )
+        with Session(engine) as session:
+            rows = session.exec(stmt).all()
+            session.commit()
+        return sorted(
+            ({"id": r.id, "chat_id": r.chat_id, "text": r.text, "attempts": r.attempts} for r in rows),
+            key=lambda m: m["id"],
+        )
+
+    async def dequeue(self) -> Optional[dict]:
+        """Devuelve el próximo mensaje; espera (sin consultar en loop) si no hay."""
+        loop = asyncio.get_running_loop()
+        if self._wake is None:
+            self._loop, self._wake = loop, asyncio.Event()
+        while not self._buffer:
+            self._wake.clear()
+            batch = await loop.run_in_executor(None, self.claim, self.batch_size)
+            if batch:
+                self._buffer.extend(batch)
+                break
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        return self._buffer.popleft()
+
+    def _ack(self, message_ids):
+        with Session(engine) as session:
+            session.exec(delete(OutboxMessage).where(OutboxMessage.id.in_(message_ids)))
+            session.commit()
+
+    async def ack(self, *message_ids: int):
+        """Confirma el envío: los mensajes se borran de la outbox."""
+        await asyncio.get_running_loop().run_in_executor(None, self._ack, message_ids)
+
+    def _nack(self, message_ids, delay: float, error: Optional[str], throttled: bool):
+        values = {"visible_at": datetime.now() + timedelta(seconds=delay)}
+        if error is not None:
+            values["last_error"] = error
+        if throttled:
+            values["attempts"] = case((OutboxMessage.attempts > 0, OutboxMessage.attempts - 1), else_=0)
+        with Session(engine) as session:
+            session.exec(update(OutboxMessage).where(OutboxMessage.id.in_(message_ids)).values(**values))
+            session.commit()
+            if throttled:
+                return
+            dead = session.exec(
+                select(OutboxMessage.id).where(
+                    OutboxMessage.id.in_(message_ids), OutboxMessage.attempts >= self.max_attempts
+                )
+            ).all()
+            for message_id in dead:
+                self.logger.error(f"☠️ Mensaje {message_id} descartado tras {self.max_attempts} intentos: {error}")
+
+    async def nack(
+        self, *message_ids: int, delay: Optional[float] = None, error: Optional[str] = None, throttled: bool = False
+    ):
+        """
+        Devuelve los mensajes a la cola para reintentarlos dentro de `delay`
+        segundos. Con `throttled` no fue un error de envío: no gasta intento.
+        """
+        delay = self.retry_delay if delay is None else delay
+        await asyncio.get_running_loop().run_in_executor(None, self._nack, message_ids, delay, error, throttled)
+
+    def pending(self) -> int:
+        """Mensajes aún por entregar (incluye los tomados sin ack)."""
+        with Session(engine) as session:
+            return session.exec(
+                select(func.count())
+                .select_from(OutboxMessage)
+                .where((OutboxMessage.attempts < self.max_attempts) | (OutboxMessage.visible_at > datetime.now()))
+            ).one()
@@ -0,0 +1,305 @@
+import itertools
+import logging
+import math
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from core.config import settings
+from database import engine, insert_ignore
+from models.JobModels import ScrapeTarget
+from services.JobServices import DEFAULT_SITES
+from services.QueryPlannerService import QueryPlanner
+from services.ScrapeService import ScrapeResult, ScrapeTask
+
+
+def target_key(term: str, location: str, site: str) -> str:
+    return f"{term.lower()}|{location.lower()}|{site}"
+
+
+class AdaptiveScheduler:
+    """
+    Decide qué búsquedas (términos x ubicaciones x portales) correr en cada ciclo.
+
+    Cada búsqueda tiene su propio intervalo: se reduce a la mitad cuando trae
+    ofertas nuevas y se duplica (backoff exponencial) cuando vuelve vacía o
+    falla, entre `min_interval` y `max_interval`. De las búsquedas vencidas se
+    corren primero las de mejor rendimiento (ofertas nuevas por segundo de
+    scraping), sin pasar de `hourly_budget` búsquedas en la última hora.
+    `hours_old` se acota al tiempo desde el último poll exitoso, así jobspy no
+    vuelve a traer lo que ya vimos.
+
+    El estado vive en la tabla ScrapeTarget (sobrevive a reinicios) y se puede
+    inspeccionar con `python -m services.SchedulerService`.
+
+    Con `planner`, cada resultado alimenta el QueryPlanner: las búsquedas
+    redundantes (casi todo lo que traen ya lo trae otra) se corren a lo sumo
+    cada `planner.redundant_interval` segundos, y la prioridad se multiplica
+    por el aporte marginal de cada búsqueda.
+
+    Con `owner`, varias instancias comparten las búsquedas: cada ciclo relee
+    el estado y toma las vencidas con un lease (`leased_by`, `lease_until`;
+    `FOR UPDATE SKIP LOCKED` en Postgres), que se libera al registrar el
+    resultado o vence a los `lease_ttl` segundos si la instancia se cae. El
+    presupuesto horario es por instancia.
+    """
+
+    ALPHA = 0.3  # peso de la última medición en las medias móviles
+    SKIP_RETRY = 60.0  # segundos hasta reintentar una búsqueda que no llegó a correr
+
+    def __init__(
+        self,
+        terms: List[str],
+        targets: List[Dict[str, str]],
+        sites: Optional[List[str]] = None,
+        limit: int = 15,
+        min_interval: float = settings.SCRAPE_MIN_INTERVAL,
+        max_interval: float = settings.SCRAPE_MAX_INTERVAL,
+        hourly_budget: int = settings.SCRAPE_HOURLY_BUDGET,
+        max_hours_old: int = settings.SCRAPE_MAX_HOURS_OLD,
+        owner: Optional[str] = None,
+        lease_ttl: float = settings.LEASE_TTL,
+        planner: Optional[QueryPlanner] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.terms = terms
+        self.targets = targets
+        self.sites = sites or DEFAULT_SITES
+        self.limit = limit
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hourly_budget = hourly_budget
+        self.max_hours_old = max_hours_old
+        self.owner = owner
+        self.lease_ttl = timedelta(seconds=lease_ttl)
+        self.planner = planner
+        self.state: Dict[str, ScrapeTarget] = {}
+        self._dispatched: Deque[float] = deque()
+        self._dirty: set = set()
+
+    def load(self):
+        """Carga el estado guardado y crea las búsquedas nuevas (vencidas de entrada)."""
+        with Session(engine) as session:
+            saved = {t.key: t for t in session.exec(select(ScrapeTarget)).all()}
+            new = []
+            for term, target, site in itertools.product(self.terms, self.targets, self.sites):
+                key = target_key(term, target["loc"], site)
+                entry = saved.get(key)
+                if entry is None:
+                    entry = ScrapeTarget(
+                        key=key,
+                        term=term,
+                        location=target["loc"],
+                        country=target["country"],
+                        site=site,
+                        interval=self.min_interval,
+                    )
+                    new.append(entry)
+                self.state[key] = entry
+            if new:
+                # Otra instancia puede estar creando las mismas: gana la primera
+                session.exec(insert_ignore(ScrapeTarget.__table__), params=[e.model_dump() for e in new])
+                session.commit()
+
+    def _refresh(self):
+        """Relee el estado: otras instancias también corren estas búsquedas."""
+        with Session(engine) as session:
+            rows = session.exec(select(ScrapeTarget).where(ScrapeTarget.key.in_(list(self.state)))).all()
+        for row in rows:
+            self.state[row.key] = row
+
+    def _leased_elsewhere(self, entry: ScrapeTarget, now: datetime) -> bool:
+        return (
+            entry.leased_by is not None
+            and entry.leased_by != self.owner
+            and entry.lease_until is not None
+            and entry.lease_until > now
+        )
+
+    def _claim(self, keys: List[str], now: datetime) -> set:
+        """Toma el lease de las búsquedas `keys` que sigan vencidas y libres."""
+        free = (
+            ScrapeTarget.lease_until.is_(None)
+            | (ScrapeTarget.lease_until < now)
+            | (ScrapeTarget.leased_by == self.owner)
+        )
+        available = (ScrapeTarget.key.in_(keys)) & (ScrapeTarget.next_due <= now) & free
+        ids = select(ScrapeTarget.key).where(available).with_for_update(skip_locked=True)
+        stmt = (
+            update(ScrapeTarget)
+            .where(ScrapeTarget.key.in_(ids), available)
+            .values(leased_by=self.owner, lease_until=now + self.lease_ttl)
+            .returning(ScrapeTarget.key)
+        )
+        with Session(engine) as session:
+            claimed = set(session.exec(stmt).scalars())
+            session.commit()
+        return claimed
+
+    # --- Presupuesto ---
+    def _budget_left(self, now: float) -> int:
+        while self._dispatched and self._dispatched[0] <= now - 3600:
+            self._dispatched.popleft()
+        return max(0, self.hourly_budget - len(self._dispatched))
+
+    def _priority(self, entry: ScrapeTarget) -> float:
+        # Nunca corrida: máxima prioridad; si no, ofertas nuevas por segundo de scraping,
+        # ponderadas por el aporte marginal de la búsqueda
+        if entry.polls == 0:
+            return math.inf
+        weight = self.planner.weight(entry.key) if self.planner is not None else 1.0
+        return weight * (entry.yield_ewma + 0.01) / (entry.latency_ewma + 1.0)
+
+    def _hours_old(self, entry: ScrapeTarget, now: datetime) -> int:
+        if entry.last_success is None:
+            return self.max_hours_old
+        hours = math.ceil((now - entry.last_success).total_seconds() / 3600) + 1  # 1h de margen
+        return max(1, min(self.max_hours_old, hours))
+
+    def due_tasks(self) -> List[ScrapeTask]:
+        """Búsquedas vencidas, por prioridad, recortadas al presupuesto horario."""
+        if not self.state:
+            self.load()
+        elif self.owner is not None:
+            self._refresh()
+        if self.planner is not None:
+            self.planner.refresh(self.state)
+        now = datetime.now()
+        due = sorted(
+            (e for e in self.state.values() if e.next_due <= now and not self._leased_elsewhere(e, now)),
+            key=self._priority,
+            reverse=True,
+        )
+        allowed = self._budget_left(time.monotonic())
+        if len(due) > allowed:
+            self.logger.info(f"🪙 Presupuesto horario: se corren {allowed} de {len(due)} búsquedas vencidas")
+        if self.owner is None:
+            due = due[:allowed]
+        else:
+            # Las demás instancias ordenan igual: si ganan alguna, se prueba con las siguientes
+            candidates, due, lost = due, [], 0
+            while candidates and len(due) < allowed:
+                batch, candidates = candidates[:allowed - len(due)], candidates[allowed - len(due):]
+                claimed = self._claim([e.key for e in batch], now)
+                lost += len(batch) - len(claimed)
+                due += [e for e in batch if e.key in claimed]
+            if lost:
+                self.logger.info(f"🤝 {lost} búsquedas vencidas las tomó otra instancia")
+        tasks = []
+        for entry in due:
+            self._dispatched.append(time.monotonic())
+            tasks.append(
+                ScrapeTask(
+                    term=entry.term,
+                    location=entry.location,
+                    country=entry.country,
+                    site=entry.site,
+                    limit=self.limit,
+                    hours_old=self._hours_old(entry, now),
+                )
+            )
+        return tasks
+
+    # --- Retroalimentación ---
+    def record(self, result: ScrapeResult, new_jobs: int):
+        """Actualiza rendimiento, latencia e intervalo con el resultado de una búsqueda."""
+        task = result.task
+        entry = self.state.get(target_key(task.term, task.location, task.site))
+        if entry is None:
+            return
+        now = datetime.now()
+        if result.skipped:
+            # No llegó a correr (presupuesto del ciclo, slots, circuito abierto): vuelve
+            # cuando el portal acepte otra prueba, sin backoff ni error, y no gasta
+            # presupuesto horario
+            if self._dispatched:
+                self._dispatched.pop()
+            entry.next_due = now + timedelta(seconds=max(self.SKIP_RETRY, result.retry_in))
+            entry.leased_by = None
+            entry.lease_until = None
+            self._dirty.add(entry.key)
+            return
+        entry.polls += 1
+        entry.last_polled = now
+        if result.failed:
+            entry.errors += 1
+            entry.interval = min(self.max_interval, entry.interval * 2)
+        else:
+            if self.planner is not None:
+                self.planner.observe(entry.key, result.frame["id"])
+            entry.last_success = now
+            entry.new_jobs += new_jobs
+            entry.yield_ewma = self.ALPHA * new_jobs + (1 - self.ALPHA) * entry.yield_ewma
+            entry.latency_ewma = (
+                result.elapsed if entry.polls == 1
+                else self.ALPHA * result.elapsed + (1 - self.ALPHA) * entry.latency_ewma
+            )
+            if new_jobs > 0:
+                entry.empty_streak = 0
+                entry.interval = max(self.min_interval, entry.interval / 2)
+            else:
+                entry.empty_streak += 1
+                entry.interval = min(self.max_interval, entry.interval * 2)
+        if self.planner is not None and self.planner.is_redundant(entry.key):
+            entry.interval = max(entry.interval, self.planner.redundant_interval)
+        # Jitter para que las búsquedas no vuelvan a vencer todas juntas
+        entry.next_due = now + timedelta(seconds=entry.interval * random.uniform(0.9, 1.1))
+        entry.leased_by = None
+        entry.lease_until = None
+        self._dirty.add(entry.key)
+
+    def save(self):
+        """Persiste las búsquedas modificadas desde el último guardado."""
+        if self.planner is not None:
+            self.planner.flush()
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        with Session(engine) as session:
+            for key in dirty:
+                session.merge(self.state[key])
+            session.commit()
+
+    def _next_due(self, entry: ScrapeTarget, now: datetime) -> datetime:
+        if not self._leased_elsewhere(entry, now):
+            return entry.next_due
+        # La otra instancia la reprograma al terminar, como mínimo `min_interval` después de tomarla
+        taken_at = entry.lease_until - self.lease_ttl
+        return max(entry.next_due, taken_at + timedelta(seconds=self.min_interval))
+
+    def seconds_until_next(self) -> float:
+        """Espera hasta la próxima búsqueda vencida (al menos 1s)."""
+        if not self.state:
+            return 0.0
+        now = datetime.now()
+        wait = min((self._next_due(e, now) - now).total_seconds() for e in self.state.values())
+        if self._budget_left(time.monotonic()) == 0 and self._dispatched:
+            wait = max(wait, self._dispatched[0] + 3600 - time.monotonic())
+        return max(1.0, wait)
+
+    def summary(self, top: int = 5) -> List[str]:
+        """Líneas con las búsquedas más y menos productivas, para el log del ciclo."""
+        ranked = sorted(self.state.values(), key=lambda e: e.yield_ewma, reverse=True)
+        pick = ranked[:top] + [e for e in ranked[-top:] if e not in ranked[:top]]
+        return [f"[{e.term}] {_format_target(e)}" if len(self.terms) > 1 else _format_target(e) for e in pick]
+
+
+def _format_target(e: ScrapeTarget) -> str:
+    due = max(0, int((e.next_due - datetime.now()).total_seconds()))
+    return (
+        f"{e.location:<20} {e.site:<9} yield {e.yield_ewma:5.2f} | {e.latency_ewma:5.1f}s | "
+        f"cada {e.interval / 60:6.1f} min | próximo en {due // 60:4d} min | "
+        f"{e.polls} polls, {e.new_jobs} nuevas, {e.errors} errores, {e.empty_streak} vacíos seguidos"
+    )
+
+
+if __name__ == "__main__":
+    with Session(engine) as session:
+        rows = session.exec(select(ScrapeTarget).order_by(ScrapeTarget.yield_ewma.desc())).all()
+    for row in rows:
+        print(f"[{row.term}] {_format_target(row)}")
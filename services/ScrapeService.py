@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set
+
+import pandas as pd
+
+from core.config import settings
+from services.JobServices import (
+    DEFAULT_SITES,
+    JOB_COLUMNS,
+    CircuitOpenError,
+    JobService,
+    job_service as default_job_service,
+)
+
+
+@dataclass
+class ScrapeTask:
+    term: str
+    location: str
+    country: str
+    site: str
+    limit: int = 15
+    hours_old: int = 24
+
+
+@dataclass
+class ScrapeResult:
+    task: ScrapeTask
+    # Ofertas ya normalizadas (columnas JOB_COLUMNS); los Job se arman después del dedupe
+    frame: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=JOB_COLUMNS))
+    elapsed: float = 0.0
+    # No llegó a llamar a jobspy (presupuesto del ciclo, slots, circuito abierto): no es un fallo de la búsqueda
+    skipped: bool = False
+    failed: bool = False
+    retry_in: float = 0.0  # con `skipped`, segundos hasta que tenga sentido reintentar
+
+
+class ScrapePool:
+    """
+    Threads y slots de scraping compartidos por todo el proceso.
+
+    Al agotarse el presupuesto de un ciclo, las búsquedas que siguen dentro
+    de jobspy no se pueden interrumpir: siguen ocupando su thread y sus slots
+    por portal y país hasta terminar. Como el pool es uno solo, el ciclo
+    siguiente corre con la capacidad que quede libre y los límites valen
+    también entre ciclos.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = settings.SCRAPE_MAX_WORKERS,
+        per_site_limit: int = settings.SCRAPE_PER_SITE_LIMIT,
+        per_country_limit: int = settings.SCRAPE_PER_COUNTRY_LIMIT,
+    ):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self._site_slots: Dict[str, threading.BoundedSemaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(per_site_limit)
+        )
+        self._country_slots: Dict[str, threading.BoundedSemaphore] = defaultdict(
+            lambda: threading.BoundedSemaphore(per_country_limit)
+        )
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def slots_for(self, task: ScrapeTask):
+        with self._lock:
+            return self._site_slots[task.site], self._country_slots[task.country]
+
+    @property
+    def running(self) -> int:
+        """Búsquedas dentro de jobspy (incluidas las abandonadas por ciclos anteriores)."""
+        return self._running
+
+    def track(self, delta: int):
+        with self._lock:
+            self._running += delta
+
+
+scrape_pool = ScrapePool()
+
+
+class ScrapeService:
+    """
+    Etapa de scraping concurrente.
+
+    Cada (ubicación, portal) es una tarea independiente que corre en el pool
+    de threads del proceso (ScrapePool). Además del tamaño del pool hay dos límites:
+    - por portal: cuántas búsquedas simultáneas aceptamos contra LinkedIn, Indeed...
+    - por país: cuántas búsquedas simultáneas sobre la misma ubicación.
+    El ciclo tiene un presupuesto de tiempo; al agotarse se cancelan las tareas
+    pendientes y se descartan los resultados de las que sigan corriendo.
+    """
+
+    def __init__(
+        self,
+        job_service: Optional[JobService] = None,
+        pool: Optional[ScrapePool] = None,
+        cycle_budget: float = settings.SCRAPE_CYCLE_BUDGET,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.job_service = job_service or default_job_service
+        self.pool = pool or scrape_pool
+        self.cycle_budget = cycle_budget
+
+    def build_tasks(
+        self,
+        term: str,
+        targets: List[Dict[str, str]],
+        sites: Optional[List[str]] = None,
+        limit: int = 15,
+    ) -> List[ScrapeTask]:
+        """Expande ubicaciones x portales en tareas individuales."""
+        return [
+            ScrapeTask(term=term, location=t["loc"], country=t["country"], site=site, limit=limit)
+            for t in targets
+            for site in (sites or DEFAULT_SITES)
+        ]
+
+    def _acquire(self, sem: threading.BoundedSemaphore, deadline: float, cancelled: threading.Event) -> bool:
+        # Espera un slot en tramos cortos para poder abandonar si el ciclo se cancela
+        while not cancelled.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if sem.acquire(timeout=min(remaining, 0.5)):
+                return True
+        return False
+
+    def _run_task(
+        self, task: ScrapeTask, deadline: float, cancelled: threading.Event, started: Set[int]
+    ) -> ScrapeResult:
+        site_sem, country_sem = self.pool.slots_for(task)
+        if not self._acquire(site_sem, deadline, cancelled):
+            return ScrapeResult(task=task, skipped=True)
+        try:
+            if not self._acquire(country_sem, deadline, cancelled):
+                return ScrapeResult(task=task, skipped=True)
+            started.add(id(task))
+            self.pool.track(1)
+            try:
+                start = time.monotonic()
+                frame = self.job_service.scrape_frame(
+                    term=task.term,
+                    location=task.location,
+                    country=task.country,
+                    limit=task.limit,
+                    sites=[task.site],
+                    hours_old=task.hours_old,
+                )
+                return ScrapeResult(task=task, frame=frame, elapsed=time.monotonic() - start)
+            finally:
+                self.pool.track(-1)
+                country_sem.release()
+        finally:
+            site_sem.release()
+
+    def _collect(self, task: ScrapeTask, future: Future) -> ScrapeResult:
+        """Resultado de una tarea terminada (los errores se convierten en `failed`/`skipped`)."""
+        try:
+            result = future.result()
+        except CircuitOpenError as e:
+            self.logger.info(f"🔌 {task.location} ({task.site}): {e}; se reintenta en {e.retry_in:.0f}s")
+            return ScrapeResult(task=task, skipped=True, retry_in=e.retry_in)
+        except Exception as e:
+            self.logger.error(f"❌ Error buscando en {task.location} ({task.site}): {e}")
+            return ScrapeResult(task=task, failed=True)
+        if not result.skipped:
+            self.logger.info(f"🔎 {task.location} ({task.site}): {len(result.frame)} ofertas en {result.elapsed:.1f}s")
+        return result
+
+    def iter_results(self, tasks: List[ScrapeTask]) -> Iterator[ScrapeResult]:
+        """
+        Ejecuta las tareas en paralelo y entrega cada resultado apenas termina
+        (no en el orden de entrada). Toda tarea produce un resultado: las que
+        no llegaron a correr salen con `skipped` y las que seguían dentro de
+        jobspy al agotarse el presupuesto, con `failed`.
+        """
+        deadline = time.monotonic() + self.cycle_budget
+        cancelled = threading.Event()
+        started: Set[int] = set()
+        if self.pool.running:
+            self.logger.info(f"🐢 {self.pool.running} búsquedas de ciclos anteriores siguen ocupando el pool")
+        futures = {
+            self.pool.executor.submit(self._run_task, task, deadline, cancelled, started): task for task in tasks
+        }
+        consumed: Set[Future] = set()
+        try:
+            for future in as_completed(futures, timeout=self.cycle_budget):
+                consumed.add(future)
+                yield self._collect(futures[future], future)
+        except TimeoutError:
+            cancelled.set()
+            late, pending = [], []
+            for future, task in futures.items():
+                if future in consumed:
+                    continue
+                future.cancel()
+                # Terminó entre el timeout y acá: su resultado vale igual
+                (late if future.done() and not future.cancelled() else pending).append((future, task))
+            running = sum(1 for _, task in pending if id(task) in started)
+            self.logger.warning(
+                f"⏱️ Presupuesto de scraping agotado ({self.cycle_budget:.0f}s). Se descartan "
+                f"{len(pending)} búsquedas pendientes ({running} todavía dentro de jobspy)."
+            )
+            for future, task in late:
+                yield self._collect(task, future)
+            for _, task in pending:
+                yield ScrapeResult(task=task, failed=id(task) in started, skipped=id(task) not in started)
+        finally:
+            # Las tareas que no arrancaron se cancelan; las que están dentro de
+            # jobspy no se pueden interrumpir: terminan en background (con su
+            # thread y sus slots del pool) y su resultado se ignora.
+            cancelled.set()
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,251 @@
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, delete, func, or_, select, update
+
+from core.config import settings
+from database import engine, insert_ignore
+from models.JobModels import Job, JobDescription, JobProfileAudit, SeenJob
+from services.DedupeService import NearDupIndex, signed_id_hash
+
+try:
+    import zstandard
+except ImportError:  # opcional: sin el paquete se usa zlib
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+# --- Descripciones comprimidas ---
+def compress_description(text: str, codec: str = settings.DESCRIPTION_CODEC) -> Tuple[str, bytes]:
+    """Devuelve (codec usado, bytes). Si se pide zstd sin el paquete instalado, usa zlib."""
+    data = text.encode("utf-8")
+    if codec == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_description(codec: str, body: bytes) -> str:
+    if codec == "zlib":
+        return zlib.decompress(body).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Descripción comprimida con zstd: falta instalar el paquete zstandard")
+        return zstandard.ZstdDecompressor().decompress(body).decode("utf-8")
+    raise ValueError(f"Codec de descripción desconocido: {codec}")
+
+
+def description_rows(jobs: Iterable[Job], codec: str = settings.DESCRIPTION_CODEC) -> List[Dict[str, Any]]:
+    """Filas de JobDescription para los jobs que traen descripción."""
+    rows = []
+    for job in jobs:
+        if job.description:
+            used, body = compress_description(job.description, codec)
+            rows.append({"job_id": job.id, "codec": used, "body": body})
+    return rows
+
+
+def load_descriptions(job_ids: List[str], session: Optional[Session] = None) -> Dict[str, str]:
+    """
+    Descripciones de `job_ids` (las que existan): de JobDescription o, en
+    filas anteriores a la compactación, de la columna Job.description.
+    """
+    if not job_ids:
+        return {}
+    if session is None:
+        with Session(engine) as own:
+            return load_descriptions(job_ids, own)
+    found: Dict[str, str] = {}
+    for start in range(0, len(job_ids), 500):
+        chunk = job_ids[start:start + 500]
+        for job_id, codec, body in session.exec(
+            select(JobDescription.job_id, JobDescription.codec, JobDescription.body)
+            .where(JobDescription.job_id.in_(chunk))
+        ):
+            found[job_id] = decompress_description(codec, body)
+        missing = [i for i in chunk if i not in found]
+        if missing:
+            found.update(session.exec(
+                select(Job.id, Job.description).where(Job.id.in_(missing), Job.description.is_not(None))
+            ).all())
+    return found
+
+
+def load_description(job_id: str, session: Optional[Session] = None) -> Optional[str]:
+    return load_descriptions([job_id], session).get(job_id)
+
+
+def move_inline_descriptions(chunk: int = 2000, codec: str = settings.DESCRIPTION_CODEC) -> int:
+    """Pasa las descripciones guardadas en Job (versiones anteriores) a JobDescription."""
+    moved = 0
+    while True:
+        with Session(engine) as session:
+            rows = session.exec(
+                select(Job.id, Job.description).where(Job.description.is_not(None)).limit(chunk)
+            ).all()
+            if not rows:
+                return moved
+            ids = [job_id for job_id, _ in rows]
+            session.exec(
+                insert_ignore(JobDescription.__table__),
+                params=[{"job_id": job_id, "codec": c, "body": b}
+                        for job_id, text in rows for c, b in [compress_description(text, codec)]],
+            )
+            session.exec(update(Job).where(Job.id.in_(ids)).values(description=None))
+            session.commit()
+        moved += len(rows)
+        logger.info(f"🗜️ {moved} descripciones comprimidas...")
+
+
+# --- Retención ---
+class RetentionService:
+    """
+    Poda de ofertas viejas descartadas.
+
+    Borra las ofertas no notificadas con más de `days` días, con sus
+    auditorías y su descripción, y guarda la huella de 64 bits de cada ID en
+    SeenJob: SeenIndex las sigue reconociendo si vuelven a aparecer. No toca
+    las notificadas ni las canónicas de un casi-duplicado que se conserva.
+    Con `archive_dir`, antes de borrarlas las agrega a
+    `jobs-AAAAMMDD.jsonl.gz` (una línea por oferta, con descripción y auditorías).
+    Con `near_index`, las borradas salen también del índice de casi-duplicados
+    (si no, una oferta nueva podría enlazarse a una canónica que ya no existe).
+    """
+
+    def __init__(
+        self,
+        days: int = settings.RETENTION_DAYS,
+        archive_dir: str = settings.RETENTION_ARCHIVE_DIR,
+        chunk: int = 5000,
+        near_index: Optional[NearDupIndex] = None,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.days = days
+        self.archive_dir = archive_dir
+        self.chunk = max(1, chunk)
+        self.near_index = near_index
+
+    def _kept_canonicals(self, session: Session, cutoff: datetime) -> Set[str]:
+        """Canónicas de casi-duplicados que se conservan (pocas: se leen una vez por poda)."""
+        return set(session.exec(
+            select(Job.canonical_id).where(
+                Job.canonical_id.is_not(None), or_(Job.notified, Job.date_found >= cutoff)
+            )
+        ).all())
+
+    def _archive(self, session: Session, job_ids: List[str]):
+        jobs = session.exec(select(Job).where(Job.id.in_(job_ids))).all()
+        descriptions = load_descriptions(job_ids, session)
+        audits: Dict[str, List[dict]] = {}
+        for audit in session.exec(select(JobProfileAudit).where(JobProfileAudit.job_id.in_(job_ids))):
+            audits.setdefault(audit.job_id, []).append(audit.model_dump())
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, f"jobs-{datetime.now():%Y%m%d}.jsonl.gz")
+        # Cada tanda agrega un miembro gzip; el archivo se lee como uno solo
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for job in jobs:
+                record = job.model_dump(exclude={"minhash"})
+                record["description"] = descriptions.get(job.id)
+                record["audits"] = audits.get(job.id, [])
+                f.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+
+    def prune(self) -> int:
+        """Aplica la retención por tandas de `chunk` ofertas. Devuelve cuántas borró."""
+        if self.days <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=self.days)
+        started = time.monotonic()
+        removed: List[str] = []
+        with Session(engine) as session:
+            kept = self._kept_canonicals(session, cutoff)
+        # Se avanza por date_found (ix_job_date_found) para no volver a leer las que se
+        # conservan; una oferta con la misma fecha que la última de su tanda queda para la próxima poda
+        after: Optional[datetime] = None
+        while True:
+            with Session(engine) as session:
+                stmt = select(Job.id, Job.date_found).where(Job.date_found < cutoff, ~Job.notified)
+                if after is not None:
+                    stmt = stmt.where(Job.date_found > after)
+                rows = session.exec(stmt.order_by(Job.date_found).limit(self.chunk)).all()
+                if not rows:
+                    break
+                after = rows[-1][1]
+                job_ids = [job_id for job_id, _ in rows if job_id not in kept]
+                if not job_ids:
+                    continue
+                if self.archive_dir:
+                    self._archive(session, job_ids)
+                session.exec(
+                    insert_ignore(SeenJob.__table__), params=[{"id_hash": signed_id_hash(i)} for i in job_ids]
+                )
+                session.exec(delete(JobProfileAudit).where(JobProfileAudit.job_id.in_(job_ids)))
+                session.exec(delete(JobDescription).where(JobDescription.job_id.in_(job_ids)))
+                session.exec(delete(Job).where(Job.id.in_(job_ids)))
+                session.commit()
+            removed.extend(job_ids)
+        if removed and self.near_index is not None:
+            # Una pasada por el índice para todas las borradas, no una por tanda
+            self.near_index.remove(removed)
+        if removed:
+            self.logger.info(
+                f"🧹 Retención: {len(removed)} ofertas de más de {self.days} días borradas "
+                f"en {time.monotonic() - started:.1f}s"
+            )
+        return len(removed)
+
+
+def compact():
+    """Mueve las descripciones inline a JobDescription y recupera el espacio libre (VACUUM)."""
+    move_inline_descriptions()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+        conn.exec_driver_sql("ANALYZE")
+
+
+def storage_stats() -> Dict[str, Any]:
+    """Filas por tabla, bytes de descripciones comprimidas y tamaño de la base (SQLite)."""
+    with Session(engine) as session:
+        stats: Dict[str, Any] = {
+            "jobs": session.exec(select(func.count()).select_from(Job)).one(),
+            "seen_pruned": session.exec(select(func.count()).select_from(SeenJob)).one(),
+            "descriptions": session.exec(select(func.count()).select_from(JobDescription)).one(),
+            "description_bytes": session.exec(select(func.coalesce(func.sum(func.length(JobDescription.body)), 0))).one(),
+            "inline_descriptions": session.exec(
+                select(func.count()).select_from(Job).where(Job.description.is_not(None))
+            ).one(),
+        }
+        if engine.dialect.name == "sqlite":
+            conn = session.connection()
+            pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+            stats["db_bytes"] = pages * page_size
+            stats["free_bytes"] = free * page_size
+    return stats
+
+
+if __name__ == "__main__":
+    from database import create_db_and_tables
+
+    # Uso: python -m services.StorageService [stats|prune|compact]
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    create_db_and_tables()
+    if command == "prune":
+        print(f"🧹 {RetentionService().prune()} ofertas borradas")
+    elif command == "compact":
+        compact()
+    elif command != "stats":
+        raise SystemExit(f"Comando desconocido: {command} (stats|prune|compact)")
+    for key, value in storage_stats().items():
+        print(f"{key:>20}: {value}")
@@ -1,57 +1,196 @@
 import asyncio
+import logging
+from dataclasses import dataclass, asdict
+from datetime import timedelta
+from typing import Dict, List, Set
+
 from telegram import Bot
-from telegram.constants import ParseMode
-from RedisServices import RedisQueue
+from telegram.constants import MessageLimit, ParseMode
+from telegram.error import RetryAfter
+
+from core.config import settings
+from core.metrics import QUEUE_DEPTH, TELEGRAM_MESSAGES, TELEGRAM_SEND_SECONDS
+from core.ratelimit import TokenBucket
+from services.RedisServices import OutboxQueue
+
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖➖\n\n"
+
+
+def pack_digest(texts: List[str], limit: int = MessageLimit.MAX_TEXT_LENGTH) -> List[List[int]]:
+    """
+    Agrupa mensajes (en orden) en bloques cuyo texto unido no supera `limit`.
+    Devuelve los índices de cada bloque; un mensaje que solo ya excede el
+    límite va en un bloque propio. Nunca corta un mensaje (rompería el HTML).
+    """
+    groups: List[List[int]] = []
+    size = 0
+    for i, text in enumerate(texts):
+        extra = len(DIGEST_SEPARATOR) + len(text)
+        if groups and size + extra <= limit:
+            groups[-1].append(i)
+            size += extra
+        else:
+            groups.append([i])
+            size = len(text)
+    return groups
+
 
-# Supongamos que esta es tu cola (puede ser Redis, Rabbit o SQS)
-message_queue = asyncio.Queue()
+@dataclass
+class SenderStats:
+    sent: int = 0
+    messages: int = 0
+    retried: int = 0
+    failed: int = 0
 
 
-async def worker(token: str):
+class TelegramSender:
     """
-    Este es el proceso que se queda escuchando la cola
-    y manda los mensajes a Telegram.
+    Envía los mensajes de la outbox respetando los límites de Telegram.
+
+    Cada chat tiene su propio carril (cola + tarea) con un token bucket de
+    `per_chat_rate` msg/s, así los envíos de un chat salen en orden y los de
+    chats distintos van en paralelo (hasta `concurrency` requests a la vez),
+    todos bajo un bucket global de `global_rate` msg/s. Un `RetryAfter` frena
+    el carril y devuelve los mensajes a la outbox con ese delay; cualquier otro
+    error los reintenta con el delay por defecto. Como mucho hay
+    `max_in_flight` mensajes tomados de la outbox sin confirmar; si alguno
+    vence su visibility timeout mientras espera turno y la outbox lo entrega
+    de nuevo, la copia se ignora y se devuelve el intento que contó. Ni esa
+    espera ni un `RetryAfter` gastan intentos: sólo los errores de envío
+    acercan un mensaje a OUTBOX_MAX_ATTEMPTS.
+
+    En modo digest, el carril espera `digest_window` segundos al primer
+    mensaje para juntar la ráfaga y la envía en bloques de hasta 4096 caracteres.
     """
-    bot = Bot(token=token)
-    message_queue = RedisQueue()
-    print("Worker activo: escuchando mensajes en la cola...")
 
-    while True:
-        # 1. Espera un mensaje de la cola
-        job = await message_queue.dequeue()
+    def __init__(
+        self,
+        bot: Bot,
+        queue: OutboxQueue,
+        per_chat_rate: float = settings.TELEGRAM_PER_CHAT_RATE,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        concurrency: int = settings.TELEGRAM_CONCURRENCY,
+        max_in_flight: int = settings.TELEGRAM_MAX_IN_FLIGHT,
+        digest: bool = settings.TELEGRAM_DIGEST,
+        digest_window: float = settings.TELEGRAM_DIGEST_WINDOW,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.bot = bot
+        self.queue = queue
+        self.per_chat_rate = per_chat_rate
+        self.global_bucket = TokenBucket(capacity=max(1.0, global_rate), refill_per_sec=global_rate)
+        self.digest = digest
+        self.digest_window = digest_window
+        self.stats = SenderStats()
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._in_flight = asyncio.Semaphore(max(1, max_in_flight))
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._lanes: Dict[str, asyncio.Queue] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._pending_ids: Set[int] = set()
 
-        # job debería ser un dict con: chat_id y text
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(capacity=1, refill_per_sec=self.per_chat_rate)
+        return bucket
+
+    async def run(self):
+        """Loop principal: toma mensajes de la outbox y los reparte por chat."""
+        QUEUE_DEPTH.track(lambda: len(self._pending_ids), queue="telegram_in_flight")
         try:
-            await bot.send_message(
-                chat_id=job["chat_id"],
-                text=job["text"],
-                parse_mode=ParseMode.HTML,
-            )
-            print(f"Mensaje enviado a {job['chat_id']}")
-        except Exception as e:
-            print(f"Error al enviar: {e}")
+            while True:
+                await self._in_flight.acquire()
+                try:
+                    message = await self.queue.dequeue()
+                except BaseException:
+                    self._in_flight.release()
+                    raise
+                self._dispatch(message)
         finally:
-            # 2. Avisa que el trabajo terminó
-            message_queue.task_done()
+            QUEUE_DEPTH.untrack(queue="telegram_in_flight")
+            for task in list(self._tasks):
+                task.cancel()
 
+    def _dispatch(self, message: dict):
+        if message["id"] in self._pending_ids:
+            # Copia de un mensaje que sigue en su carril: no fue un intento de envío
+            self._in_flight.release()
+            self._spawn(self._refund(message["id"]))
+            return
+        self._pending_ids.add(message["id"])
+        chat_id = message["chat_id"]
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = asyncio.Queue()
+            self._spawn(self._chat_worker(chat_id, lane))
+        lane.put_nowait(message)
 
-# Función para simular que algo mete cosas en la cola
-async def producer():
-    while True:
-        await asyncio.sleep(5)
-        await message_queue.put(
-            {
-                "chat_id": "TU_USER_ID",
-                "text": "<b>Notificación:</b> Nuevo evento en la cola",
-            }
-        )
+    async def _refund(self, message_id: int):
+        try:
+            await self.queue.nack(message_id, delay=self.queue.visibility_timeout.total_seconds(), throttled=True)
+        except Exception as e:
+            self.logger.error(f"❌ Error devolviendo el intento del mensaje {message_id}: {e}")
 
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
 
-async def main():
-    token = "8477475085:AAFJ1p7bmEk5eaE_3iwLmNL-6UvjD6F8qMg"
-    # Corremos el worker y el producer (o tu integración con Rabbit/Redis)
-    await asyncio.gather(worker(token), producer())
+    async def _chat_worker(self, chat_id: str, lane: asyncio.Queue):
+        while not lane.empty():
+            messages = [lane.get_nowait()]
+            if self.digest:
+                # Deja que llegue el resto de la ráfaga antes de armar el digest
+                await asyncio.sleep(self.digest_window)
+                while not lane.empty():
+                    messages.append(lane.get_nowait())
+                groups = [[messages[i] for i in idx] for idx in pack_digest([m["text"] for m in messages])]
+            else:
+                groups = [messages]
+            for group in groups:
+                try:
+                    await self._send(chat_id, group)
+                except Exception as e:
+                    # Falló el ack/nack: los mensajes reaparecen al vencer el visibility timeout
+                    self.logger.error(f"❌ Error confirmando mensajes de {chat_id}: {e}")
+        # Sin await desde el último chequeo: ningún mensaje queda en un carril huérfano
+        del self._lanes[chat_id]
 
+    async def _send(self, chat_id: str, messages: List[dict]):
+        ids = [m["id"] for m in messages]
+        text = DIGEST_SEPARATOR.join(m["text"] for m in messages)
+        bucket = self._chat_bucket(chat_id)
+        try:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            async with self._slots:
+                with TELEGRAM_SEND_SECONDS.time():
+                    await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.HTML)
+        except RetryAfter as e:
+            wait = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else float(e.retry_after)
+            bucket.block_for(wait)
+            self.stats.retried += len(ids)
+            TELEGRAM_MESSAGES.inc(len(ids), result="retry")
+            self.logger.warning(f"⏳ Telegram pide esperar {wait:.0f}s para {chat_id}: {len(ids)} mensajes reencolados")
+            await self.queue.nack(*ids, delay=wait, error=f"RetryAfter {wait:.0f}s", throttled=True)
+        except Exception as e:
+            self.stats.failed += len(ids)
+            TELEGRAM_MESSAGES.inc(len(ids), result="error")
+            self.logger.error(f"❌ Error enviando a {chat_id}: {e}")
+            await self.queue.nack(*ids, error=str(e))
+        else:
+            self.stats.sent += 1
+            self.stats.messages += len(ids)
+            TELEGRAM_MESSAGES.inc(len(ids), result="sent")
+            self.logger.info(
+                f"✅ Mensaje enviado a {chat_id}" + (f" (digest de {len(ids)} alertas)" if len(ids) > 1 else "")
+            )
+            await self.queue.ack(*ids)
+        finally:
+            for message_id in ids:
+                self._pending_ids.discard(message_id)
+                self._in_flight.release()
 
-if __name__ == "__main__":
-    asyncio.run(main())
+    def summary(self) -> Dict[str, int]:
+        return {**asdict(self.stats), "chats_activos": len(self._lanes)}
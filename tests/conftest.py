@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# La configuración se lee al importar: los tests usan su propia base SQLite temporal
+_WORKDIR = tempfile.mkdtemp(prefix="jobfinder-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_WORKDIR, 'tests.db')}"
+
+
+@pytest.fixture
+def db():
+    """Tablas vacías para el test (se borran al terminar)."""
+    from sqlmodel import SQLModel
+
+    import models.JobModels  # noqa: F401  (registra las tablas)
+    from database import create_db_and_tables, engine
+
+    create_db_and_tables()
+    yield engine
+    SQLModel.metadata.drop_all(engine)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
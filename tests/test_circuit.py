@@ -0,0 +1,67 @@
+from typing import Tuple
+
+import core.circuit as circuit
+from core.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(monkeypatch, **kwargs) -> Tuple[CircuitBreaker, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "monotonic", clock)
+    return CircuitBreaker(**kwargs), clock
+
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    cb, _ = breaker(monkeypatch, failure_threshold=3, cooldown=60)
+    cb.record_failure()
+    cb.record_failure()
+    cb.record_success()  # un éxito reinicia la racha
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state == CLOSED and cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN
+    assert not cb.allow()
+    assert cb.retry_in() == 60
+    assert cb.snapshot()["rejected"] == 1
+
+
+def test_block_opens_immediately(monkeypatch):
+    cb, _ = breaker(monkeypatch, failure_threshold=3)
+    cb.record_failure(blocked=True)
+    assert cb.state == OPEN
+
+
+def test_half_open_lets_a_single_probe_through(monkeypatch):
+    cb, clock = breaker(monkeypatch, failure_threshold=1, cooldown=60)
+    cb.record_failure()
+    clock.now += 59
+    assert not cb.allow() and cb.retry_in() == 1
+    clock.now += 1
+    assert cb.allow()
+    assert cb.state == HALF_OPEN
+    assert not cb.allow()  # la prueba sigue en curso
+    cb.record_success()
+    assert cb.state == CLOSED and cb.allow() and cb.allow()
+
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_max(monkeypatch):
+    cb, clock = breaker(monkeypatch, failure_threshold=1, cooldown=60, max_cooldown=100)
+    cb.record_failure()
+    for expected in (120, 100):
+        clock.now += cb.cooldown
+        assert cb.allow()
+        cb.record_failure()
+        assert cb.state == OPEN
+        assert cb.retry_in() == min(expected, 100)
+    clock.now += 100
+    assert cb.allow()
+    cb.record_success()
+    assert cb.cooldown == 60  # un éxito vuelve a la espera base
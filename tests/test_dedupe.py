@@ -0,0 +1,105 @@
+from sqlmodel import Session
+
+from database import engine
+from models.JobModels import Job, SeenJob
+from services.DedupeService import NearDupIndex, SeenIndex, signed_id_hash
+
+DESCRIPTION = (
+    "Buscamos desarrollador backend con experiencia en Python, Django y PostgreSQL. "
+    "Vas a diseñar APIs, revisar código y trabajar con el equipo de datos en proyectos de pagos. "
+) * 4
+
+
+def job(job_id: str, description: str = DESCRIPTION, title: str = "Backend Python", company: str = "Acme") -> Job:
+    return Job(id=job_id, title=title, company=company, location="Madrid", url=job_id, description=description)
+
+
+def save(*jobs: Job):
+    with Session(engine) as session:
+        session.add_all(jobs)
+        session.commit()
+
+
+# --- SeenIndex ---
+def test_seen_index_filters_known_ids_and_keeps_order(db):
+    index = SeenIndex(merge_every=2)
+    index.loaded = True
+    index.add(["a", "b", "c"])  # supera merge_every: pasa al array ordenado
+    index.add(["d"])  # queda en las altas recientes
+    assert index.filter_new(["x", "a", "d", "y", "c"]) == ["x", "y"]
+    assert len(index) == 4
+
+
+def test_seen_index_load_includes_jobs_and_pruned_ids(db):
+    save(job("stored"))
+    with Session(engine) as session:
+        session.add(SeenJob(id_hash=signed_id_hash("pruned")))
+        session.commit()
+    index = SeenIndex()
+    assert index.filter_new(["stored", "pruned", "new"]) == ["new"]
+    assert index.loaded and len(index) == 2
+
+
+def test_seen_index_confirms_unknown_ids_against_the_db(db):
+    index = SeenIndex()
+    index.load()
+    save(job("written-elsewhere"))  # lo guardó otro proceso después de cargar
+    assert index.filter_new(["written-elsewhere", "new"]) == ["new"]
+    assert index.filter_new(["written-elsewhere"]) == []  # ya quedó en el índice
+
+
+# --- NearDupIndex ---
+def loaded_index(**kwargs) -> NearDupIndex:
+    index = NearDupIndex(**kwargs)
+    index.loaded = True
+    return index
+
+
+def test_near_dup_links_same_posting_from_another_site():
+    index = loaded_index()
+    unique, dups = index.partition([job("linkedin/1"), job("indeed/1"), job("other", "Diseñador gráfico senior " * 20)])
+    assert [j.id for j in unique] == ["linkedin/1", "other"]
+    assert [(j.id, j.canonical_id) for j in dups] == [("indeed/1", "linkedin/1")]
+    assert unique[0].minhash is not None and dups[0].minhash is None
+    assert index.find(job("google/1")) == "linkedin/1"
+    assert len(index) == 2
+
+
+def test_near_dup_ignores_different_postings_and_empty_text():
+    index = loaded_index()
+    index.partition([job("a")])
+    assert index.find(job("b", "Enfermera para hospital de día con guardias rotativas " * 10, "Enfermería", "Salud")) is None
+    unique, dups = index.partition([job("empty", "", "", "")])
+    assert [j.id for j in unique] == ["empty"] and not dups
+    assert len(index) == 1  # sin texto no hay firma
+
+
+def test_near_dup_remove_stops_matching():
+    index = loaded_index()
+    index.partition([job("canonical")])
+    assert index.remove(["canonical", "unknown"]) == 1
+    assert index.find(job("copy")) is None
+    assert len(index) == 0
+    # Ahora la copia es la canónica
+    unique, dups = index.partition([job("copy"), job("copy-2")])
+    assert [j.id for j in unique] == ["copy"] and [j.canonical_id for j in dups] == ["copy"]
+
+
+def test_near_dup_merge_keeps_recent_entries_searchable():
+    index = loaded_index(merge_every=16)  # fusiona cada vez que entra una oferta (16 bandas)
+    postings = [job(f"job-{i}", f"Oferta número {i} de {'frontend react' if i % 2 else 'data engineer spark'} " * 15)
+                for i in range(5)]
+    index.partition(postings)
+    assert not index._recent  # todo quedó en los arrays ordenados
+    for posting in postings:
+        assert index.find(job(posting.id + "-copy", posting.description)) == posting.id
+
+
+def test_near_dup_load_restores_canonicals_from_db(db):
+    first = loaded_index()
+    unique, dups = first.partition([job("canonical"), job("copy")])
+    save(*unique, *dups)
+    index = NearDupIndex()
+    index.load()
+    assert len(index) == 1  # las copias (con canonical_id) no entran
+    assert index.find(job("another-copy")) == "canonical"
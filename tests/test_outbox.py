@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, update
+from telegram.error import RetryAfter
+
+from database import engine
+from models.JobModels import OutboxMessage
+from services.RedisServices import OutboxQueue
+from services.TelegramService import TelegramSender
+
+
+def stage(queue: OutboxQueue, *texts: str, chat_id: str = "1"):
+    with Session(engine) as session:
+        for text in texts:
+            queue.stage(session, chat_id, text)
+        session.commit()
+
+
+def expire_claims():
+    """Como si venciera el visibility timeout de lo ya tomado."""
+    with Session(engine) as session:
+        session.exec(update(OutboxMessage).values(visible_at=datetime.now() - timedelta(seconds=1)))
+        session.commit()
+
+
+def test_claim_hides_messages_until_visibility_timeout(db):
+    queue = OutboxQueue(visibility_timeout=60, max_attempts=3)
+    stage(queue, "a", "b", "c")
+    first = queue.claim(2)
+    assert [m["text"] for m in first] == ["a", "b"]
+    assert all(m["attempts"] == 1 for m in first)
+    assert [m["text"] for m in queue.claim(10)] == ["c"]
+    assert queue.claim(10) == []
+    assert queue.pending() == 3
+    expire_claims()
+    assert [m["attempts"] for m in queue.claim(10)] == [2, 2, 2]
+
+
+def test_ack_removes_messages(db):
+    queue = OutboxQueue()
+    stage(queue, "a", "b")
+    claimed = queue.claim(10)
+    asyncio.run(queue.ack(*(m["id"] for m in claimed)))
+    assert queue.pending() == 0
+
+
+def test_send_errors_dead_letter_after_max_attempts(db):
+    queue = OutboxQueue(max_attempts=2)
+    stage(queue, "a")
+    for _ in range(2):
+        (message,) = queue.claim(10)
+        asyncio.run(queue.nack(message["id"], delay=0, error="boom"))
+    assert queue.claim(10) == []
+    assert queue.pending() == 0
+
+
+def test_throttled_nack_gives_the_attempt_back(db):
+    queue = OutboxQueue(max_attempts=2)
+    stage(queue, "a")
+    for _ in range(5):
+        (message,) = queue.claim(10)
+        assert message["attempts"] == 1
+        asyncio.run(queue.nack(message["id"], delay=0, error="RetryAfter 0s", throttled=True))
+    assert queue.pending() == 1
+
+
+class ThrottlingBot:
+    """Responde RetryAfter las primeras `throttles` veces y después entrega."""
+
+    def __init__(self, throttles: int):
+        self.throttles = throttles
+        self.calls = 0
+        self.delivered = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.calls += 1
+        if self.calls <= self.throttles:
+            raise RetryAfter(0)
+        self.delivered.append(text)
+
+
+def run_sender(bot, queue: OutboxQueue, until, timeout: float = 10.0):
+    async def main():
+        sender = TelegramSender(bot, queue, per_chat_rate=1000, global_rate=1000)
+        task = asyncio.create_task(sender.run())
+        try:
+            deadline = asyncio.get_running_loop().time() + timeout
+            while not until() and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(0.02)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return sender
+
+    return asyncio.run(main())
+
+
+def test_retry_after_beyond_max_attempts_is_still_delivered(db):
+    queue = OutboxQueue(max_attempts=2, poll_interval=0.02)
+    stage(queue, "alerta")
+    bot = ThrottlingBot(throttles=5)
+    sender = run_sender(bot, queue, until=lambda: bot.delivered and queue.pending() == 0)
+    assert bot.delivered == ["alerta"]
+    assert sender.stats.retried == 5
+    assert queue.pending() == 0
+
+
+def test_redelivered_copy_waiting_in_lane_keeps_its_attempts(db):
+    queue = OutboxQueue(max_attempts=2)
+    stage(queue, "a")
+    (message,) = queue.claim(10)
+
+    async def main():
+        sender = TelegramSender(ThrottlingBot(throttles=0), queue)
+        sender._pending_ids.add(message["id"])  # sigue esperando turno en su carril
+        expire_claims()
+        for _ in range(3):
+            await sender._in_flight.acquire()
+            (copy,) = await asyncio.get_running_loop().run_in_executor(None, queue.claim, 10)
+            sender._dispatch(copy)
+            await asyncio.gather(*sender._tasks)
+            expire_claims()
+
+    asyncio.run(main())
+    (again,) = queue.claim(10)
+    assert again["attempts"] == 2
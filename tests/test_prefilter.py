@@ -0,0 +1,44 @@
+import logging
+
+from models.JobModels import Job
+from services.PreFilterService import PreFilter
+
+CV = {"role": "Python Backend Developer", "summary": "APIs con Django", "skills": ["Python", "Django", "PostgreSQL"]}
+
+
+def job(i: int, description: str) -> Job:
+    return Job(id=str(i), title=description.split(".")[0], company="Acme", location="", url=str(i),
+               description=description)
+
+
+def jobs():
+    return [
+        job(1, "Backend Python Developer. Django, PostgreSQL y APIs REST con Python."),
+        job(2, "Diseñador gráfico. Photoshop, Illustrator y branding para campañas."),
+        job(3, "Python Django Engineer. Python, Django y PostgreSQL en AWS."),
+    ]
+
+
+def test_rank_splits_and_orders_by_score():
+    accepted, rejected = PreFilter(CV, threshold=0.1, explore_rate=0).rank(jobs())
+    assert {j.id for j, _ in accepted} == {"1", "3"}
+    assert [j.id for j, _ in rejected] == ["2"]
+    assert accepted[0][1] >= accepted[1][1]
+
+
+def test_explore_rate_sends_rejected_jobs_to_the_llm():
+    accepted, rejected = PreFilter(CV, threshold=0.99, explore_rate=1.0).rank(jobs())
+    assert len(accepted) == 3 and not rejected
+
+
+def test_rank_logs_one_info_line_per_batch(caplog):
+    prefilter = PreFilter(CV, threshold=0.1, explore_rate=0)
+    with caplog.at_level(logging.INFO, logger="services.PreFilterService"):
+        prefilter.rank(jobs(), label="ana")
+    assert [r.getMessage() for r in caplog.records] == [
+        "🧮 [ana] Pre-filtro: 2/3 ofertas al LLM, 1 descartadas (umbral 0.10)"
+    ]
+    caplog.clear()
+    with caplog.at_level(logging.DEBUG, logger="services.PreFilterService"):
+        prefilter.rank(jobs())
+    assert len(caplog.records) == 4
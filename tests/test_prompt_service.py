@@ -0,0 +1,61 @@
+from services.PromptService import condense_description, estimate_tokens, truncate_tokens
+
+PARAGRAPH = "Buscamos desarrollador Python con experiencia en Django, FastAPI y PostgreSQL para nuestro equipo. " * 120
+
+
+def test_single_long_paragraph_is_cut_not_dropped():
+    condensed = condense_description(PARAGRAPH, 700)
+    assert condensed
+    assert estimate_tokens(condensed) <= 700
+    assert PARAGRAPH.startswith(condensed)
+
+
+def test_long_paragraph_under_heading_keeps_heading_and_text():
+    condensed = condense_description("**Requirements:**\n" + PARAGRAPH, 700)
+    lines = condensed.splitlines()
+    assert lines[0] == "Requirements:"
+    assert len(lines) == 2 and lines[1]
+    assert estimate_tokens(condensed) <= 700
+
+
+def test_cut_lands_on_word_boundary():
+    cut = truncate_tokens(PARAGRAPH, 50)
+    assert cut and estimate_tokens(cut) <= 50
+    assert PARAGRAPH[len(cut)] in " ,."
+
+
+def test_single_huge_word_is_cut_by_chars():
+    assert truncate_tokens("x" * 5000, 10) == "x" * 40
+
+
+def test_short_text_fits_untouched():
+    assert condense_description("Python y Django", 700) == "Python y Django"
+    assert truncate_tokens("Python y Django", 700) == "Python y Django"
+
+
+def test_requirements_win_over_company_pitch():
+    text = (
+        "## Sobre nosotros\n" + "Somos una empresa con cultura de innovación y equipos felices. " * 40 + "\n"
+        "## Requisitos\n- 3 años con Python\n- Experiencia con Docker\n"
+    )
+    condensed = condense_description(text, 40)
+    # Los requisitos entran completos; lo que sobra del presupuesto es para la
+    # presentación (recortada) y se respeta el orden original
+    assert condensed.endswith("Requisitos\n3 años con Python\nExperiencia con Docker")
+    assert condensed.startswith("Sobre nosotros\nSomos una empresa")
+    assert estimate_tokens(condensed) <= 40
+
+
+def test_benefits_and_legal_are_dropped_when_there_is_content():
+    text = "## Requisitos\nPython\n## Beneficios\nPrepaga\nEqual opportunity employer without regard to race."
+    assert condense_description(text, 700) == "Requisitos\nPython"
+
+
+def test_only_discarded_sections_still_returns_text():
+    text = "## Beneficios\nPrepaga y trabajo remoto\n## Equal opportunity\nTexto legal"
+    assert condense_description(text, 700)
+
+
+def test_empty_input_or_budget():
+    assert condense_description("", 700) == ""
+    assert condense_description(PARAGRAPH, 0) == ""
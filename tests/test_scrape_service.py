@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import TimeoutError, wait
+
+import pandas as pd
+import pytest
+
+import services.ScrapeService as scrape_module
+from services.JobServices import JOB_COLUMNS
+from services.ScrapeService import ScrapePool, ScrapeService, ScrapeTask
+
+
+class FakeJobService:
+    def __init__(self, release: threading.Event = None):
+        self.release = release
+
+    def scrape_frame(self, **kwargs):
+        if self.release is not None:
+            self.release.wait(5)
+        return pd.DataFrame([{**{c: None for c in JOB_COLUMNS}, "id": kwargs["location"]}], columns=JOB_COLUMNS)
+
+
+def tasks(n: int, site: str = "linkedin"):
+    return [ScrapeTask("python", f"loc{i}", "spain", site) for i in range(n)]
+
+
+def test_every_task_gets_a_result_when_the_budget_runs_out():
+    release = threading.Event()
+    service = ScrapeService(FakeJobService(release), pool=ScrapePool(4, 1, 10), cycle_budget=0.5)
+    try:
+        results = {r.task.location: r for r in service.iter_results(tasks(3))}
+    finally:
+        release.set()
+    assert len(results) == 3
+    running = [r for r in results.values() if r.failed]
+    waiting = [r for r in results.values() if r.skipped]
+    # Un slot por portal: una búsqueda quedó dentro de jobspy y las otras esperando turno
+    assert len(running) == 1 and len(waiting) == 2
+
+
+def test_results_finished_at_the_deadline_are_not_lost(monkeypatch):
+    def late_as_completed(futures, timeout=None):
+        # Todas terminan justo cuando vence el presupuesto, antes de consumirlas
+        wait(futures)
+        raise TimeoutError()
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(scrape_module, "as_completed", late_as_completed)
+    service = ScrapeService(FakeJobService(), pool=ScrapePool(4, 4, 10), cycle_budget=60)
+    results = list(service.iter_results(tasks(3)))
+    assert sorted(r.frame["id"].iloc[0] for r in results) == ["loc0", "loc1", "loc2"]
+    assert not any(r.failed or r.skipped for r in results)
+
+
+@pytest.mark.parametrize("per_site", [1, 2])
+def test_pool_limits_concurrency_per_site(per_site):
+    active, peak, lock = [0], [0], threading.Lock()
+
+    class Counting(FakeJobService):
+        def scrape_frame(self, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.05)
+            with lock:
+                active[0] -= 1
+            return super().scrape_frame(**kwargs)
+
+    service = ScrapeService(Counting(), pool=ScrapePool(8, per_site, 10), cycle_budget=30)
+    assert len(list(service.iter_results(tasks(6)))) == 6
+    assert peak[0] == per_site
@@ -0,0 +1,38 @@
+from services.TelegramService import DIGEST_SEPARATOR, pack_digest
+
+
+def joined_lengths(texts, groups):
+    return [len(DIGEST_SEPARATOR.join(texts[i] for i in group)) for group in groups]
+
+
+def test_packs_in_order_without_exceeding_the_limit():
+    texts = ["x" * 30 for _ in range(10)]
+    groups = pack_digest(texts, limit=100)
+    assert [i for group in groups for i in group] == list(range(10))
+    assert all(length <= 100 for length in joined_lengths(texts, groups))
+    # 30 + separador + 30 entran; un tercero ya no
+    per_group = 1 + (100 - 30) // (30 + len(DIGEST_SEPARATOR))
+    assert all(len(group) == per_group for group in groups[:-1])
+
+
+def test_exact_fit_stays_in_the_same_block():
+    texts = ["a" * 40, "b" * (100 - 40 - len(DIGEST_SEPARATOR)), "c"]
+    groups = pack_digest(texts, limit=100)
+    assert groups == [[0, 1], [2]]
+    assert joined_lengths(texts, groups)[0] == 100
+
+
+def test_oversized_message_goes_alone_and_is_never_split():
+    texts = ["short", "y" * 150, "short"]
+    assert pack_digest(texts, limit=100) == [[0], [1], [2]]
+
+
+def test_default_limit_is_telegram_max_length():
+    texts = ["z" * 1000 for _ in range(8)]
+    groups = pack_digest(texts)
+    assert all(length <= 4096 for length in joined_lengths(texts, groups))
+    assert len(groups) == 2
+
+
+def test_empty_input():
+    assert pack_digest([]) == []